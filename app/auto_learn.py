@@ -37,6 +37,7 @@ from functools import lru_cache
 import queue
 
 from app.code_templates import CODE_TEMPLATES
+from app.text_index import get_template_index
 from app.user_examples import load_user_examples
 from app.web_fetcher import (
     fetch_stackoverflow_snippets, 
@@ -752,6 +753,7 @@ class TemplateIntegrator:
             
             # Ajouter aux templates
             CODE_TEMPLATES[key] = template
+            get_template_index().add(key, snippet.patterns)
             
             # Mettre à jour cache
             with CACHE_LOCK:
@@ -0,0 +1,450 @@
+"""
+Backends de stockage pour les caches de réponses IA
+Sélectionnés par Config.CACHE_TYPE :
+
+- 'simple' / 'memory' : LRU en mémoire du processus (comportement historique)
+- 'mmap' / 'shared'   : table de hachage dans un fichier mappé en mémoire,
+                        partagée par tous les workers Gunicorn d'un nœud
+- 'sqlite' / 'file'   : base SQLite locale (mode WAL), partagée par les workers
+
+Les backends partagés stockent des valeurs JSON (ou des bytes bruts), avec
+TTL et éviction LRU bornée en nombre d'entrées.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus, backend mmap indisponible
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Marqueurs de sérialisation des backends partagés
+_RAW_BYTES = b'B'
+_JSON = b'J'
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return _RAW_BYTES + value
+    return _JSON + json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _decode(data: bytes) -> Any:
+    if data[:1] == _RAW_BYTES:
+        return bytes(data[1:])
+    return json.loads(bytes(data[1:]).decode('utf-8'))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          BACKEND MÉMOIRE (PROCESSUS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MemoryCacheBackend:
+    """LRU + TTL en mémoire du processus (les valeurs ne sont pas copiées)."""
+
+    name = 'memory'
+
+    def __init__(self, maxsize: int = 1000, ttl: int = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if time.time() > expires:
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            self.cache[key] = (value, time.time() + self.ttl)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.cache.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def stats(self) -> Dict:
+        return {'backend': self.name, 'size': len(self), 'maxsize': self.maxsize, 'ttl': self.ttl}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          BACKEND MMAP (MÉMOIRE PARTAGÉE)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MmapCacheBackend:
+    """
+    Table de hachage à adressage ouvert dans un fichier mappé (MAP_SHARED).
+
+    Chaque slot a une taille fixe : empreinte md5 de la clé, expiration,
+    dernier accès, longueur puis données. Une clé est cherchée dans une
+    fenêtre de `probe` slots ; à l'insertion on réutilise la clé, un slot vide
+    ou expiré, sinon on évince le slot le moins récemment utilisé de la
+    fenêtre. Les valeurs trop grandes pour un slot ne sont pas mises en cache.
+
+    Les écritures prennent un verrou exclusif (flock) sur un fichier .lock,
+    les lectures un verrou partagé. Le verrou est rouvert après un fork.
+    Les dates d'accès relevées par les lectures sont gardées dans le processus
+    et écrites par lots sous verrou exclusif (au prochain set ou tous les
+    TOUCH_BATCH accès).
+    """
+
+    name = 'mmap'
+
+    MAGIC = b'NZC1'
+    HEADER = struct.Struct('<4sII')  # magic, slots, slot_size
+    HEADER_SIZE = 64
+    SLOT = struct.Struct('<16sddI')  # digest, expires, accessed, length
+    EMPTY = b'\x00' * 16
+    TOUCH_BATCH = 256  # Accès en attente avant écriture groupée
+
+    def __init__(self, path: str, maxsize: int = 1000, ttl: int = 3600,
+                 slot_size: int = 32768, probe: int = 8):
+        if fcntl is None:
+            raise RuntimeError("Le backend mmap nécessite fcntl (POSIX)")
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.slot_size = slot_size
+        self.probe = min(probe, maxsize)
+        self.capacity = slot_size - self.SLOT.size
+        self.lock = threading.Lock()
+        self.pid = None
+        self.lock_fd = None
+        self.touched: Dict[int, tuple] = {}  # slot -> (empreinte, dernier accès) à écrire
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        size = self.HEADER_SIZE + maxsize * slot_size
+        self._open_lock()
+        with self._flock(fcntl.LOCK_EX):
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                header = os.pread(fd, self.HEADER.size, 0)
+                expected = self.HEADER.pack(self.MAGIC, maxsize, slot_size)
+                if header != expected or os.fstat(fd).st_size < size:
+                    # Fichier absent ou géométrie différente : nouveau fichier mis en
+                    # place atomiquement (jamais tronqué sous les workers qui le mappent)
+                    os.close(fd)
+                    fd = self._create_file(path, size, expected)
+                self.map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _create_file(path: str, size: int, header: bytes) -> int:
+        """Crée un fichier initialisé à côté de `path` puis le renomme ; renvoie son fd."""
+        tmp = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, header, 0)
+            os.replace(tmp, path)
+        except Exception:
+            os.close(fd)
+            raise
+        return fd
+
+    def _open_lock(self):
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+        self.lock_fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        self.pid = os.getpid()
+
+    @contextmanager
+    def _flock(self, mode):
+        """Verrou inter-processus (rouvert si le processus a forké)."""
+        if self.pid != os.getpid():
+            self._open_lock()
+        fcntl.flock(self.lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+
+    def _window(self, digest: bytes):
+        start = int.from_bytes(digest[:8], 'little') % self.maxsize
+        return [(start + i) % self.maxsize for i in range(self.probe)]
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER_SIZE + slot * self.slot_size
+
+    def get(self, key: str) -> Optional[Any]:
+        digest = hashlib.md5(key.encode('utf-8')).digest()
+        now = time.time()
+        data = None
+        with self.lock, self._flock(fcntl.LOCK_SH):
+            for slot in self._window(digest):
+                offset = self._offset(slot)
+                stored, expires, _, length = self.SLOT.unpack_from(self.map, offset)
+                if stored != digest:
+                    continue
+                if now > expires:
+                    return None
+                # Dernier accès noté localement, écrit par lots sous verrou exclusif
+                self.touched[slot] = (digest, now)
+                start = offset + self.SLOT.size
+                data = self.map[start:start + length]
+                break
+        if len(self.touched) >= self.TOUCH_BATCH:
+            with self.lock, self._flock(fcntl.LOCK_EX):
+                self._write_touches()
+        return _decode(data) if data is not None else None
+
+    def _write_touches(self):
+        """Écrit les dates d'accès en attente (verrous détenus en exclusif)."""
+        for slot, (digest, accessed) in self.touched.items():
+            offset = self._offset(slot)
+            if self.map[offset:offset + 16] == digest:
+                struct.pack_into('<d', self.map, offset + 24, accessed)
+        self.touched.clear()
+
+    def set(self, key: str, value: Any):
+        data = _encode(value)
+        if len(data) > self.capacity:
+            return
+        digest = hashlib.md5(key.encode('utf-8')).digest()
+        now = time.time()
+        with self.lock, self._flock(fcntl.LOCK_EX):
+            self._write_touches()  # Accès à jour avant de choisir le slot évincé
+            target, oldest = None, None
+            for slot in self._window(digest):
+                stored, expires, accessed, _ = self.SLOT.unpack_from(self.map, self._offset(slot))
+                if stored == digest:
+                    target = slot
+                    break
+                if target is None and (stored == self.EMPTY or now > expires):
+                    target = slot
+                if oldest is None or accessed < oldest[1]:
+                    oldest = (slot, accessed)
+            if target is None:
+                target = oldest[0]
+
+            offset = self._offset(target)
+            start = offset + self.SLOT.size
+            self.map[start:start + len(data)] = data
+            self.SLOT.pack_into(self.map, offset, digest, now + self.ttl, now, len(data))
+
+    def delete(self, key: str):
+        digest = hashlib.md5(key.encode('utf-8')).digest()
+        with self.lock, self._flock(fcntl.LOCK_EX):
+            for slot in self._window(digest):
+                offset = self._offset(slot)
+                if self.map[offset:offset + 16] == digest:
+                    self.map[offset:offset + 16] = self.EMPTY
+
+    def clear(self):
+        with self.lock, self._flock(fcntl.LOCK_EX):
+            self.touched.clear()
+            for slot in range(self.maxsize):
+                offset = self._offset(slot)
+                self.map[offset:offset + 16] = self.EMPTY
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for slot in range(self.maxsize):
+            stored, expires, _, _ = self.SLOT.unpack_from(self.map, self._offset(slot))
+            if stored != self.EMPTY and expires >= now:
+                count += 1
+        return count
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.name, 'size': len(self), 'maxsize': self.maxsize,
+            'ttl': self.ttl, 'slot_size': self.slot_size, 'path': self.path
+        }
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          BACKEND SQLITE (FICHIER)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SQLiteCacheBackend:
+    """
+    Cache dans une base SQLite locale en mode WAL (lecteurs concurrents).
+
+    Une connexion par thread et par processus. L'éviction supprime les
+    entrées expirées puis les moins récemment utilisées au-delà de maxsize.
+    Les lectures ne prennent pas le verrou d'écriture : les dates d'accès sont
+    gardées dans le processus et écrites par lots (au prochain set ou tous les
+    TOUCH_BATCH accès).
+    """
+
+    name = 'sqlite'
+
+    TOUCH_BATCH = 256  # Accès en attente avant écriture groupée
+
+    def __init__(self, path: str, maxsize: int = 1000, ttl: int = 3600):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local = threading.local()
+        self.touched: Dict[str, float] = {}  # clé -> dernier accès à écrire
+        self.touch_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._conn()
+        row = conn.execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now > row[1]:
+            conn.execute('DELETE FROM entries WHERE key = ? AND expires < ?', (key, now))
+            return None
+        with self.touch_lock:
+            self.touched[key] = now
+            batch_full = len(self.touched) >= self.TOUCH_BATCH
+        if batch_full:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._write_touches(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return _decode(row[0])
+
+    def _write_touches(self, conn: sqlite3.Connection):
+        """Écrit les dates d'accès en attente (dans la transaction en cours)."""
+        with self.touch_lock:
+            touched, self.touched = self.touched, {}
+        if touched:
+            conn.executemany(
+                'UPDATE entries SET accessed = ? WHERE key = ? AND accessed < ?',
+                [(accessed, key, accessed) for key, accessed in touched.items()]
+            )
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, _encode(value), now + self.ttl, now)
+            )
+            self._write_touches(conn)  # Accès à jour avant l'éviction LRU
+            overflow = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.maxsize
+            if overflow > 0:
+                conn.execute('DELETE FROM entries WHERE expires < ?', (now,))
+                overflow = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.maxsize
+            if overflow > 0:
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)',
+                    (overflow,)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, key: str):
+        self._conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def clear(self):
+        with self.touch_lock:
+            self.touched.clear()
+        self._conn().execute('DELETE FROM entries')
+
+    def __len__(self) -> int:
+        return self._conn().execute(
+            'SELECT COUNT(*) FROM entries WHERE expires >= ?', (time.time(),)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {'backend': self.name, 'size': len(self), 'maxsize': self.maxsize, 'ttl': self.ttl, 'path': self.path}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          FACTORY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+CACHE_TYPES = {
+    'simple': 'memory', 'memory': 'memory', 'lru': 'memory', 'null': 'memory',
+    'mmap': 'mmap', 'shared': 'mmap', 'sharedmemory': 'mmap',
+    'sqlite': 'sqlite', 'file': 'sqlite', 'filesystem': 'sqlite',
+}
+
+def create_cache_backend(name: str, maxsize: int = 1000, ttl: int = 3600,
+                         cache_type: str = None, cache_dir: str = None):
+    """
+    Crée le backend d'un cache nommé selon Config.CACHE_TYPE.
+
+    Args:
+        name: Nom du cache (nom de fichier pour les backends partagés)
+        maxsize: Nombre maximal d'entrées
+        ttl: Durée de vie des entrées (secondes)
+        cache_type: Remplace Config.CACHE_TYPE
+        cache_dir: Remplace Config.CACHE_DIR
+
+    En cas d'échec d'un backend partagé, retombe sur le LRU en mémoire.
+    """
+    if cache_type is None or cache_dir is None:
+        from .config import get_config
+        config = get_config()
+        cache_type = cache_type or config.CACHE_TYPE
+        cache_dir = cache_dir or config.CACHE_DIR
+
+    kind = CACHE_TYPES.get(str(cache_type).lower())
+    if kind is None:
+        logger.warning(f"CACHE_TYPE inconnu '{cache_type}', utilisation du cache mémoire")
+        kind = 'memory'
+
+    try:
+        if kind == 'mmap':
+            from .config import get_config
+            slot_size = get_config().CACHE_MMAP_SLOT_SIZE
+            return MmapCacheBackend(os.path.join(cache_dir, f'{name}.mmap'), maxsize, ttl, slot_size=slot_size)
+        if kind == 'sqlite':
+            return SQLiteCacheBackend(os.path.join(cache_dir, f'{name}.sqlite3'), maxsize, ttl)
+    except Exception as e:
+        logger.warning(f"Backend de cache '{kind}' indisponible ({e}), utilisation du cache mémoire")
+
+    return MemoryCacheBackend(maxsize, ttl)
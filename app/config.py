@@ -11,6 +11,8 @@ class Config:
         raise ValueError("SECRET_KEY non définie. Créez un fichier .env avec SECRET_KEY=...")
     
     DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///instance/namz_ia.db')
+    # Stockage de la mémoire de conversation : 'file' (snapshot + journal) ou 'sqlite' (DATABASE_URL)
+    MEMORY_STORAGE = os.environ.get('MEMORY_STORAGE', 'file')
     
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:5000').split(',')
@@ -27,9 +29,11 @@ class Config:
     SESSION_TIMEOUT = int(os.environ.get('SESSION_TIMEOUT', 3600))
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 10000))
     
-    # Cache
+    # Cache des réponses IA : 'simple' (mémoire du processus), 'mmap' ou 'sqlite' (partagés entre workers)
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+    CACHE_DIR = os.environ.get('CACHE_DIR', 'instance/cache')  # Backends 'mmap' et 'sqlite'
+    CACHE_MMAP_SLOT_SIZE = int(os.environ.get('CACHE_MMAP_SLOT_SIZE', 32768))  # Taille max d'une entrée mmap
     
     DEBUG = False
     TESTING = False
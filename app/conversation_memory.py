@@ -20,6 +20,8 @@ Système avancé de gestion de mémoire conversationnelle avec:
 - TTL et garbage collection
 """
 
+import atexit
+import bisect
 import json
 import os
 import hashlib
@@ -29,14 +31,22 @@ import threading
 import pickle
 import gzip
 import base64
+import shutil
+import sys
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any, Tuple, Set, Callable
-from collections import Counter, OrderedDict, defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque
+from collections.abc import MutableMapping
 from functools import wraps, lru_cache
-from dataclasses import dataclass, asdict, field
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field, replace
 from enum import Enum
+from types import MappingProxyType
 import sqlite3
 
+from .keyword_automaton import KeywordHits, get_keyword_automaton
+from .text_index import BM25Index, MinHashLSH, words
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                                 ENUMS & TYPES
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -73,46 +83,266 @@ class ExportFormat(Enum):
     PICKLE = "pickle"
     SQLITE = "sqlite"
 
-@dataclass
+_EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(when: Any) -> float:
+    """Epoch float depuis un epoch, un datetime ou un ISO 8601 (naïf = UTC, comme datetime.utcnow)."""
+    if isinstance(when, (int, float)):
+        return float(when)
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    if when.tzinfo is None:
+        return (when - _EPOCH).total_seconds()
+    return when.timestamp()
+
+def to_iso(epoch: float) -> str:
+    """Epoch float → ISO 8601 naïf UTC (format de datetime.utcnow().isoformat())."""
+    return (_EPOCH + timedelta(seconds=epoch)).isoformat()
+
+class MessageIdGenerator:
+    """
+    Identifiants de messages triables, style ULID (26 caractères Crockford base32).
+    
+    10 caractères d'horodatage (ms) + 16 caractères aléatoires. Dans une même
+    milliseconde (ou si l'horloge recule), la partie aléatoire est incrémentée :
+    les ID d'un processus sont strictement croissants, donc sans collision.
+    """
+    
+    ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+    ALPHABET_SET = frozenset(ALPHABET)
+    TIME_LENGTH = 10
+    RANDOM_LENGTH = 16
+    RANDOM_MAX = (1 << 80) - 1
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.last_random = 0
+    
+    def new(self) -> str:
+        """Nouvel ID, strictement supérieur au précédent."""
+        with self.lock:
+            now = int(time.time() * 1000)
+            if now > self.last_ms:
+                self.last_ms = now
+                # Bit de poids fort à 0 : marge pour les incréments de la milliseconde
+                self.last_random = int.from_bytes(os.urandom(10), 'big') >> 1
+            else:
+                self.last_random += 1
+                if self.last_random > self.RANDOM_MAX:
+                    self.last_ms += 1
+                    self.last_random = 0
+            return self.encode(self.last_ms, self.TIME_LENGTH) + self.encode(self.last_random, self.RANDOM_LENGTH)
+    
+    @classmethod
+    def encode(cls, value: int, length: int) -> str:
+        chars = []
+        for _ in range(length):
+            value, digit = divmod(value, 32)
+            chars.append(cls.ALPHABET[digit])
+        return ''.join(reversed(chars))
+    
+    @classmethod
+    def is_valid(cls, message_id: str) -> bool:
+        """Vrai pour un ID triable (les anciens ID md5 ne le sont pas)."""
+        return (isinstance(message_id, str) and len(message_id) == cls.TIME_LENGTH + cls.RANDOM_LENGTH
+                and cls.ALPHABET_SET.issuperset(message_id))
+    
+    @classmethod
+    def timestamp_ms(cls, message_id: str) -> int:
+        """Horodatage (ms epoch) encodé dans un ID triable."""
+        value = 0
+        for char in message_id[:cls.TIME_LENGTH]:
+            value = value * 32 + cls.ALPHABET.index(char)
+        return value
+    
+    @classmethod
+    def lower_bound(cls, epoch: float) -> str:
+        """Plus petit ID possible à l'instant donné (epoch float)."""
+        return cls.encode(max(int(epoch * 1000), 0), cls.TIME_LENGTH) + '0' * cls.RANDOM_LENGTH
+    
+    @classmethod
+    def sort_key(cls, message: 'Message') -> str:
+        """
+        Clé d'ordre d'une session : l'ID s'il est triable, sinon (ancien ID md5)
+        la borne inférieure de son horodatage.
+        """
+        if cls.is_valid(message.message_id):
+            return message.message_id
+        return cls.lower_bound(message.created)
+
+# Instance globale
+_message_id_generator = MessageIdGenerator()
+
+def get_message_id_generator() -> MessageIdGenerator:
+    """Récupère le générateur global d'ID de messages."""
+    return _message_id_generator
+
+_EMPTY_METADATA = MappingProxyType({})
+_ROLES = {role.value: role for role in MessageRole}
+_PRIORITIES = {priority.value: priority for priority in Priority}
+
+def _clone(value: Any) -> Any:
+    """Copie profonde des conteneurs JSON (ce que faisait asdict sur les métadonnées)."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_clone(v) for v in value)
+    return value
+
 class Message:
-    """Structure de message enrichie."""
-    role: MessageRole
-    content: str
-    timestamp: str
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    session_id: str = "default"
-    message_id: str = field(default_factory=lambda: hashlib.md5(str(time.time()).encode()).hexdigest()[:16])
-    parent_id: Optional[str] = None
-    thread_id: Optional[str] = None
-    priority: Priority = Priority.NORMAL
-    tags: List[str] = field(default_factory=list)
-    embedding: Optional[List[float]] = None
-    tokens: int = 0
-    sentiment: Optional[float] = None
-    language: Optional[str] = None
-    edited: bool = False
-    deleted: bool = False
+    """
+    Structure de message enrichie, compacte (__slots__, sans __dict__).
+    
+    - horodatage en epoch float (`created`), ISO 8601 calculé à la demande
+    - session et langage internés, rôle et priorité en enums (singletons)
+    - métadonnées et tags matérialisés au premier accès en écriture
+    - sérialisation écrite à la main (pas de dataclasses.asdict)
+    """
+    
+    FIELDS = (
+        'role', 'content', 'timestamp', 'metadata', 'session_id', 'message_id', 'parent_id',
+        'thread_id', 'priority', 'tags', 'embedding', 'tokens', 'sentiment', 'language',
+        'edited', 'deleted'
+    )
+    
+    __slots__ = (
+        'role', 'content', 'created', '_metadata', 'session_id', 'message_id', 'parent_id',
+        'thread_id', 'priority', '_tags', 'embedding', 'tokens', 'sentiment', '_language',
+        'edited', 'deleted'
+    )
+    
+    def __init__(
+        self,
+        role: MessageRole,
+        content: str,
+        timestamp: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        session_id: str = "default",
+        message_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        priority: Priority = Priority.NORMAL,
+        tags: Optional[List[str]] = None,
+        embedding: Optional[List[float]] = None,
+        tokens: int = 0,
+        sentiment: Optional[float] = None,
+        language: Optional[str] = None,
+        edited: bool = False,
+        deleted: bool = False
+    ):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self._metadata = metadata or None
+        self.session_id = sys.intern(session_id) if type(session_id) is str else session_id
+        self.message_id = message_id or _message_id_generator.new()
+        self.parent_id = parent_id
+        self.thread_id = thread_id
+        self.priority = priority
+        self._tags = tags or None
+        self.embedding = embedding
+        self.tokens = tokens
+        self.sentiment = sentiment
+        self.language = language
+        self.edited = edited
+        self.deleted = deleted
+    
+    @property
+    def timestamp(self) -> str:
+        """Horodatage ISO 8601 (UTC naïf)."""
+        return to_iso(self.created)
+    
+    @timestamp.setter
+    def timestamp(self, value: Any):
+        try:
+            self.created = to_epoch(value)
+        except (TypeError, ValueError):
+            # Horodatage illisible : traité comme absent (cf. from_dict)
+            self.created = time.time()
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+    
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]):
+        self._metadata = value or None
+    
+    @property
+    def meta(self):
+        """Métadonnées en lecture seule, sans les matérialiser."""
+        return self._metadata or _EMPTY_METADATA
+    
+    @property
+    def tags(self) -> List[str]:
+        if self._tags is None:
+            self._tags = []
+        return self._tags
+    
+    @tags.setter
+    def tags(self, value: List[str]):
+        self._tags = value or None
+    
+    @property
+    def language(self) -> Optional[str]:
+        return self._language
+    
+    @language.setter
+    def language(self, value: Optional[str]):
+        self._language = sys.intern(value) if type(value) is str else value
+    
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return (f"Message(role={self.role.value!r}, message_id={self.message_id!r}, "
+                f"session_id={self.session_id!r}, timestamp={self.timestamp!r}, content={self.content[:40]!r})")
     
     def to_dict(self) -> Dict:
         """Convert to dictionary."""
-        data = asdict(self)
-        data['role'] = self.role.value
-        data['priority'] = self.priority.value
-        return data
+        return {
+            'role': self.role.value,
+            'content': self.content,
+            'timestamp': to_iso(self.created),
+            'metadata': _clone(self._metadata) if self._metadata else {},
+            'session_id': self.session_id,
+            'message_id': self.message_id,
+            'parent_id': self.parent_id,
+            'thread_id': self.thread_id,
+            'priority': self.priority.value,
+            'tags': list(self._tags) if self._tags else [],
+            'embedding': list(self.embedding) if self.embedding is not None else None,
+            'tokens': self.tokens,
+            'sentiment': self.sentiment,
+            'language': self._language,
+            'edited': self.edited,
+            'deleted': self.deleted,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Message':
         """Create from dictionary."""
         data = data.copy()
         
-        # Gérer ancien format (rétrocompatibilité)
+        # Gérer ancien format (rétrocompatibilité) ; enums par table (Enum() est lent)
         if 'role' in data:
-            if isinstance(data['role'], str):
-                data['role'] = MessageRole(data['role'])
+            role = data['role']
+            if isinstance(role, str):
+                data['role'] = _ROLES.get(role) or MessageRole(role)
         
         if 'priority' in data:
-            if isinstance(data['priority'], (int, str)):
-                data['priority'] = Priority(data.get('priority', Priority.NORMAL.value))
+            priority = data['priority']
+            if isinstance(priority, (int, str)):
+                data['priority'] = _PRIORITIES.get(priority) or Priority(priority)
         else:
             data['priority'] = Priority.NORMAL
         
@@ -120,7 +350,7 @@ class Message:
         if 'session_id' not in data:
             data['session_id'] = 'default'
         if 'timestamp' not in data:
-            data['timestamp'] = datetime.utcnow().isoformat()
+            data['timestamp'] = time.time()
         
         return cls(**data)
 
@@ -174,6 +404,134 @@ class SessionContext:
         
         return cls(**data)
 
+# ═══════════════════════════════════════════════════════════════════════════════
+#                           INCREMENTAL ANALYTICS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SpaceSaving:
+    """
+    Heavy hitters bornés (algorithme Space-Saving, Metwally et al.).
+    
+    Au plus `capacity` clés suivies ; une clé nouvelle remplace la moins
+    fréquente et hérite de son compteur (surestimation bornée par ce
+    compteur). Exact tant que le nombre de clés distinctes ≤ capacity.
+    """
+    
+    __slots__ = ('capacity', 'counts')
+    
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+    
+    def add(self, key: str, count: int = 1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < self.capacity:
+            counts[key] = count
+        else:
+            victim = min(counts, key=counts.get)
+            counts[key] = counts.pop(victim) + count
+    
+    def discard(self, key: str, count: int = 1):
+        """Retrait (archivage) : décrémente si la clé est suivie."""
+        if key in self.counts:
+            self.counts[key] -= count
+            if self.counts[key] <= 0:
+                del self.counts[key]
+    
+    def update(self, other: 'SpaceSaving'):
+        for key, count in other.counts.items():
+            self.add(key, count)
+    
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        # Tri stable : à égalité, ordre de première apparition (comme Counter)
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:n]
+    
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self.counts)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, int], capacity: int = 64) -> 'SpaceSaving':
+        sketch = cls(capacity)
+        for key, count in data.items():
+            sketch.add(key, count)
+        return sketch
+
+class SessionStats:
+    """
+    Agrégats courants d'une session (rôles, langages, sentiment, bornes
+    temporelles, mots-clés), tenus à jour par ajout, archivage et fusion.
+    """
+    
+    __slots__ = ('message_count', 'roles', 'languages', 'sentiment_sum', 'sentiment_count',
+                 'first', 'last', 'keywords')
+    
+    def __init__(self):
+        self.message_count = 0
+        self.roles: Counter = Counter()
+        self.languages: Counter = Counter()
+        self.sentiment_sum = 0.0
+        self.sentiment_count = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.keywords = SpaceSaving()
+    
+    @classmethod
+    def from_messages(cls, messages: List[Message]) -> 'SessionStats':
+        stats = cls()
+        for message in messages:
+            stats.add(message)
+        return stats
+    
+    def add(self, message: Message):
+        self.message_count += 1
+        self.roles[message.role.value] += 1
+        if message.language:
+            self.languages[message.language] += 1
+        if message.sentiment is not None:
+            self.sentiment_sum += message.sentiment
+            self.sentiment_count += 1
+        created = message.created
+        self.first = created if self.first is None else min(self.first, created)
+        self.last = created if self.last is None else max(self.last, created)
+        for keyword in message.meta.get('keywords', ()):
+            self.keywords.add(keyword)
+    
+    def remove(self, messages: List[Message], remaining: List[Message]):
+        """Retire des messages archivés ; `remaining` fixe les nouvelles bornes."""
+        for message in messages:
+            self.message_count -= 1
+            self._decrement(self.roles, message.role.value)
+            if message.language:
+                self._decrement(self.languages, message.language)
+            if message.sentiment is not None:
+                self.sentiment_sum -= message.sentiment
+                self.sentiment_count -= 1
+            for keyword in message.meta.get('keywords', ()):
+                self.keywords.discard(keyword)
+        
+        self.first = remaining[0].created if remaining else None
+        self.last = remaining[-1].created if remaining else None
+    
+    def merge(self, other: 'SessionStats'):
+        self.message_count += other.message_count
+        self.roles.update(other.roles)
+        self.languages.update(other.languages)
+        self.sentiment_sum += other.sentiment_sum
+        self.sentiment_count += other.sentiment_count
+        bounds = [b for b in (self.first, other.first) if b is not None]
+        self.first = min(bounds) if bounds else None
+        bounds = [b for b in (self.last, other.last) if b is not None]
+        self.last = max(bounds) if bounds else None
+        self.keywords.update(other.keywords)
+    
+    @staticmethod
+    def _decrement(counter: Counter, key: str):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                              CACHE & STORAGE LAYER
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -242,7 +600,9 @@ class StorageBackend:
     """Backend de stockage avec compression."""
     
     def __init__(self, base_path: str = 'instance'):
-        self.base_path = base_path
+        # Chemin absolu : le journal, ouvert à la première écriture (jusqu'à
+        # close() en fin de processus), ne suit pas les changements de cwd
+        self.base_path = os.path.abspath(base_path)
         os.makedirs(base_path, exist_ok=True)
         self.lock = threading.Lock()
     
@@ -252,16 +612,21 @@ class StorageBackend:
         
         with self.lock:
             try:
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
                 json_data = json.dumps(data, indent=2, ensure_ascii=False)
                 
                 if compress:
                     # Compression gzip
-                    compressed = gzip.compress(json_data.encode('utf-8'))
-                    with open(filepath + '.gz', 'wb') as f:
-                        f.write(compressed)
+                    filepath += '.gz'
+                    payload = gzip.compress(json_data.encode('utf-8'))
                 else:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(json_data)
+                    payload = json_data.encode('utf-8')
+                
+                # Écriture atomique : un crash ne laisse jamais un fichier tronqué
+                tmp_path = filepath + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, filepath)
                 
                 return True
             except Exception as e:
@@ -288,6 +653,670 @@ class StorageBackend:
                 print(f"Erreur chargement: {e}")
                 return None
 
+class ShardStore:
+    """
+    Persistance par session : un fichier compressé par session (shard) et un
+    manifeste (metadata, analytics, lsn du journal, shards et contextes).
+    Depuis 'shards/2' le manifeste porte les contextes : le démarrage ne lit
+    que lui, les shards sont relus à la demande.
+    
+    Seules les sessions modifiées depuis la dernière écriture sont
+    réencodées : le coût d'une sauvegarde suit le nombre de sessions
+    touchées, pas la taille totale de la mémoire.
+    """
+    
+    FORMAT = 'shards/2'
+    MANIFEST = 'manifest.json'
+    SHARD_DIR = 'sessions'
+    
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.storage = StorageBackend(base_path)
+    
+    @staticmethod
+    def shard_name(session_id: str) -> str:
+        """Nom de fichier stable et sûr : préfixe lisible + empreinte de l'ID."""
+        prefix = re.sub(r'[^A-Za-z0-9_-]', '', session_id)[:32]
+        digest = hashlib.md5(session_id.encode('utf-8')).hexdigest()[:12]
+        return f"{prefix}-{digest}" if prefix else digest
+    
+    def _shard_file(self, name: str) -> str:
+        return os.path.join(self.SHARD_DIR, f"{name}.json")
+    
+    def load_manifest(self) -> Optional[Dict]:
+        """Manifeste, ou None si aucun jeu de shards n'existe encore."""
+        return self.storage.load(self.MANIFEST, compressed=False)
+    
+    def save_manifest(self, manifest: Dict) -> bool:
+        """Écrit le manifeste (toujours après les shards qu'il référence)."""
+        return self.storage.save(self.MANIFEST, manifest, compress=False)
+    
+    def load_shard(self, name: str) -> Optional[Dict]:
+        return self.storage.load(self._shard_file(name), compressed=True)
+    
+    def save_shard(self, name: str, shard: Dict) -> bool:
+        return self.storage.save(self._shard_file(name), shard, compress=True)
+    
+    def remove_shard(self, name: str):
+        """Supprime le shard d'une session qui n'est plus dans le manifeste."""
+        try:
+            os.remove(os.path.join(self.base_path, self._shard_file(name) + '.gz'))
+        except FileNotFoundError:
+            pass
+    
+    def copy_to(self, dest: str) -> Dict:
+        """
+        Copie le jeu de shards (fichiers déjà compressés, sans réencodage)
+        vers `dest` : shards référencés d'abord, manifeste en dernier.
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            raise FileNotFoundError(os.path.join(self.base_path, self.MANIFEST))
+        
+        os.makedirs(os.path.join(dest, self.SHARD_DIR), exist_ok=True)
+        for entry in manifest['sessions'].values():
+            relpath = self._shard_file(entry['shard']) + '.gz'
+            shutil.copy2(os.path.join(self.base_path, relpath), os.path.join(dest, relpath))
+        shutil.copy2(os.path.join(self.base_path, self.MANIFEST), os.path.join(dest, self.MANIFEST))
+        
+        return manifest
+
+class PagedSessions(MutableMapping):
+    """
+    Sessions → messages, hydratées à la demande et évincées (LRU) sous budget.
+    
+    Les clés couvrent toutes les sessions connues. Une session paginée ne
+    garde en mémoire que son nombre de messages ; `loader` relit ses messages
+    au premier accès. L'éviction est pilotée par ConversationMemory (seules
+    les sessions déjà persistées peuvent repartir sur disque).
+    
+    Thread-safe : un verrou interne protège la table et les compteurs ; les
+    listes de messages renvoyées sont lisibles sans verrou (ajout en place,
+    toute autre modification remplace la liste).
+    """
+    
+    # Octets estimés par message hors contenu (objet, ID, entrées d'index)
+    MESSAGE_OVERHEAD = 512
+    
+    def __init__(self, loader: Optional[Callable[[str], List['Message']]] = None,
+                 on_hydrate: Optional[Callable[[str, List['Message']], None]] = None):
+        self.resident: 'OrderedDict[str, List[Message]]' = OrderedDict()
+        self.paged: Dict[str, int] = {}
+        self.sizes: Dict[str, int] = {}
+        self.resident_bytes = 0
+        self.loader = loader
+        self.on_hydrate = on_hydrate
+        self.hydrations = 0
+        self.evictions = 0
+        self.loading: Dict[str, threading.Event] = {}
+        self.lock = threading.RLock()
+    
+    @classmethod
+    def estimate(cls, messages: List['Message']) -> int:
+        """Empreinte estimée (octets) d'une liste de messages."""
+        return sum(cls.MESSAGE_OVERHEAD + len(m.content) for m in messages)
+    
+    def __getitem__(self, session_id: str) -> List['Message']:
+        # Session résidente : sans verrou (opérations unitaires de l'OrderedDict)
+        messages = self.resident.get(session_id)
+        if messages is not None:
+            try:
+                self.resident.move_to_end(session_id)
+            except KeyError:
+                pass  # Évincée entre-temps : la liste lue reste valable
+            return messages
+        if session_id not in self.paged:
+            raise KeyError(session_id)
+        return self.hydrate(session_id)
+    
+    def __setitem__(self, session_id: str, messages: List['Message']):
+        size = self.estimate(messages)
+        with self.lock:
+            self.paged.pop(session_id, None)
+            self.resident_bytes += size - self.sizes.get(session_id, 0)
+            self.sizes[session_id] = size
+            self.resident[session_id] = messages
+            self.resident.move_to_end(session_id)
+    
+    def __delitem__(self, session_id: str):
+        with self.lock:
+            if session_id in self.resident:
+                del self.resident[session_id]
+                self.resident_bytes -= self.sizes.pop(session_id)
+            else:
+                del self.paged[session_id]
+    
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self.resident or session_id in self.paged
+    
+    def __iter__(self):
+        # Copie : l'itération peut hydrater des sessions
+        with self.lock:
+            return iter(list(self.resident) + list(self.paged))
+    
+    def __len__(self) -> int:
+        return len(self.resident) + len(self.paged)
+    
+    def hydrate(self, session_id: str, cold: bool = False) -> List['Message']:
+        """
+        Charge une session paginée ; `cold` la place en tête d'éviction (préchargement).
+        Lecture du shard hors verrou (les autres sessions restent accessibles),
+        un seul chargement par session : les autres demandeurs l'attendent.
+        """
+        with self.lock:
+            if session_id not in self.paged:
+                return self.resident.get(session_id, [])
+            loading = self.loading.get(session_id)
+            owner = loading is None
+            if owner:
+                loading = self.loading[session_id] = threading.Event()
+        
+        if not owner:
+            loading.wait()
+            return self.hydrate(session_id, cold)
+        
+        try:
+            messages = self.loader(session_id)
+            with self.lock:
+                if session_id not in self.paged:
+                    # Remplacée ou supprimée pendant le chargement
+                    return self.resident.get(session_id, [])
+                self[session_id] = messages
+                if cold:
+                    self.resident.move_to_end(session_id, last=False)
+                self.hydrations += 1
+                if self.on_hydrate:
+                    self.on_hydrate(session_id, messages)
+                return messages
+        finally:
+            with self.lock:
+                del self.loading[session_id]
+            loading.set()
+    
+    def ensure(self, session_id: Optional[str]):
+        """Hydrate la session si elle est paginée."""
+        if session_id in self.paged:
+            self.hydrate(session_id)
+    
+    def add_paged(self, session_id: str, count: int):
+        """Déclare une session présente sur disque seulement."""
+        self.paged[session_id] = count
+    
+    def page_out(self, session_id: str) -> List['Message']:
+        """Retire les messages d'une session résidente (ils restent sur disque)."""
+        with self.lock:
+            messages = self.resident.pop(session_id)
+            self.resident_bytes -= self.sizes.pop(session_id)
+            self.paged[session_id] = len(messages)
+            self.evictions += 1
+            return messages
+    
+    def peek(self, session_id: str) -> List['Message']:
+        """Messages d'une session résidente ([] si paginée ou inconnue), sans hydrater."""
+        return self.resident.get(session_id, [])
+    
+    def account(self, session_id: str, nbytes: int):
+        """Ajoute l'empreinte d'un message ajouté en place."""
+        with self.lock:
+            self.sizes[session_id] = self.sizes.get(session_id, 0) + nbytes
+            self.resident_bytes += nbytes
+    
+    def resize(self, session_id: str):
+        """Réestime une session résidente modifiée en bloc."""
+        with self.lock:
+            if session_id in self.resident:
+                self[session_id] = self.resident[session_id]
+    
+    def message_count(self, session_id: str) -> int:
+        messages = self.resident.get(session_id)
+        return len(messages) if messages is not None else self.paged.get(session_id, 0)
+    
+    def message_counts(self) -> Dict[str, int]:
+        with self.lock:
+            counts = {sid: len(messages) for sid, messages in self.resident.items()}
+            counts.update(self.paged)
+            return counts
+    
+    def resident_items(self) -> List[Tuple[str, List['Message']]]:
+        with self.lock:
+            return list(self.resident.items())
+    
+    def lru(self) -> List[str]:
+        """Sessions résidentes, de la moins à la plus récemment utilisée."""
+        with self.lock:
+            return list(self.resident)
+    
+    def reset(self, sessions: Dict[str, List['Message']]):
+        """Remplace tout le contenu par des sessions résidentes."""
+        with self.lock:
+            self.resident.clear()
+            self.paged.clear()
+            self.sizes.clear()
+            self.resident_bytes = 0
+            for sid, messages in sessions.items():
+                self[sid] = messages
+    
+    def stats(self) -> Dict:
+        return {
+            'resident_sessions': len(self.resident),
+            'paged_sessions': len(self.paged),
+            'resident_mb': round(self.resident_bytes / (1024 * 1024), 2),
+            'hydrations': self.hydrations,
+            'evictions': self.evictions
+        }
+
+class WriteAheadLog:
+    """
+    Journal append-only (JSONL) des opérations de la mémoire.
+    
+    Chaque opération est une ligne JSON numérotée (`lsn`), ajoutée en fin de
+    fichier : le coût d'un add_message ne dépend plus de la taille de
+    l'historique. La compaction replie le journal dans un snapshot (qui
+    mémorise le dernier lsn appliqué) ; au démarrage, snapshot + journal
+    reconstituent l'état.
+    
+    Politiques fsync :
+    - 'always'   : fsync à chaque écriture (opération ou lot)
+    - 'interval' : fsync au plus toutes les `fsync_interval` secondes
+    - 'never'    : flush vers l'OS seulement (perte possible en cas de crash OS)
+    """
+    
+    FSYNC_POLICIES = ('always', 'interval', 'never')
+    
+    def __init__(self, path: str, fsync: str = 'interval', fsync_interval: float = 1.0):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"fsync doit être dans {self.FSYNC_POLICIES}")
+        
+        self.path = path
+        self.rotated_path = path + '.1'
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.lsn = 0
+        self.records = 0
+        self.file = None
+        self.last_sync = time.time()
+        self.lock = threading.Lock()
+    
+    def recover(self, after_lsn: int = 0):
+        """
+        Relit le journal (rotation interrompue comprise) et produit les
+        opérations postérieures au snapshot. Une fin de fichier tronquée
+        (crash pendant une écriture) est ignorée puis coupée.
+        """
+        self.lsn = max(self.lsn, after_lsn)
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            
+            valid_size = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+                    
+                    if path == self.path:
+                        self.records += 1
+                    if record['lsn'] > self.lsn:
+                        self.lsn = record['lsn']
+                    if record['lsn'] > after_lsn:
+                        yield record
+            
+            if valid_size < os.path.getsize(path):
+                print(f"⚠ Journal {path} tronqué à {valid_size} octets (fin incomplète ignorée)")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_size)
+    
+    def append(self, op: str, data: Dict) -> int:
+        """Ajoute une opération au journal et retourne son lsn."""
+        return self.append_many([(op, data)])
+    
+    def append_many(self, operations: List[Tuple[str, Dict]]) -> int:
+        """
+        Ajoute un lot d'opérations en une seule écriture (un fsync au plus)
+        et retourne le lsn de la dernière.
+        """
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'ab')
+            
+            lines = []
+            for op, data in operations:
+                self.lsn += 1
+                record = {'lsn': self.lsn, 'op': op, **data}
+                lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+            self.file.write(b''.join(lines))
+            self.file.flush()
+            self.records += len(lines)
+            
+            if self.fsync == 'always' or (
+                self.fsync == 'interval' and time.time() - self.last_sync >= self.fsync_interval
+            ):
+                os.fsync(self.file.fileno())
+                self.last_sync = time.time()
+            
+            return self.lsn
+    
+    def sync(self):
+        """Force l'écriture sur disque des opérations en attente."""
+        with self.lock:
+            if self.file is not None and self.fsync != 'never':
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.last_sync = time.time()
+    
+    def rotate(self) -> int:
+        """
+        Début de compaction : le journal courant devient `<path>.1` et un
+        nouveau journal vide est ouvert. Retourne le dernier lsn du journal tourné.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                if self.fsync != 'never':
+                    os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+            
+            if os.path.exists(self.path):
+                if os.path.exists(self.rotated_path):
+                    # Compaction précédente interrompue : concaténer
+                    with open(self.rotated_path, 'ab') as dst, open(self.path, 'rb') as src:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.rotated_path)
+            
+            self.records = 0
+            return self.lsn
+    
+    def discard_rotated(self):
+        """Fin de compaction : le snapshot couvre le journal tourné."""
+        with self.lock:
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+    
+    def close(self):
+        """Ferme le journal."""
+        self.sync()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+    
+    def stats(self) -> Dict:
+        """Statistiques du journal."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            'lsn': self.lsn,
+            'records': self.records,
+            'size_kb': round(size / 1024, 2),
+            'fsync': self.fsync
+        }
+
+class SQLiteStorageBackend:
+    """
+    Stockage SQLite (mode WAL) de la mémoire de conversation.
+    
+    - messages : une ligne par message (colonnes indexées + message complet en
+      JSON), index (session_id, timestamp) et (message_id)
+    - contexts : un contexte par session (status / updated_at indexés)
+    - meta : metadata et analytics globales
+    
+    Les écritures sont mises en file puis insérées par lots (executemany dans
+    une seule transaction) ; chaque lecture vide d'abord la file.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            parent_id TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_messages_id ON messages(message_id);
+        CREATE TABLE IF NOT EXISTS contexts (
+            session_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_contexts_updated ON contexts(updated_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    # Ancien index plein texte (recherche servie par l'index BM25 en mémoire)
+    DROP_FTS = """
+        DROP TRIGGER IF EXISTS messages_fts_insert;
+        DROP TRIGGER IF EXISTS messages_fts_delete;
+        DROP TABLE IF EXISTS messages_fts;
+    """
+    
+    INSERT_MESSAGE = """
+        INSERT INTO messages (message_id, session_id, timestamp, role, content, parent_id, deleted, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    UPDATE_MESSAGE = "UPDATE messages SET data = ? WHERE message_id = ?"
+    UPSERT_CONTEXT = "INSERT OR REPLACE INTO contexts (session_id, status, updated_at, data) VALUES (?, ?, ?, ?)"
+    UPSERT_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+    
+    def __init__(self, path: str):
+        self.path = path
+        
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self.conn.executescript(self.DROP_FTS)
+        
+        self.pending_messages: List[tuple] = []
+        self.pending_updates: Dict[str, tuple] = {}
+        self.pending_contexts: Dict[str, tuple] = {}
+        self.pending_meta: Dict[str, str] = {}
+        self.lock = threading.RLock()
+    
+    @classmethod
+    def from_url(cls, database_url: str, **kwargs) -> 'SQLiteStorageBackend':
+        """Crée le backend depuis une URL `sqlite:///chemin/relatif.db` ou `sqlite:////chemin/absolu.db`."""
+        if not database_url.startswith('sqlite://'):
+            raise ValueError(f"DATABASE_URL non supportée pour la mémoire: {database_url}")
+        
+        path = database_url[len('sqlite:///'):] if database_url.startswith('sqlite:///') else ''
+        return cls(path or ':memory:', **kwargs)
+    
+    # ─── Écritures (par lots) ───
+    
+    def add_message(self, message: 'Message'):
+        """Met un message en file d'insertion."""
+        data = message.to_dict()
+        with self.lock:
+            self.pending_messages.append((
+                message.message_id, message.session_id, message.timestamp, data['role'],
+                message.content, message.parent_id, int(message.deleted),
+                json.dumps(data, ensure_ascii=False)
+            ))
+    
+    def update_message(self, message: 'Message'):
+        """Met à jour les données d'un message déjà inséré (enrichissement différé)."""
+        data = json.dumps(message.to_dict(), ensure_ascii=False)
+        with self.lock:
+            self.pending_updates[message.message_id] = (data, message.message_id)
+    
+    def save_context(self, context: 'SessionContext'):
+        """Met à jour le contexte d'une session (seule la dernière version est écrite)."""
+        data = context.to_dict()
+        with self.lock:
+            self.pending_contexts[context.session_id] = (
+                context.session_id, data['status'], context.updated_at, json.dumps(data, ensure_ascii=False)
+            )
+    
+    def set_meta(self, key: str, value: Any):
+        """Met à jour une valeur globale (metadata, analytics)."""
+        with self.lock:
+            self.pending_meta[key] = json.dumps(value, ensure_ascii=False)
+    
+    def flush(self):
+        """Écrit la file en une transaction."""
+        with self.lock:
+            if not (self.pending_messages or self.pending_updates or self.pending_contexts or self.pending_meta):
+                return
+            
+            with self._transaction():
+                if self.pending_messages:
+                    self.conn.executemany(self.INSERT_MESSAGE, self.pending_messages)
+                if self.pending_updates:
+                    self.conn.executemany(self.UPDATE_MESSAGE, list(self.pending_updates.values()))
+                if self.pending_contexts:
+                    self.conn.executemany(self.UPSERT_CONTEXT, list(self.pending_contexts.values()))
+                if self.pending_meta:
+                    self.conn.executemany(self.UPSERT_META, list(self.pending_meta.items()))
+            
+            self.pending_messages = []
+            self.pending_updates = {}
+            self.pending_contexts = {}
+            self.pending_meta = {}
+    
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+    
+    def delete_messages(self, session_id: str, message_ids: List[str]):
+        """Supprime des messages d'une session (archivage)."""
+        with self.lock:
+            self.flush()
+            with self._transaction():
+                self.conn.executemany(
+                    "DELETE FROM messages WHERE session_id = ? AND message_id = ?",
+                    [(session_id, mid) for mid in message_ids]
+                )
+    
+    def delete_session(self, session_id: str):
+        """Supprime une session et ses messages."""
+        with self.lock:
+            self.flush()
+            with self._transaction():
+                self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self.conn.execute("DELETE FROM contexts WHERE session_id = ?", (session_id,))
+    
+    def replace_all(self, sessions: Dict[str, List['Message']], contexts: Dict[str, 'SessionContext'],
+                    meta: Dict[str, Any]):
+        """Remplace tout le contenu (opérations globales : suppression, fusion, import, restauration)."""
+        with self.lock:
+            self.pending_messages = []
+            self.pending_updates = {}
+            self.pending_contexts = {}
+            self.pending_meta = {}
+            for messages in sessions.values():
+                for message in messages:
+                    self.add_message(message)
+            for context in contexts.values():
+                self.save_context(context)
+            for key, value in meta.items():
+                self.set_meta(key, value)
+            
+            with self._transaction():
+                self.conn.execute("DELETE FROM messages")
+                self.conn.execute("DELETE FROM contexts")
+                self.conn.executemany(self.INSERT_MESSAGE, self.pending_messages)
+                self.conn.executemany(self.UPSERT_CONTEXT, list(self.pending_contexts.values()))
+                self.conn.executemany(self.UPSERT_META, list(self.pending_meta.items()))
+            
+            self.pending_messages = []
+            self.pending_updates = {}
+            self.pending_contexts = {}
+            self.pending_meta = {}
+    
+    # ─── Lectures (requêtes indexées) ───
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self.lock:
+            self.flush()
+            return self.conn.execute(sql, params).fetchall()
+    
+    def load(self) -> Tuple[Dict[str, List['Message']], Dict[str, 'SessionContext'], Dict[str, Any]]:
+        """Charge sessions, contextes et valeurs globales."""
+        sessions: Dict[str, List[Message]] = {}
+        for session_id, data in self._query(
+            "SELECT session_id, data FROM messages ORDER BY session_id, timestamp, seq"
+        ):
+            sessions.setdefault(session_id, []).append(Message.from_dict(json.loads(data)))
+        
+        contexts = {
+            session_id: SessionContext.from_dict(json.loads(data))
+            for session_id, data in self._query("SELECT session_id, data FROM contexts")
+        }
+        for session_id in contexts:
+            sessions.setdefault(session_id, [])
+        
+        meta = {key: json.loads(value) for key, value in self._query("SELECT key, value FROM meta")}
+        return sessions, contexts, meta
+    
+    def recent_messages(self, session_id: str, limit: int, role: Optional[str] = None) -> List['Message']:
+        """Derniers messages d'une session (ordre chronologique)."""
+        if role:
+            rows = self._query(
+                "SELECT data FROM messages WHERE session_id = ? AND role = ? "
+                "ORDER BY timestamp DESC, seq DESC LIMIT ?", (session_id, role, limit)
+            )
+        else:
+            rows = self._query(
+                "SELECT data FROM messages WHERE session_id = ? "
+                "ORDER BY timestamp DESC, seq DESC LIMIT ?", (session_id, limit)
+            )
+        return [Message.from_dict(json.loads(data)) for (data,) in reversed(rows)]
+    
+    def list_contexts(self, status: Optional[str] = None, limit: Optional[int] = None) -> List['SessionContext']:
+        """Contextes triés par date de mise à jour décroissante."""
+        sql = "SELECT data FROM contexts"
+        params: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            params = (status,)
+        sql += " ORDER BY updated_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [SessionContext.from_dict(json.loads(data)) for (data,) in self._query(sql, params)]
+    
+    def close(self):
+        """Écrit la file et ferme la connexion."""
+        with self.lock:
+            self.flush()
+            self.conn.close()
+    
+    def stats(self) -> Dict:
+        """Statistiques du stockage."""
+        (messages,), = self._query("SELECT COUNT(*) FROM messages")
+        (sessions,), = self._query("SELECT COUNT(*) FROM contexts")
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'messages': messages,
+            'sessions': sessions
+        }
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                           NLP & ANALYSIS UTILITIES
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -325,89 +1354,131 @@ class NLPAnalyzer:
         'clarification': [r'^(tu veux dire|c\'est à dire|donc)', r'^(you mean|so|therefore|thus)'],
     }
     
+    # Tables compilées une fois (motifs regex, lexiques en frozenset)
+    INTENT_RULES = tuple(
+        (intent, re.compile('|'.join(f'(?:{p})' for p in patterns)))
+        for intent, patterns in INTENT_PATTERNS.items()
+    )
+    
+    ENTITY_PATTERNS = (
+        ('urls', re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')),
+        ('emails', re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')),
+        ('files', re.compile(r'\b\w+\.(py|js|html|css|json|txt|md|csv|sql|java|cpp|c|h)\b')),
+        ('numbers', re.compile(r'\b\d+(?:\.\d+)?\b')),
+        ('code_blocks', re.compile(r'```[\s\S]*?```')),
+    )
+    
+    POSITIVE_WORDS = frozenset([
+        'bon', 'bien', 'super', 'excellent', 'parfait', 'génial', 'merci', 'bravo',
+        'good', 'great', 'excellent', 'perfect', 'awesome', 'thanks', 'wonderful'
+    ])
+    
+    NEGATIVE_WORDS = frozenset([
+        'mauvais', 'mal', 'erreur', 'problème', 'bug', 'nul', 'pas bon',
+        'bad', 'wrong', 'error', 'problem', 'bug', 'terrible', 'awful'
+    ])
+    
+    STOP_WORDS = frozenset([
+        'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'ou', 'mais',
+        'est', 'sont', 'a', 'ai', 'as', 'ont', 'ce', 'cette', 'ces',
+        'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were',
+        'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'
+    ])
+    
     @staticmethod
-    def detect_language(text: str) -> Optional[str]:
-        """Détecte le langage de programmation."""
-        text_lower = text.lower()
-        scores = {}
+    def analyze(text: str, top_keywords: int = 5, hits: Optional[KeywordHits] = None) -> Dict[str, Any]:
+        """
+        Analyse complète en une passe : minuscules, scan de l'automate et
+        tokenisation faits une seule fois pour toutes les détections.
         
-        for lang, keywords in NLPAnalyzer.LANGUAGE_KEYWORDS.items():
-            score = sum(1 for kw in keywords if kw.lower() in text_lower)
-            if score > 0:
-                scores[lang] = score
+        Returns:
+            language, domain, intents, entities, sentiment et keywords (mots
+            seuls), identiques aux méthodes detect_*/extract_* appelées une à une
+        """
+        text_lower = text.lower()
+        if hits is None:
+            hits = get_keyword_automaton().scan(text_lower)
+        tokens = words(text)
         
-        if scores:
-            return max(scores.items(), key=lambda x: x[1])[0]
-        return None
+        return {
+            'language': NLPAnalyzer._best_category(hits, 'nlp_language:', NLPAnalyzer.LANGUAGE_KEYWORDS),
+            'domain': NLPAnalyzer._best_category(hits, 'nlp_domain:', NLPAnalyzer.DOMAIN_KEYWORDS),
+            'intents': NLPAnalyzer._intents(text_lower.strip()),
+            'entities': NLPAnalyzer.extract_entities(text),
+            'sentiment': NLPAnalyzer._sentiment(tokens),
+            'keywords': [kw for kw, _ in NLPAnalyzer._keywords(tokens, top_keywords)],
+        }
     
     @staticmethod
-    def detect_domain(text: str) -> Optional[str]:
-        """Détecte le domaine technique."""
-        text_lower = text.lower()
-        scores = {}
+    def _best_category(hits: KeywordHits, prefix: str, table: Dict[str, List[str]]) -> Optional[str]:
+        """Catégorie la plus citée (la première de la table en cas d'égalité)."""
+        best, best_score = None, 0
+        for name in table:
+            score = hits.count(prefix + name)
+            if score > best_score:
+                best, best_score = name, score
+        return best
+    
+    @staticmethod
+    def _intents(text_lower: str) -> List[str]:
+        intents = [intent for intent, pattern in NLPAnalyzer.INTENT_RULES if pattern.search(text_lower)]
+        return intents if intents else ['statement']
+    
+    @staticmethod
+    def _sentiment(tokens: List[str]) -> float:
+        positive_count = negative_count = 0
+        for token in tokens:
+            if token in NLPAnalyzer.POSITIVE_WORDS:
+                positive_count += 1
+            if token in NLPAnalyzer.NEGATIVE_WORDS:
+                negative_count += 1
         
-        for domain, keywords in NLPAnalyzer.DOMAIN_KEYWORDS.items():
-            score = sum(1 for kw in keywords if kw.lower() in text_lower)
-            if score > 0:
-                scores[domain] = score
+        total = positive_count + negative_count
+        if total == 0:
+            return 0.0
         
-        if scores:
-            return max(scores.items(), key=lambda x: x[1])[0]
-        return None
+        return (positive_count - negative_count) / total
+    
+    @staticmethod
+    def _keywords(tokens: List[str], top_n: int) -> List[Tuple[str, int]]:
+        stop_words = NLPAnalyzer.STOP_WORDS
+        return Counter(w for w in tokens if len(w) > 3 and w not in stop_words).most_common(top_n)
+    
+    @staticmethod
+    def detect_language(text: str, hits: Optional[KeywordHits] = None) -> Optional[str]:
+        """Détecte le langage de programmation (un seul scan de l'automate de mots-clés)."""
+        if hits is None:
+            hits = get_keyword_automaton().scan(text.lower())
+        return NLPAnalyzer._best_category(hits, 'nlp_language:', NLPAnalyzer.LANGUAGE_KEYWORDS)
+    
+    @staticmethod
+    def detect_domain(text: str, hits: Optional[KeywordHits] = None) -> Optional[str]:
+        """Détecte le domaine technique (un seul scan de l'automate de mots-clés)."""
+        if hits is None:
+            hits = get_keyword_automaton().scan(text.lower())
+        return NLPAnalyzer._best_category(hits, 'nlp_domain:', NLPAnalyzer.DOMAIN_KEYWORDS)
     
     @staticmethod
     def detect_intent(text: str) -> List[str]:
         """Détecte les intentions dans le texte."""
-        intents = []
-        text_lower = text.lower().strip()
-        
-        for intent, patterns in NLPAnalyzer.INTENT_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    intents.append(intent)
-                    break
-        
-        return intents if intents else ['statement']
+        return NLPAnalyzer._intents(text.lower().strip())
     
     @staticmethod
     def extract_entities(text: str) -> Dict[str, List[str]]:
-        """Extrait des entités basiques."""
-        entities = {
-            'urls': [],
-            'emails': [],
-            'files': [],
-            'numbers': [],
-            'code_blocks': []
-        }
-        
-        # URLs
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        entities['urls'] = re.findall(url_pattern, text)
-        
-        # Emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        entities['emails'] = re.findall(email_pattern, text)
-        
-        # Fichiers
-        file_pattern = r'\b\w+\.(py|js|html|css|json|txt|md|csv|sql|java|cpp|c|h)\b'
-        entities['files'] = re.findall(file_pattern, text)
-        
-        # Nombres
-        number_pattern = r'\b\d+(?:\.\d+)?\b'
-        entities['numbers'] = re.findall(number_pattern, text)
-        
-        # Blocs de code (```...```)
-        code_pattern = r'```[\s\S]*?```'
-        entities['code_blocks'] = re.findall(code_pattern, text)
-        
-        return {k: v for k, v in entities.items() if v}
+        """Extrait des entités basiques (URLs, emails, fichiers, nombres, blocs de code)."""
+        entities = {}
+        for name, pattern in NLPAnalyzer.ENTITY_PATTERNS:
+            found = pattern.findall(text)
+            if found:
+                entities[name] = found
+        return entities
     
     @staticmethod
     def calculate_similarity(text1: str, text2: str) -> float:
         """Calcule similarité basique entre deux textes."""
         # Tokenization simple
-        words1 = set(re.findall(r'\w+', text1.lower()))
-        words2 = set(re.findall(r'\w+', text2.lower()))
+        words1 = set(words(text1))
+        words2 = set(words(text2))
         
         if not words1 or not words2:
             return 0.0
@@ -421,43 +1492,12 @@ class NLPAnalyzer:
     @staticmethod
     def sentiment_analysis(text: str) -> float:
         """Analyse de sentiment basique (-1 à 1)."""
-        positive_words = [
-            'bon', 'bien', 'super', 'excellent', 'parfait', 'génial', 'merci', 'bravo',
-            'good', 'great', 'excellent', 'perfect', 'awesome', 'thanks', 'wonderful'
-        ]
-        
-        negative_words = [
-            'mauvais', 'mal', 'erreur', 'problème', 'bug', 'nul', 'pas bon',
-            'bad', 'wrong', 'error', 'problem', 'bug', 'terrible', 'awful'
-        ]
-        
-        words = re.findall(r'\w+', text.lower())
-        
-        positive_count = sum(1 for w in words if w in positive_words)
-        negative_count = sum(1 for w in words if w in negative_words)
-        
-        total = positive_count + negative_count
-        if total == 0:
-            return 0.0
-        
-        return (positive_count - negative_count) / total
+        return NLPAnalyzer._sentiment(words(text))
     
     @staticmethod
     def extract_keywords(text: str, top_n: int = 10) -> List[Tuple[str, int]]:
-        """Extrait les mots-clés les plus fréquents."""
-        # Mots à ignorer
-        stop_words = {
-            'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'ou', 'mais',
-            'est', 'sont', 'a', 'ai', 'as', 'ont', 'ce', 'cette', 'ces',
-            'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were',
-            'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'
-        }
-        
-        words = re.findall(r'\w+', text.lower())
-        words = [w for w in words if len(w) > 3 and w not in stop_words]
-        
-        counter = Counter(words)
-        return counter.most_common(top_n)
+        """Extrait les mots-clés les plus fréquents (hors mots vides, plus de 3 lettres)."""
+        return NLPAnalyzer._keywords(words(text), top_n)
     
     @staticmethod
     def summarize_text(text: str, max_sentences: int = 3) -> str:
@@ -477,6 +1517,12 @@ class NLPAnalyzer:
             middle_idx = len(sentences) // 2
             return sentences[0] + '. ' + sentences[middle_idx] + '. ' + sentences[-1] + '.'
 
+# Tables de NLPAnalyzer compilées dans l'automate de mots-clés partagé
+for _lang, _keywords in NLPAnalyzer.LANGUAGE_KEYWORDS.items():
+    get_keyword_automaton().register(f'nlp_language:{_lang}', _keywords)
+for _domain, _keywords in NLPAnalyzer.DOMAIN_KEYWORDS.items():
+    get_keyword_automaton().register(f'nlp_domain:{_domain}', _keywords)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                         MAIN CONVERSATION MEMORY CLASS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -510,7 +1556,16 @@ class ConversationMemory:
         compress: bool = True,
         enable_nlp: bool = True,
         max_sessions: int = 100,
-        max_messages_per_session: int = 10000
+        max_messages_per_session: int = 10000,
+        wal_fsync: str = 'interval',
+        wal_compact_records: int = 10000,
+        database_url: Optional[str] = None,
+        flush_max_delay: float = 1.0,
+        flush_max_pending: int = 256,
+        memory_budget_mb: float = 256,
+        enrich_queue_size: int = 1024,
+        enrich_batch_size: int = 32,
+        lock_stripes: int = 64
     ):
         """
         Initialise le système de mémoire avancé.
@@ -524,6 +1579,19 @@ class ConversationMemory:
             enable_nlp: Activer l'analyse NLP
             max_sessions: Nombre max de sessions
             max_messages_per_session: Messages max par session
+            wal_fsync: Politique fsync du journal ('always', 'interval', 'never')
+            wal_compact_records: Taille du journal déclenchant une compaction
+            database_url: URL SQLite (`sqlite:///...`) ; si fournie, la mémoire est
+                stockée en base (remplace snapshot + journal)
+            flush_max_delay: Délai max (s) avant l'écriture différée d'une rafale
+            flush_max_pending: Nombre d'opérations en attente forçant l'écriture
+            memory_budget_mb: Budget (estimé) des messages résidents ; au-delà, les
+                sessions froides déjà persistées repartent sur disque (LRU)
+            enrich_queue_size: Taille max de la file d'enrichissement NLP ; file
+                pleine, le message est enrichi de façon synchrone
+            enrich_batch_size: Messages enrichis par lot par le thread NLP
+            lock_stripes: Nombre de verrous de sessions (une session → un verrou
+                par hachage de son ID)
         """
         # Configuration
         if memory_file is None:
@@ -540,18 +1608,85 @@ class ConversationMemory:
         # Storage backend
         self.storage = StorageBackend()
         
+        # Un shard compressé par session + manifeste ; seules les sessions
+        # modifiées depuis la dernière sauvegarde sont réécrites
+        self.shards = ShardStore(os.path.join(self.storage.base_path, 'memory'))
+        self.dirty_sessions: Set[str] = set()
+        self.persisted_sessions: Set[str] = set()
+        
+        # Journal append-only (auto-save) + compaction en snapshot
+        self.wal = WriteAheadLog(
+            os.path.join(self.storage.base_path, 'conversation_memory.wal'), fsync=wal_fsync
+        )
+        self.wal_compact_records = wal_compact_records
+        
+        # Stockage SQLite (requêtes indexées) si une base est configurée
+        self.db = SQLiteStorageBackend.from_url(database_url) if database_url else None
+        
         # Cache multi-niveaux
         self.message_cache = LRUCache(capacity=cache_size, ttl=cache_ttl)
         self.context_cache = LRUCache(capacity=cache_size // 2, ttl=cache_ttl)
         self.query_cache = LRUCache(capacity=cache_size // 4, ttl=cache_ttl // 2)
         
-        # Thread safety
+        # Index inversé (BM25) des messages, maintenu à chaque mutation
+        self.search_index = BM25Index()
+        
+        # Signature MinHash des mots de chaque session + LSH par bandes
+        # (64 bandes de 2 lignes : candidat avec p ≈ 0.84 à s = 0.17, 0.93 à s = 0.2)
+        self.session_lsh = MinHashLSH(num_perm=128, bands=64)
+        self.session_signatures: Dict[str, Tuple[int, ...]] = {}
+        self.pending_vocabulary: Dict[str, Set[str]] = defaultdict(set)
+        
+        # message_id → (session, position) et parent_id → enfants (fils de discussion)
+        self.message_index: Dict[str, Tuple[str, int]] = {}
+        self.children: Dict[str, Dict[str, None]] = defaultdict(dict)
+        
+        # Thread safety. Ordre d'acquisition : verrous de sessions (par rang)
+        # → verrou global → save_lock → verrous feuilles (analytics,
+        # signatures, pagination, files d'écriture et d'enrichissement).
+        # - verrous de sessions (rayés) : mutations d'une session
+        # - verrou global, tenu brièvement : création / suppression de
+        #   sessions, pagination, opérations sur toute la mémoire (avec tous
+        #   les verrous de sessions, voir _exclusive)
+        # - lecteurs sans verrou : les listes de messages ne sont modifiées
+        #   qu'en ajout (toute autre modification publie une nouvelle liste),
+        #   les contextes et métadonnées sont remplacés par copie
         self.lock = threading.RLock()
+        self.session_locks = tuple(threading.RLock() for _ in range(max(1, lock_stripes)))
+        self.analytics_lock = threading.Lock()
+        self.signature_lock = threading.Lock()
         self.save_lock = threading.Lock()
         
-        # Données principales
-        self.sessions: Dict[str, List[Message]] = {}
+        # Écriture différée (write-behind) : les mutations marquent l'état
+        # sale et réveillent un thread unique qui regroupe les écritures
+        self.flush_max_delay = flush_max_delay
+        self.flush_max_pending = flush_max_pending
+        self.flush_cond = threading.Condition()
+        self.pending_ops: List[Tuple[str, Dict]] = []
+        self.pending_count = 0
+        self.save_requested = False
+        self.dirty_since = 0.0
+        self.flusher: Optional[threading.Thread] = None
+        
+        # Enrichissement NLP en arrière-plan : le message est stocké tout de
+        # suite, ses métadonnées (et le contexte / les analytics qui en
+        # dépendent) sont appliquées par lots par un thread dédié
+        self.enrich_queue_size = enrich_queue_size
+        self.enrich_batch_size = enrich_batch_size
+        self.enrich_cond = threading.Condition()
+        self.enrich_queue: deque = deque()
+        self.enrich_pending: Dict[str, Tuple[str, Message]] = {}
+        self.enrich_sessions: Counter = Counter()
+        self.enricher: Optional[threading.Thread] = None
+        
+        # Données principales : contextes toujours en mémoire, messages
+        # hydratés à la demande (shards) et évincés sous budget
+        self.sessions = PagedSessions(loader=self._read_session_shard, on_hydrate=self._index_session)
         self.contexts: Dict[str, SessionContext] = {}
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.shard_floors: Dict[str, int] = {}
+        self.manifest_lsn = 0
+        self.warmup_queue: deque = deque()
         self.metadata: Dict[str, Any] = {
             'version': '2.0.0',
             'created_at': datetime.utcnow().isoformat(),
@@ -568,9 +1703,13 @@ class ConversationMemory:
             'popular_domains': Counter(),
             'popular_intents': Counter(),
             'message_by_hour': defaultdict(int),
+            'top_keywords': SpaceSaving(capacity=256),
             'response_times': []
         }
         
+        # Agrégats par session, construits au premier besoin puis tenus à jour
+        self.session_stats: Dict[str, SessionStats] = {}
+        
         # Callbacks et webhooks
         self.callbacks: Dict[str, List[Callable]] = {
             'on_message': [],
@@ -587,17 +1726,27 @@ class ConversationMemory:
             'window': 60  # secondes
         }
         
-        # Charger les données
+        # Charger les données (contextes ; messages à la demande)
         self._load_memory()
+        self._rebuild_indexes()
+        self._start_warmup()
+        
+        # Sessions rejouées depuis le journal (modifiées) : sauvegarde si le
+        # budget est dépassé
+        self._enforce_memory_budget()
+        
+        # Enrichissements journalisés mais jamais terminés (arrêt brutal)
+        if self.enrich_queue:
+            self._start_enricher()
         
         # Session par défaut
         self.default_session_id = 'default'
         if self.default_session_id not in self.sessions:
             self._create_session(self.default_session_id)
         
-        # Auto-save timer
+        # Flusher d'écriture différée
         if self.auto_save:
-            self._start_auto_save_timer()
+            self._start_flusher()
         
         # Garbage collection timer
         self._start_gc_timer()
@@ -606,97 +1755,744 @@ class ConversationMemory:
     #                          CORE OPERATIONS
     # ═══════════════════════════════════════════════════════════════════════════
     
+    def _session_lock(self, session_id: str) -> threading.RLock:
+        """Verrou (rayé) des mutations d'une session."""
+        return self.session_locks[hash(session_id) % len(self.session_locks)]
+    
+    @contextmanager
+    def _sessions_locked(self, *session_ids: str):
+        """Verrous de plusieurs sessions, pris par rang (sans interblocage)."""
+        stripes = sorted({hash(sid) % len(self.session_locks) for sid in session_ids})
+        for index in stripes:
+            self.session_locks[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(stripes):
+                self.session_locks[index].release()
+    
+    @contextmanager
+    def _exclusive(self):
+        """Tous les verrous de sessions puis le verrou global : vue figée de toute la mémoire."""
+        for lock in self.session_locks:
+            lock.acquire()
+        try:
+            with self.lock:
+                yield
+        finally:
+            for lock in reversed(self.session_locks):
+                lock.release()
+    
     def _load_memory(self):
         """Charge la mémoire depuis le storage."""
+        if self.db is not None:
+            return self._load_from_db()
+        
         try:
-            data = self.storage.load('conversation_memory.json', compressed=self.compress)
+            manifest = self.shards.load_manifest()
             
-            if data:
-                # Charger sessions
-                sessions_data = data.get('sessions', {})
-                for sid, messages in sessions_data.items():
-                    self.sessions[sid] = [Message.from_dict(m) for m in messages]
-                
-                # Charger contexts
-                contexts_data = data.get('contexts', {})
-                for sid, ctx in contexts_data.items():
-                    self.contexts[sid] = SessionContext.from_dict(ctx)
-                
-                # Charger metadata
-                self.metadata.update(data.get('metadata', {}))
-                
-                # Charger analytics
-                if 'analytics' in data:
-                    self.analytics.update(data['analytics'])
-                    # Convertir Counter depuis dict
-                    for key in ['popular_languages', 'popular_domains', 'popular_intents']:
-                        if key in self.analytics and isinstance(self.analytics[key], dict):
-                            self.analytics[key] = Counter(self.analytics[key])
+            if manifest is not None:
+                if manifest.get('format') == ShardStore.FORMAT:
+                    # Contextes depuis le manifeste ; messages hydratés au premier accès
+                    for sid, entry in manifest.get('sessions', {}).items():
+                        self.sessions.add_paged(sid, entry.get('messages', 0))
+                        if entry.get('context'):
+                            self.contexts[sid] = SessionContext.from_dict(entry['context'])
+                    self.manifest_lsn = manifest.get('wal_lsn', 0)
+                else:
+                    # 'shards/1' : contextes dans les shards, chargement complet
+                    # (le manifeste est réécrit au format courant à la sauvegarde)
+                    sessions, self.contexts, self.shard_floors = self._read_shards(self.shards, manifest)
+                    self.sessions.reset(sessions)
+                self.persisted_sessions = set(self.sessions)
+                self.metadata.update(manifest.get('metadata', {}))
+                if 'analytics' in manifest:
+                    self._restore_analytics(manifest['analytics'])
+                data = manifest
+            else:
+                # Ancien format : snapshot unique, migré en shards à la prochaine sauvegarde
+                data = self.storage.load('conversation_memory.json', compressed=self.compress)
                 
-                print(f"✓ Mémoire chargée: {len(self.sessions)} sessions, {sum(len(m) for m in self.sessions.values())} messages")
+                if data:
+                    # Charger sessions
+                    sessions_data = data.get('sessions', {})
+                    for sid, messages in sessions_data.items():
+                        self.sessions[sid] = [Message.from_dict(m) for m in messages]
+                    
+                    # Charger contexts
+                    contexts_data = data.get('contexts', {})
+                    for sid, ctx in contexts_data.items():
+                        self.contexts[sid] = SessionContext.from_dict(ctx)
+                    
+                    # Charger metadata
+                    self.metadata.update(data.get('metadata', {}))
+                    
+                    # Charger analytics
+                    if 'analytics' in data:
+                        self._restore_analytics(data['analytics'])
+            
+            # Rejouer le journal postérieur au manifeste (et à chaque shard :
+            # la session concernée est hydratée, ce qui lit son lsn)
+            replayed = 0
+            for record in self.wal.recover((data or {}).get('wal_lsn', 0)):
+                self.sessions.ensure(record['session_id'])
+                if record['lsn'] > self.shard_floors.get(record['session_id'], 0):
+                    self._apply_wal_record(record)
+                    replayed += 1
+            
+            if data or replayed:
+                paging = self.sessions.stats()
+                print(f"✓ Mémoire chargée: {len(self.sessions)} sessions, {sum(self.sessions.message_counts().values())} messages"
+                      + (f" ({paging['paged_sessions']} sur disque)" if paging['paged_sessions'] else "")
+                      + (f" ({replayed} opérations rejouées)" if replayed else ""))
         
         except Exception as e:
             print(f"Erreur chargement mémoire: {e}")
             # Initialiser vide
-            self.sessions = {}
+            self.sessions.reset({})
+            self.contexts = {}
+    
+    @staticmethod
+    def _read_shards(store: ShardStore, manifest: Dict) -> Tuple[Dict, Dict, Dict[str, int]]:
+        """
+        Charge les shards listés par un manifeste.
+        
+        Returns:
+            (sessions, contexts, lsn du journal couvert par chaque shard)
+        """
+        sessions, contexts, floors = {}, {}, {}
+        
+        for sid, entry in manifest.get('sessions', {}).items():
+            shard = store.load_shard(entry['shard'])
+            if shard is None:
+                print(f"Shard manquant pour la session {sid}")
+                continue
+            
+            sessions[sid] = [Message.from_dict(m) for m in shard['messages']]
+            if shard.get('context'):
+                contexts[sid] = SessionContext.from_dict(shard['context'])
+            floors[sid] = shard.get('wal_lsn', 0)
+        
+        return sessions, contexts, floors
+    
+    def _load_from_db(self):
+        """Charge la mémoire depuis la base SQLite."""
+        try:
+            sessions, self.contexts, meta = self.db.load()
+            self.sessions.reset(sessions)
+            self.metadata.update(meta.get('metadata', {}))
+            if 'analytics' in meta:
+                self._restore_analytics(meta['analytics'])
+            
+            if sessions:
+                print(f"✓ Mémoire chargée (SQLite): {len(sessions)} sessions, {sum(len(m) for m in sessions.values())} messages")
+        
+        except Exception as e:
+            print(f"Erreur chargement mémoire: {e}")
+            self.sessions.reset({})
             self.contexts = {}
     
+    def _restore_analytics(self, analytics: Dict):
+        """Restaure les analytics sauvegardées (types d'origine)."""
+        self.analytics.update(analytics)
+        # Convertir Counter depuis dict
+        for key in ['popular_languages', 'popular_domains', 'popular_intents']:
+            if key in self.analytics and isinstance(self.analytics[key], dict):
+                self.analytics[key] = Counter(self.analytics[key])
+        # Clés JSON (str) -> heures (int)
+        self.analytics['message_by_hour'] = defaultdict(int, {
+            int(hour): count for hour, count in self.analytics.get('message_by_hour', {}).items()
+        })
+        if isinstance(self.analytics.get('top_keywords'), dict):
+            self.analytics['top_keywords'] = SpaceSaving.from_dict(self.analytics['top_keywords'], capacity=256)
+    
+    def _serializable_analytics(self) -> Dict:
+        """Copie des analytics sérialisable en JSON."""
+        with self.analytics_lock:
+            return {
+                **self.analytics,
+                'popular_languages': dict(self.analytics['popular_languages']),
+                'popular_domains': dict(self.analytics['popular_domains']),
+                'popular_intents': dict(self.analytics['popular_intents']),
+                'message_by_hour': dict(self.analytics['message_by_hour']),
+                'top_keywords': self.analytics['top_keywords'].to_dict(),
+                'response_times': list(self.analytics['response_times'])
+            }
+    
+    def _flush_db(self):
+        """Écrit le lot en attente (messages, contextes, analytics) en base."""
+        with self.lock:
+            self.db.set_meta('metadata', self.metadata)
+            self.db.set_meta('analytics', self._serializable_analytics())
+        self.db.flush()
+    
     def _save_memory(self, force: bool = False):
-        """Sauvegarde la mémoire."""
+        """
+        Sauvegarde la mémoire (shards des sessions modifiées + manifeste) et
+        compacte le journal.
+        
+        L'état des sessions modifiées est copié et le journal tourné sous le
+        verrou ; l'encodage et l'écriture se font ensuite sans bloquer les
+        add_message.
+        """
         if not self.auto_save and not force:
             return
         
-        with self.save_lock:
+        if self.db is not None:
+            # Stockage SQLite : réécriture complète (opérations globales rares)
             try:
-                # Préparer les données
-                data = {
-                    'sessions': {
-                        sid: [m.to_dict() for m in messages]
-                        for sid, messages in self.sessions.items()
-                    },
-                    'contexts': {
-                        sid: ctx.to_dict()
-                        for sid, ctx in self.contexts.items()
-                    },
-                    'metadata': self.metadata,
-                    'analytics': {
-                        **self.analytics,
-                        'popular_languages': dict(self.analytics['popular_languages']),
-                        'popular_domains': dict(self.analytics['popular_domains']),
-                        'popular_intents': dict(self.analytics['popular_intents'])
+                with self._exclusive():
+                    self.metadata['last_modified'] = datetime.utcnow().isoformat()
+                    self.db.replace_all(self.sessions, self.contexts, {
+                        'metadata': self.metadata,
+                        'analytics': self._serializable_analytics()
+                    })
+                self._trigger_callbacks('on_save', {'backend': 'sqlite', 'path': self.db.path})
+                return True
+            except Exception as e:
+                print(f"Erreur sauvegarde mémoire: {e}")
+                self._trigger_callbacks('on_error', {'error': str(e), 'operation': 'save'})
+                return False
+        
+        try:
+            # Préparer les données sur une vue figée (tous les verrous, puis save_lock)
+            with self._exclusive():
+                self.save_lock.acquire()
+                try:
+                    self.metadata['last_modified'] = datetime.utcnow().isoformat()
+                    
+                    # Encoder seulement les sessions modifiées (ou jamais écrites)
+                    dirty = {
+                        sid for sid in self.sessions
+                        if sid in self.dirty_sessions or sid not in self.persisted_sessions
                     }
-                }
-                
-                # Mettre à jour timestamp
-                self.metadata['last_modified'] = datetime.utcnow().isoformat()
-                
-                # Sauvegarder
-                success = self.storage.save('conversation_memory.json', data, compress=self.compress)
+                    shards = {
+                        sid: {
+                            'session_id': sid,
+                            'context': self.contexts[sid].to_dict() if sid in self.contexts else None,
+                            'messages': [m.to_dict() for m in self.sessions[sid]]
+                        }
+                        for sid in dirty
+                    }
+                    removed = self.persisted_sessions - set(self.sessions)
+                    self.dirty_sessions.clear()
+                    
+                    manifest = {
+                        'format': ShardStore.FORMAT,
+                        'sessions': {
+                            sid: {
+                                'shard': ShardStore.shard_name(sid),
+                                'messages': count,
+                                'context': self.contexts[sid].to_dict() if sid in self.contexts else None
+                            }
+                            for sid, count in self.sessions.message_counts().items()
+                        },
+                        'metadata': dict(self.metadata),
+                        'analytics': self._serializable_analytics()
+                    }
+                    
+                    # Journaliser les opérations encore en attente, puis le
+                    # manifeste couvre le journal jusqu'à ce lsn
+                    with self.flush_cond:
+                        batch, self.pending_ops = self.pending_ops, []
+                    if batch:
+                        self.wal.append_many(batch)
+                    manifest['wal_lsn'] = self.wal.rotate()
+                except Exception:
+                    self.save_lock.release()
+                    raise
+            
+            try:
+                # Shards d'abord (chacun porte son lsn), manifeste ensuite
+                success = True
+                for sid, shard in shards.items():
+                    shard['wal_lsn'] = manifest['wal_lsn']
+                    success = self.shards.save_shard(ShardStore.shard_name(sid), shard) and success
+                success = success and self.shards.save_manifest(manifest)
                 
                 if success:
-                    # Callback
-                    self._trigger_callbacks('on_save', data)
+                    self.wal.discard_rotated()
+                    for sid in removed:
+                        self.shards.remove_shard(ShardStore.shard_name(sid))
+                    self.persisted_sessions = set(manifest['sessions'])
+                    self.manifest_lsn = manifest['wal_lsn']
+                else:
+                    # Réessayer ces sessions à la prochaine sauvegarde
+                    self.dirty_sessions.update(dirty)
+            finally:
+                self.save_lock.release()
+            
+            if success:
+                # Sessions propres : évinçables si le budget est dépassé
+                self._enforce_memory_budget()
                 
-                return success
+                # Callback
+                self._trigger_callbacks('on_save', manifest)
             
-            except Exception as e:
-                print(f"Erreur sauvegarde mémoire: {e}")
-                self._trigger_callbacks('on_error', {'error': str(e), 'operation': 'save'})
-                return False
+            return success
+        
+        except Exception as e:
+            print(f"Erreur sauvegarde mémoire: {e}")
+            self._trigger_callbacks('on_error', {'error': str(e), 'operation': 'save'})
+            return False
+    
+    def _apply_wal_record(self, record: Dict):
+        """Rejoue une opération du journal (récupération au démarrage)."""
+        session_id = record['session_id']
+        self.dirty_sessions.add(session_id)
+        
+        if record['op'] == 'add_message':
+            if session_id not in self.sessions:
+                self._create_session(session_id)
+            message = Message.from_dict(record['message'])
+            self.sessions[session_id].append(message)
+            self.sessions.account(session_id, PagedSessions.MESSAGE_OVERHEAD + len(message.content))
+            if record.get('enrich'):
+                # Contexte et analytics à l'enregistrement 'enrich' ; sans lui
+                # (arrêt avant l'enrichissement), le message est remis en file
+                self.enrich_queue.append(message)
+                self.enrich_pending[message.message_id] = (session_id, message)
+                self.enrich_sessions[session_id] += 1
+            else:
+                self._update_context(session_id, message)
+                self._update_analytics(message)
+        
+        elif record['op'] == 'enrich':
+            entry = self.enrich_pending.pop(record['message_id'], None)
+            if entry is not None:
+                message = entry[1]
+                self.enrich_queue.remove(message)
+                self.enrich_sessions[entry[0]] -= 1
+                if self.enrich_sessions[entry[0]] <= 0:
+                    del self.enrich_sessions[entry[0]]
+            else:
+                # Ajout déjà couvert par le shard : chercher depuis la fin
+                message = next((m for m in reversed(self.sessions.get(session_id, ()))
+                                if m.message_id == record['message_id']), None)
+            if message is not None:
+                self._apply_enrichment(message, record['enrichment'])
+                self._update_analytics(message)
+                if session_id in self.contexts:
+                    self._update_context(session_id, message)
+        
+        elif record['op'] == 'archive' and session_id in self.sessions:
+            self.sessions[session_id] = self.sessions[session_id][-record['keep']:]
     
     def _create_session(self, session_id: str):
-        """Crée une nouvelle session."""
+        """Crée une nouvelle session (verrou global, bref)."""
         with self.lock:
             if session_id not in self.sessions:
-                self.sessions[session_id] = []
                 self.contexts[session_id] = SessionContext(
                     session_id=session_id,
                     created_at=datetime.utcnow().isoformat(),
                     updated_at=datetime.utcnow().isoformat()
                 )
-                self.analytics['total_sessions'] += 1
+                self.sessions[session_id] = []
+                with self.analytics_lock:
+                    self.analytics['total_sessions'] += 1
+                if self.db is not None:
+                    self.db.save_context(self.contexts[session_id])
                 self._trigger_callbacks('on_session_start', {'session_id': session_id})
     
+    def _index_message(self, session_id: str, message: Message):
+        """Ajoute un message à l'index de recherche."""
+        if not message.deleted:
+            self.search_index.add(id(message), message.content, group=session_id, payload=(session_id, message))
+    
+    def _link_message(self, session_id: str, position: int, message: Message):
+        """Enregistre la position d'un message et son lien vers son parent."""
+        self.message_index[message.message_id] = (session_id, position)
+        if message.parent_id:
+            self.children[message.parent_id][message.message_id] = None
+    
+    def _unlink_messages(self, messages: List[Message]):
+        """Retire des messages (suppression, archivage) des index d'ID et de fils."""
+        for message in messages:
+            self.message_index.pop(message.message_id, None)
+            if message.parent_id:
+                siblings = self.children.get(message.parent_id)
+                if siblings is not None:
+                    siblings.pop(message.message_id, None)
+                    if not siblings:
+                        del self.children[message.parent_id]
+    
+    def _reposition_session(self, session_id: str):
+        """Recalcule les positions des messages d'une session (après archivage, tri)."""
+        for position, message in enumerate(self.sessions.get(session_id, [])):
+            self._link_message(session_id, position, message)
+    
+    def _lookup_message(self, message_id: Optional[str]) -> Optional[Message]:
+        """Message par ID via l'index (None si inconnu ou position périmée)."""
+        entry = self.message_index.get(message_id) if message_id else None
+        if entry is None:
+            return None
+        
+        session_id, position = entry
+        messages = self.sessions.peek(session_id)
+        if position >= len(messages) or messages[position].message_id != message_id:
+            return None
+        return messages[position]
+    
+    def _extend_signature(self, session_id: str, message: Message):
+        """Met de côté les mots d'un message pour la signature de sa session."""
+        tokens = words(message.content)
+        with self.signature_lock:
+            self.pending_vocabulary[session_id].update(tokens)
+    
+    def _fold_signatures(self):
+        """
+        Intègre les mots en attente aux signatures MinHash des sessions
+        modifiées (minimum composante par composante : signature de l'union).
+        """
+        with self.signature_lock:
+            pending, self.pending_vocabulary = self.pending_vocabulary, defaultdict(set)
+        
+        for sid, vocabulary in pending.items():
+            signature = self.session_lsh.signature(vocabulary)
+            if sid not in self.sessions or not signature:
+                continue
+            
+            with self.signature_lock:
+                current = self.session_signatures.get(sid)
+                if current:
+                    signature = tuple(map(min, current, signature))
+                    if signature == current:
+                        continue
+                
+                self.session_signatures[sid] = signature
+                self.session_lsh.add(sid, signature)
+    
+    def _resign_session(self, session_id: str):
+        """Recalcule la signature d'une session depuis l'ensemble de ses mots."""
+        with self.signature_lock:
+            self.session_lsh.remove(session_id)
+            self.session_signatures.pop(session_id, None)
+            self.pending_vocabulary.pop(session_id, None)
+        
+        vocabulary = set()
+        for message in self.sessions.get(session_id, []):
+            vocabulary.update(words(message.content))
+        
+        signature = self.session_lsh.signature(vocabulary)
+        if signature:
+            with self.signature_lock:
+                self.session_signatures[session_id] = signature
+                self.session_lsh.add(session_id, signature)
+    
+    def _reindex_session(self, session_id: str):
+        """Réindexe une session remplacée en bloc (import, fusion), triée par ID."""
+        if session_id in self.sessions:
+            # Nouvelle liste : les lecteurs sans verrou gardent l'ancienne
+            self.sessions[session_id] = sorted(self.sessions[session_id], key=MessageIdGenerator.sort_key)
+        self.search_index.remove_group(session_id)
+        for message in self.sessions.get(session_id, []):
+            # Messages déplacés : rattachés à leur nouvelle session (clé des lignes SQLite)
+            message.session_id = session_id
+            self._index_message(session_id, message)
+        self._reposition_session(session_id)
+        self._resign_session(session_id)
+    
+    def _index_session(self, session_id: str, messages: List[Message]):
+        """Indexe une session chargée (démarrage, hydratation), déjà triée par ID."""
+        for message in messages:
+            self._index_message(session_id, message)
+        self._reposition_session(session_id)
+        self._resign_session(session_id)
+    
+    def _rebuild_indexes(self):
+        """Reconstruit les index des sessions résidentes (chargement, restauration)."""
+        self.search_index.clear()
+        self.session_lsh.clear()
+        self.session_signatures = {}
+        self.pending_vocabulary = defaultdict(set)
+        self.message_index = {}
+        self.children = defaultdict(dict)
+        for sid, messages in self.sessions.resident_items():
+            messages.sort(key=MessageIdGenerator.sort_key)
+            self._index_session(sid, messages)
+    
+    # ═══════════════════════════════════════════════════════════════════════════
+    #                          PAGING (HYDRATATION / ÉVICTION)
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    def _read_session_shard(self, session_id: str) -> List[Message]:
+        """Charge les messages d'une session paginée depuis son shard."""
+        shard = self.shards.load_shard(ShardStore.shard_name(session_id))
+        if shard is None:
+            print(f"Shard manquant pour la session {session_id}")
+            return []
+        
+        self.shard_floors[session_id] = shard.get('wal_lsn', 0)
+        # Shard plus récent que le manifeste (arrêt entre les deux écritures)
+        if shard.get('context') and shard.get('wal_lsn', 0) > self.manifest_lsn:
+            self.contexts[session_id] = SessionContext.from_dict(shard['context'])
+        
+        return sorted((Message.from_dict(m) for m in shard['messages']), key=MessageIdGenerator.sort_key)
+    
+    def _evict_session(self, session_id: str):
+        """Renvoie une session sur disque ; sa signature MinHash reste dans le LSH."""
+        self._fold_signatures()
+        # Atomique vis-à-vis d'une hydratation concurrente (verrou de la table)
+        with self.sessions.lock:
+            messages = self.sessions.page_out(session_id)
+            self.search_index.remove_group(session_id)
+            self._unlink_messages(messages)
+    
+    def _enforce_memory_budget(self, wait: bool = False):
+        """
+        Évince les sessions les moins récemment utilisées tant que le budget
+        est dépassé. Seules les sessions persistées et propres sont évinçables,
+        et jamais pendant l'écriture d'une sauvegarde ni pendant une mutation
+        en cours (verrou de session non disponible). Appelé aux frontières
+        d'opérations (ajout, sauvegarde, préchargement), jamais au milieu.
+        
+        Si des sessions modifiées empêchent de revenir sous le budget, une
+        sauvegarde de leurs shards est demandée : le flusher relance
+        l'éviction après l'avoir écrite (fin de flush()).
+        
+        Args:
+            wait: Attendre la fin d'une sauvegarde en cours (flusher, sans
+                autre verrou tenu) au lieu de confier l'éviction au flusher
+        """
+        if self.db is not None or self.sessions.resident_bytes <= self.memory_budget:
+            return
+        
+        # Un seul évinceur à la fois ; pendant une écriture, le flusher
+        # réessaie une fois celle-ci terminée
+        if not self.save_lock.acquire(blocking=wait):
+            self._schedule_write()
+            return
+        
+        unsaved = False
+        try:
+            for sid in self.sessions.lru():
+                if self.sessions.resident_bytes <= self.memory_budget:
+                    break
+                if not self._evictable(sid):
+                    unsaved = unsaved or sid not in self.enrich_sessions
+                    continue
+                # Hors ordre des verrous (save_lock avant session) : tentative seulement
+                session_lock = self._session_lock(sid)
+                if not session_lock.acquire(blocking=False):
+                    continue
+                try:
+                    if self._evictable(sid) and sid in self.sessions.resident:
+                        self._evict_session(sid)
+                finally:
+                    session_lock.release()
+        finally:
+            self.save_lock.release()
+        
+        # Sessions non sauvegardées : les écrire pour pouvoir les évincer
+        if unsaved and self.sessions.resident_bytes > self.memory_budget:
+            self._schedule_write(save=True)
+    
+    def _evictable(self, session_id: str) -> bool:
+        """Session propre, déjà persistée et sans enrichissement en attente."""
+        return (session_id not in self.dirty_sessions and session_id in self.persisted_sessions
+                and session_id not in self.enrich_sessions)
+    
+    def _start_warmup(self):
+        """Précharge en arrière-plan les sessions les plus récentes, dans la limite du budget."""
+        if not self.sessions.paged:
+            return
+        
+        recent = sorted(
+            self.sessions.paged,
+            key=lambda sid: self.contexts[sid].updated_at if sid in self.contexts else '',
+            reverse=True
+        )
+        self.warmup_queue = deque(recent)
+        threading.Thread(target=self._warm_up, daemon=True, name='memory-warmup').start()
+    
+    def _warm_up(self):
+        """
+        Hydrate la file de préchargement. Les requêtes globales (recherche,
+        similarité, message par ID) l'appellent aussi pour la terminer avant
+        de consulter les index.
+        """
+        while True:
+            with self.lock:
+                if not self.warmup_queue:
+                    return
+                if self.sessions.resident_bytes >= self.memory_budget:
+                    self.warmup_queue.clear()
+                    self._enforce_memory_budget()
+                    return
+                
+                session_id = self.warmup_queue[0]
+            
+            # Chargement hors verrou global, retiré de la file une fois fait (un
+            # appelant qui trouve la file vide sait tout chargé) ; en tête
+            # d'éviction : un accès réel passe devant
+            self.sessions.hydrate(session_id, cold=True)
+            with self.lock:
+                if self.warmup_queue and self.warmup_queue[0] == session_id:
+                    self.warmup_queue.popleft()
+    
+    def _locate_message(self, message_id: str, session_id: Optional[str] = None) -> Optional[Message]:
+        """Message par ID, en hydratant sa session si elle est paginée."""
+        if session_id:
+            self.sessions.ensure(session_id)
+        message = self._lookup_message(message_id)
+        if message is None and not session_id:
+            self._warm_up()
+            with self.lock:
+                message = self._lookup_message(message_id) or self._find_cold_message(message_id)
+        return message
+    
+    def _find_cold_message(self, message_id: str) -> Optional[Message]:
+        """
+        Cherche un message dans les sessions restées sur disque. Pour un ID
+        triable, seules les sessions actives après son horodatage sont
+        hydratées, les plus proches d'abord.
+        """
+        if not MessageIdGenerator.is_valid(message_id):
+            return None
+        
+        when = MessageIdGenerator.timestamp_ms(message_id) / 1000
+        candidates = []
+        for sid in list(self.sessions.paged):
+            try:
+                updated = to_epoch(self.contexts[sid].updated_at)
+            except (KeyError, TypeError, ValueError):
+                updated = float('inf')
+            if updated + 1 >= when:
+                candidates.append((updated, sid))
+        
+        for _, sid in sorted(candidates):
+            self._enforce_memory_budget()
+            self.sessions.hydrate(sid)
+            message = self._lookup_message(message_id)
+            if message is not None:
+                return message
+        
+        return None
+    
+    # ═══════════════════════════════════════════════════════════════════════════
+    #                          ENRICHISSEMENT NLP (ARRIÈRE-PLAN)
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    def _start_enricher(self):
+        """Démarre le thread d'enrichissement (une seule fois)."""
+        with self.enrich_cond:
+            if self.enricher is None:
+                self.enricher = threading.Thread(target=self._enrichment_loop, daemon=True, name='memory-enricher')
+                self.enricher.start()
+    
+    def _submit_enrichment(self, session_id: str, message: Message) -> bool:
+        """
+        Met un message en file d'enrichissement (appelé sous le verrou de la session).
+        
+        Returns:
+            False si la file est pleine : l'appelant enrichit lui-même
+        """
+        with self.enrich_cond:
+            if len(self.enrich_queue) >= self.enrich_queue_size:
+                return False
+            self.enrich_queue.append(message)
+            self.enrich_pending[message.message_id] = (session_id, message)
+            self.enrich_sessions[session_id] += 1
+            self.enrich_cond.notify()
+        
+        self._start_enricher()
+        return True
+    
+    def _enrichment_loop(self):
+        """Analyse les messages en file par lots (hors verrou), puis applique chaque résultat sous le verrou de sa session."""
+        while True:
+            with self.enrich_cond:
+                while not self.enrich_queue:
+                    self.enrich_cond.wait()
+                batch = [self.enrich_queue.popleft()
+                         for _ in range(min(self.enrich_batch_size, len(self.enrich_queue)))]
+            
+            results = [self._analyze_content(message.content) for message in batch]
+            
+            for message, result in zip(batch, results):
+                try:
+                    # Session courante du message (une fusion peut l'avoir déplacé)
+                    while True:
+                        session_id = self._message_session(message)
+                        with self._session_lock(session_id):
+                            if self._message_session(message) == session_id:
+                                self._complete_enrichment(message, result)
+                                break
+                except Exception as e:
+                    print(f"Erreur enrichissement message: {e}")
+                    self._trigger_callbacks('on_error', {'error': str(e), 'operation': 'enrich'})
+                    self._release_enrichment(message)
+    
+    def _message_session(self, message: Message) -> str:
+        """Session où le message est indexé (sa session d'origine s'il a été retiré)."""
+        location = self.message_index.get(message.message_id)
+        return location[0] if location else message.session_id
+    
+    def _complete_enrichment(self, message: Message, result: Dict):
+        """
+        Applique un enrichissement terminé (sous le verrou de la session) :
+        métadonnées du message, puis contexte, agrégats et analytics comme
+        l'aurait fait add_message.
+        Un message retiré entre-temps (effacement, archivage) ne compte
+        plus que dans les analytics globales.
+        """
+        self._apply_enrichment(message, result)
+        self._update_analytics(message)
+        
+        location = self.message_index.get(message.message_id)
+        session_id = location[0] if location else None
+        if session_id is not None:
+            self._update_context(session_id, message)
+            stats = self.session_stats.get(session_id)
+            if stats is not None:
+                stats.add(message)
+            self.dirty_sessions.add(session_id)
+        
+        if self.db is not None:
+            self.db.update_message(message)
+            if session_id is not None:
+                self.db.save_context(self.contexts[session_id])
+            self._schedule_write()
+        elif self.auto_save:
+            self._schedule_write(('enrich', {
+                'session_id': session_id or message.session_id,
+                'message_id': message.message_id,
+                'enrichment': result
+            }))
+        
+        self._release_enrichment(message)
+    
+    def _release_enrichment(self, message: Message):
+        """Retire un message des enrichissements en attente et réveille les appels à wait_enriched."""
+        with self.enrich_cond:
+            entry = self.enrich_pending.pop(message.message_id, None)
+            if entry is not None:
+                self.enrich_sessions[entry[0]] -= 1
+                if self.enrich_sessions[entry[0]] <= 0:
+                    del self.enrich_sessions[entry[0]]
+            self.enrich_cond.notify_all()
+    
+    def wait_enriched(self, message_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Attend la fin de l'enrichissement NLP d'un message (ou de tous les
+        messages en file si message_id est None). À appeler hors du verrou
+        de la mémoire.
+        
+        Args:
+            message_id: ID retourné par add_message
+            timeout: Délai max en secondes (None : sans limite)
+        
+        Returns:
+            True si les métadonnées sont disponibles, False si le délai a expiré
+        """
+        if message_id is None:
+            done = lambda: not self.enrich_pending
+        else:
+            done = lambda: message_id not in self.enrich_pending
+        
+        with self.enrich_cond:
+            return self.enrich_cond.wait_for(done, timeout)
+    
     def _check_rate_limit(self, session_id: str) -> bool:
         """Vérifie le rate limit."""
         now = time.time()
@@ -754,8 +2550,12 @@ class ConversationMemory:
             if not self._check_rate_limit(session_id):
                 raise RuntimeError("Rate limit dépassé")
             
-            with self.lock:
-                # Créer session si nécessaire
+            # Hydratation (lecture disque) avant le verrou, pour ne pas le garder pendant
+            self.sessions.ensure(session_id)
+            
+            # Verrou de la session seulement : les autres sessions ne sont pas bloquées
+            with self._session_lock(session_id):
+                # Créer session si nécessaire (verrou global, bref)
                 if session_id not in self.sessions:
                     self._create_session(session_id)
                 
@@ -768,24 +2568,37 @@ class ConversationMemory:
                 message = Message(
                     role=MessageRole(role),
                     content=content,
-                    timestamp=datetime.utcnow().isoformat(),
-                    metadata=metadata or {},
+                    timestamp=time.time(),
+                    metadata=metadata,
                     session_id=session_id,
-                    **{k: v for k, v in kwargs.items() if k in Message.__annotations__}
+                    **{k: v for k, v in kwargs.items() if k in Message.FIELDS}
                 )
                 
-                # Analyse NLP si activée
+                # Analyse NLP si activée : en arrière-plan (contexte et analytics
+                # mis à jour à la fin de l'enrichissement), ici si la file est pleine
+                deferred = False
                 if self.enable_nlp and role == 'user':
-                    self._enrich_message(message)
+                    deferred = self._submit_enrichment(session_id, message)
+                    if not deferred:
+                        self._enrich_message(message)
                 
                 # Ajouter à la session
                 self.sessions[session_id].append(message)
+                self.sessions.account(session_id, PagedSessions.MESSAGE_OVERHEAD + len(content))
+                self.dirty_sessions.add(session_id)
+                self._index_message(session_id, message)
+                self._link_message(session_id, len(self.sessions[session_id]) - 1, message)
+                self._extend_signature(session_id, message)
                 
-                # Mettre à jour contexte
-                self._update_context(session_id, message)
-                
-                # Mettre à jour analytics
-                self._update_analytics(message)
+                if not deferred:
+                    # Mettre à jour contexte
+                    self._update_context(session_id, message)
+                    
+                    # Mettre à jour analytics
+                    self._update_analytics(message)
+                    stats = self.session_stats.get(session_id)
+                    if stats is not None:
+                        stats.add(message)
                 
                 # Cache
                 cache_key = f"{session_id}:{message.message_id}"
@@ -797,11 +2610,21 @@ class ConversationMemory:
                     'message': message.to_dict()
                 })
                 
-                # Auto-save
-                if self.auto_save:
-                    self._save_memory()
-                
-                return message.message_id
+                # Persistance différée : file d'insertion SQLite, ou (auto-save)
+                # opération du journal écrite par le flusher
+                if self.db is not None:
+                    self.db.add_message(message)
+                    self.db.save_context(self.contexts[session_id])
+                    self._schedule_write()
+                elif self.auto_save:
+                    op = {'session_id': session_id, 'message': message.to_dict()}
+                    if deferred:
+                        op['enrich'] = True
+                    self._schedule_write(('add_message', op))
+            
+            self._enforce_memory_budget()
+            
+            return message.message_id
         
         except Exception as e:
             print(f"Erreur ajout message: {e}")
@@ -809,48 +2632,65 @@ class ConversationMemory:
             raise
     
     def _enrich_message(self, message: Message):
-        """Enrichit un message avec analyse NLP."""
+        """Enrichit un message avec analyse NLP (synchrone)."""
+        self._apply_enrichment(message, self._analyze_content(message.content))
+    
+    @staticmethod
+    def _analyze_content(content: str) -> Dict:
+        """
+        Analyse NLP d'un contenu, sans toucher au message (appelable hors
+        verrou). En cas d'erreur, le résultat est vide (message non enrichi).
+        """
+        result: Dict[str, Any] = {}
         try:
-            content = message.content
-            
-            # Détection langue de programmation
-            language = NLPAnalyzer.detect_language(content)
-            if language:
-                message.language = language
-                message.metadata['language'] = language
-            
-            # Détection domaine
-            domain = NLPAnalyzer.detect_domain(content)
-            if domain:
-                message.metadata['domain'] = domain
-            
-            # Détection intentions
-            intents = NLPAnalyzer.detect_intent(content)
-            message.metadata['intents'] = intents
-            
-            # Extraction entités
-            entities = NLPAnalyzer.extract_entities(content)
-            if entities:
-                message.metadata['entities'] = entities
-            
-            # Sentiment
-            sentiment = NLPAnalyzer.sentiment_analysis(content)
-            message.sentiment = sentiment
-            message.metadata['sentiment'] = sentiment
-            
-            # Mots-clés
-            keywords = NLPAnalyzer.extract_keywords(content, top_n=5)
-            message.metadata['keywords'] = [kw[0] for kw in keywords]
+            # Langage, domaine, intentions, entités, sentiment, mots-clés (une passe)
+            result.update(NLPAnalyzer.analyze(content, top_keywords=5))
             
             # Estimation tokens (approximative)
-            message.tokens = len(content.split())
+            result['tokens'] = len(content.split())
         
         except Exception as e:
             print(f"Erreur enrichissement message: {e}")
+        
+        return result
+    
+    @staticmethod
+    def _apply_enrichment(message: Message, result: Dict):
+        """
+        Reporte le résultat de `_analyze_content` sur le message. Les
+        métadonnées sont remplacées par une copie complétée : un lecteur sans
+        verrou ne voit jamais un dictionnaire en cours de modification.
+        """
+        metadata = dict(message.meta)
+        if result.get('language'):
+            message.language = result['language']
+            metadata['language'] = result['language']
+        if result.get('domain'):
+            metadata['domain'] = result['domain']
+        if 'intents' in result:
+            metadata['intents'] = result['intents']
+        if result.get('entities'):
+            metadata['entities'] = result['entities']
+        if 'sentiment' in result:
+            message.sentiment = result['sentiment']
+            metadata['sentiment'] = result['sentiment']
+        if 'keywords' in result:
+            metadata['keywords'] = result['keywords']
+        if 'tokens' in result:
+            message.tokens = result['tokens']
+        message.metadata = metadata
     
     def _update_context(self, session_id: str, message: Message):
-        """Met à jour le contexte de session."""
-        context = self.contexts[session_id]
+        """
+        Met à jour le contexte de session. Copie sur écriture : le contexte
+        publié n'est jamais modifié en place (lecture sans verrou).
+        """
+        current = self.contexts[session_id]
+        context = replace(
+            current,
+            topics=list(current.topics),
+            entities={entity_type: list(values) for entity_type, values in current.entities.items()}
+        )
         context.updated_at = datetime.utcnow().isoformat()
         context.message_count += 1
         context.total_tokens += message.tokens
@@ -859,50 +2699,58 @@ class ConversationMemory:
         if message.language:
             context.last_language = message.language
         
-        if 'domain' in message.metadata:
-            context.last_domain = message.metadata['domain']
+        meta = message.meta
+        if 'domain' in meta:
+            context.last_domain = meta['domain']
         
-        if 'code_type' in message.metadata:
-            context.last_code_type = message.metadata['code_type']
+        if 'code_type' in meta:
+            context.last_code_type = meta['code_type']
         
         # Extraire topics
-        if 'keywords' in message.metadata:
-            for kw in message.metadata['keywords']:
+        if 'keywords' in meta:
+            for kw in meta['keywords']:
                 if kw not in context.topics:
                     context.topics.append(kw)
             # Garder les 20 plus récents
             context.topics = context.topics[-20:]
         
         # Entités
-        if 'entities' in message.metadata:
-            for entity_type, values in message.metadata['entities'].items():
+        if 'entities' in meta:
+            for entity_type, values in meta['entities'].items():
                 if entity_type not in context.entities:
                     context.entities[entity_type] = []
                 context.entities[entity_type].extend(values)
                 # Dédupliquer
                 context.entities[entity_type] = list(set(context.entities[entity_type]))[:50]
         
-        # Invalidation cache
+        # Publier, puis invalidation cache
+        self.contexts[session_id] = context
         self.context_cache.set(session_id, context)
     
     def _update_analytics(self, message: Message):
-        """Met à jour les analytics globales."""
-        self.analytics['total_messages'] += 1
-        self.analytics['total_tokens'] += message.tokens
-        
-        if message.language:
-            self.analytics['popular_languages'][message.language] += 1
+        """Met à jour les analytics globales (partagées par toutes les sessions)."""
+        meta = message.meta
+        hour = time.gmtime(message.created).tm_hour
         
-        if 'domain' in message.metadata:
-            self.analytics['popular_domains'][message.metadata['domain']] += 1
-        
-        if 'intents' in message.metadata:
-            for intent in message.metadata['intents']:
-                self.analytics['popular_intents'][intent] += 1
-        
-        # Messages par heure
-        hour = datetime.fromisoformat(message.timestamp).hour
-        self.analytics['message_by_hour'][hour] += 1
+        with self.analytics_lock:
+            self.analytics['total_messages'] += 1
+            self.analytics['total_tokens'] += message.tokens
+            
+            if message.language:
+                self.analytics['popular_languages'][message.language] += 1
+            
+            if 'domain' in meta:
+                self.analytics['popular_domains'][meta['domain']] += 1
+            
+            if 'intents' in meta:
+                for intent in meta['intents']:
+                    self.analytics['popular_intents'][intent] += 1
+            
+            for keyword in meta.get('keywords', ()):
+                self.analytics['top_keywords'].add(keyword)
+            
+            # Messages par heure
+            self.analytics['message_by_hour'][hour] += 1
     
     def get_recent_messages(
         self,
@@ -930,17 +2778,21 @@ class ConversationMemory:
             if session_id is None:
                 session_id = self.default_session_id
             
-            if session_id not in self.sessions:
-                return []
-            
-            messages = self.sessions[session_id]
-            
-            # Filtrer par rôle
-            if role_filter:
-                messages = [m for m in messages if m.role.value == role_filter]
-            
-            # Prendre les N derniers
-            recent = messages[-limit:]
+            if self.db is not None:
+                # Requête indexée (session_id, timestamp)
+                recent = self.db.recent_messages(session_id, limit, role_filter)
+            else:
+                # Instantané de la liste (absent si supprimée entre-temps)
+                messages = self.sessions.get(session_id)
+                if messages is None:
+                    return []
+                
+                # Filtrer par rôle
+                if role_filter:
+                    messages = [m for m in messages if m.role.value == role_filter]
+                
+                # Prendre les N derniers
+                recent = messages[-limit:]
             
             # Convertir en dict
             result = []
@@ -958,6 +2810,99 @@ class ConversationMemory:
             print(f"Erreur get_recent_messages: {e}")
             return []
     
+    def get_messages_since_id(self, message_id: str, session_id: str = None, limit: int = None) -> List[Dict]:
+        """
+        Messages postérieurs à un message donné (exclu), ordre chronologique.
+        
+        Position via l'index d'ID ; pour un ID triable absent (archivé),
+        recherche dichotomique dans la session.
+        
+        Args:
+            message_id: ID du dernier message connu
+            session_id: ID de session (déduit de l'ID s'il est indexé)
+            limit: Nombre maximum de messages
+        
+        Returns:
+            Liste de messages
+        """
+        try:
+            if limit is not None and (not isinstance(limit, int) or limit <= 0):
+                raise ValueError("limit doit être un entier positif")
+            
+            # Lecture sans verrou : positions relues dans un seul instantané de la liste
+            entry = None
+            if self._locate_message(message_id, session_id) is not None:
+                entry = self.message_index.get(message_id)
+            if entry is not None:
+                found_session, position = entry
+                if session_id and found_session != session_id:
+                    return []
+                messages = self.sessions.get(found_session) or []
+                if position < len(messages) and messages[position].message_id == message_id:
+                    start = position + 1
+                else:
+                    # Session réindexée entre-temps
+                    start = next((i + 1 for i, m in enumerate(messages) if m.message_id == message_id),
+                                 len(messages))
+            else:
+                if session_id is None:
+                    session_id = self.default_session_id
+                if not MessageIdGenerator.is_valid(message_id) or session_id not in self.sessions:
+                    return []
+                messages = self.sessions[session_id]
+                start = bisect.bisect_right(messages, message_id, key=MessageIdGenerator.sort_key)
+            
+            return self._slice_messages(messages, start, limit)
+        
+        except Exception as e:
+            print(f"Erreur get_messages_since_id: {e}")
+            return []
+    
+    def get_messages_since(self, since: Any, session_id: str = None, limit: int = None) -> List[Dict]:
+        """
+        Messages d'une session émis à partir d'un instant (inclus), ordre chronologique.
+        
+        Recherche dichotomique sur l'ordre des ID (horodatage en préfixe).
+        
+        Args:
+            since: epoch, datetime ou horodatage ISO 8601 (naïf = UTC)
+            session_id: ID de session
+            limit: Nombre maximum de messages
+        
+        Returns:
+            Liste de messages
+        """
+        try:
+            if limit is not None and (not isinstance(limit, int) or limit <= 0):
+                raise ValueError("limit doit être un entier positif")
+            
+            since = to_epoch(since)
+            
+            if session_id is None:
+                session_id = self.default_session_id
+            
+            # Instantané : les écrivains publient une nouvelle liste ou ajoutent en fin
+            messages = self.sessions.get(session_id)
+            if not messages:
+                return []
+            
+            start = bisect.bisect_left(messages, MessageIdGenerator.lower_bound(since),
+                                       key=MessageIdGenerator.sort_key)
+            # Même milliseconde : comparer à la microseconde
+            while start < len(messages) and messages[start].created < since:
+                start += 1
+            
+            return self._slice_messages(messages, start, limit)
+        
+        except Exception as e:
+            print(f"Erreur get_messages_since: {e}")
+            return []
+    
+    @staticmethod
+    def _slice_messages(messages: List[Message], start: int, limit: Optional[int]) -> List[Dict]:
+        end = len(messages) if limit is None else min(start + limit, len(messages))
+        return [msg.to_dict() for msg in messages[start:end]]
+    
     def get_context(self, session_id: str = None) -> Dict:
         """Récupère le contexte enrichi d'une session."""
         try:
@@ -999,13 +2944,11 @@ class ConversationMemory:
         context_data = self.get_context(session_id)
         recent = self.get_recent_messages(3, session_id)
         
-        # Analyse NLP
-        language = NLPAnalyzer.detect_language(message)
-        domain = NLPAnalyzer.detect_domain(message)
-        intents = NLPAnalyzer.detect_intent(message)
-        entities = NLPAnalyzer.extract_entities(message)
-        sentiment = NLPAnalyzer.sentiment_analysis(message)
-        keywords = NLPAnalyzer.extract_keywords(message, top_n=5)
+        # Analyse NLP (une passe)
+        nlp = NLPAnalyzer.analyze(message, top_keywords=5)
+        language = nlp['language']
+        domain = nlp['domain']
+        intents = nlp['intents']
         
         # Analyse contextuelle
         is_followup = False
@@ -1036,9 +2979,9 @@ class ConversationMemory:
             'language': language,
             'domain': domain,
             'intents': intents,
-            'entities': entities,
-            'sentiment': sentiment,
-            'keywords': [kw[0] for kw in keywords],
+            'entities': nlp['entities'],
+            'sentiment': nlp['sentiment'],
+            'keywords': nlp['keywords'],
             'is_followup': is_followup,
             'refers_to_previous': refers_to_previous,
             'suggested_language': context_data.get('last_language'),
@@ -1065,68 +3008,45 @@ class ConversationMemory:
         semantic: bool = False
     ) -> List[Dict]:
         """
-        Recherche de messages avec support sémantique.
+        Recherche de messages (index inversé, classement BM25) avec support sémantique.
         
         Args:
             query: Requête de recherche
             session_id: Chercher dans une session spécifique (None = toutes)
             limit: Nombre max de résultats
-            semantic: Utiliser recherche sémantique
+            semantic: Utiliser recherche sémantique (similarité de Jaccard des mots)
         
         Returns:
             Liste de messages trouvés avec scores
         """
-        # Check cache
-        cache_key = f"search:{query}:{session_id}:{limit}"
-        cached = self.query_cache.get(cache_key)
-        if cached:
-            return cached
+        # L'index couvre les sessions résidentes : hydrater la session ciblée,
+        # ou terminer le préchargement pour une recherche globale
+        if session_id is None:
+            self._warm_up()
+        else:
+            self.sessions.ensure(session_id)
         
-        results = []
-        query_lower = query.lower()
+        # Cache : valide tant que l'index (ou la session ciblée) n'a pas changé
+        cache_key = f"search:{query}:{session_id}:{limit}:{semantic}"
+        version = self.search_index.group_version(session_id)
+        cached = self.query_cache.get(cache_key)
+        if cached and cached[0] == version:
+            return cached[1]
         
-        # Sessions à rechercher
-        sessions_to_search = [session_id] if session_id else list(self.sessions.keys())
+        if semantic:
+            # Similarité de Jaccard des mots, sur les seuls messages partageant un mot
+            hits = self.search_index.jaccard(query, top_k=limit, threshold=0.2, group=session_id)
+        else:
+            # Mots-clés : classement BM25
+            hits = self.search_index.search(query, top_k=limit, group=session_id)
         
-        for sid in sessions_to_search:
-            if sid not in self.sessions:
-                continue
-            
-            for msg in self.sessions[sid]:
-                if msg.deleted:
-                    continue
-                
-                # Recherche textuelle simple
-                content_lower = msg.content.lower()
-                
-                if semantic:
-                    # Similarité sémantique
-                    similarity = NLPAnalyzer.calculate_similarity(query, msg.content)
-                    if similarity > 0.2:
-                        results.append({
-                            'message': msg.to_dict(),
-                            'score': similarity,
-                            'session_id': sid
-                        })
-                else:
-                    # Recherche mots-clés
-                    if query_lower in content_lower:
-                        # Score basé sur fréquence
-                        count = content_lower.count(query_lower)
-                        score = min(count / 10, 1.0)
-                        
-                        results.append({
-                            'message': msg.to_dict(),
-                            'score': score,
-                            'session_id': sid
-                        })
-        
-        # Trier par score
-        results.sort(key=lambda x: x['score'], reverse=True)
-        results = results[:limit]
+        results = [
+            {'message': msg.to_dict(), 'score': score, 'session_id': sid}
+            for score, (sid, msg) in hits
+        ]
         
         # Cache
-        self.query_cache.set(cache_key, results)
+        self.query_cache.set(cache_key, (version, results))
         
         return results
     
@@ -1138,6 +3058,10 @@ class ConversationMemory:
         """
         Trouve des conversations similaires.
         
+        Les candidats viennent du LSH des signatures MinHash (sessions
+        partageant une bande) ; le bonus de contexte (langage, domaine,
+        topics) n'est calculé que pour cette courte liste.
+        
         Args:
             session_id: Session de référence
             limit: Nombre de résultats
@@ -1148,27 +3072,32 @@ class ConversationMemory:
         if session_id not in self.sessions:
             return []
         
-        # Récupérer le contexte de référence
-        ref_context = self.contexts[session_id]
-        ref_messages = self.sessions[session_id]
+        self.sessions.ensure(session_id)
+        self._warm_up()
+        self._fold_signatures()
         
-        # Créer un "document" représentant la session
-        ref_text = ' '.join([m.content for m in ref_messages])
+        # Récupérer le contexte de référence (absent si supprimée entre-temps)
+        ref_context = self.contexts.get(session_id)
+        ref_signature = self.session_signatures.get(session_id)
+        if ref_context is None or not ref_signature:
+            return []
         
         similarities = []
         
-        for sid, messages in self.sessions.items():
-            if sid == session_id or not messages:
+        # Seules les sessions partageant une bande LSH sont comparées
+        for sid in self.session_lsh.candidates(ref_signature):
+            if sid == session_id or not self.sessions.message_count(sid):
                 continue
             
-            # Document de comparaison
-            comp_text = ' '.join([m.content for m in messages])
+            signature = self.session_signatures.get(sid)
+            comp_context = self.contexts.get(sid)
+            if signature is None or comp_context is None:
+                continue
             
-            # Similarité textuelle
-            text_sim = NLPAnalyzer.calculate_similarity(ref_text, comp_text)
+            # Similarité textuelle (Jaccard des mots, estimée par MinHash)
+            text_sim = MinHashLSH.estimate(ref_signature, signature)
             
             # Similarité de contexte
-            comp_context = self.contexts[sid]
             context_sim = 0.0
             
             # Comparer langages
@@ -1203,57 +3132,45 @@ class ConversationMemory:
             if cached:
                 return cached.to_dict()
         
-        # Chercher dans les sessions
-        sessions_to_search = [session_id] if session_id else list(self.sessions.keys())
-        
-        for sid in sessions_to_search:
-            if sid not in self.sessions:
-                continue
-            
-            for msg in self.sessions[sid]:
-                if msg.message_id == message_id:
-                    return msg.to_dict()
-        
-        return None
+        # Index message_id → (session, position), session hydratée au besoin
+        msg = self._locate_message(message_id, session_id)
+        if msg is None or (session_id and self._message_session(msg) != session_id):
+            return None
+        return msg.to_dict()
     
     def get_conversation_thread(self, message_id: str) -> List[Dict]:
-        """Récupère un fil de conversation complet."""
-        results = []
+        """
+        Récupère un fil de conversation complet (ancêtres puis descendants).
         
-        # Trouver le message initial
-        current_msg = self.get_message_by_id(message_id)
-        if not current_msg:
-            return results
+        Index d'ID et d'enfants : coût proportionnel à la taille du fil. Sans
+        verrou : chaque lien est relu dans l'index au moment du parcours.
+        """
+        # Trouver le message initial (sa session est hydratée au besoin)
+        current = self._locate_message(message_id)
+        if current is None:
+            return []
         
         # Remonter aux parents
-        while current_msg:
-            results.insert(0, current_msg)
-            parent_id = current_msg.get('parent_id')
-            if not parent_id:
-                break
-            current_msg = self.get_message_by_id(parent_id)
-        
-        # Descendre aux enfants
-        def get_children(msg_id: str):
-            children = []
-            for sid in self.sessions:
-                for msg in self.sessions[sid]:
-                    if msg.parent_id == msg_id:
-                        children.append(msg.to_dict())
-            return children
+        ancestors = []
+        visited = set()
+        while current is not None and current.message_id not in visited:
+            visited.add(current.message_id)
+            ancestors.append(current)
+            current = self._lookup_message(current.parent_id)
+        
+        results = [msg.to_dict() for msg in reversed(ancestors)]
         
         # BFS pour les enfants
-        queue = [message_id]
+        queue = deque([message_id])
         visited = {message_id}
         
         while queue:
-            current_id = queue.pop(0)
-            children = get_children(current_id)
+            current_id = queue.popleft()
             
-            for child in children:
-                child_id = child['message_id']
-                if child_id not in visited:
-                    results.append(child)
+            for child_id in tuple(self.children.get(current_id, ())):
+                child = self._lookup_message(child_id)
+                if child is not None and child_id not in visited:
+                    results.append(child.to_dict())
                     queue.append(child_id)
                     visited.add(child_id)
         
@@ -1271,7 +3188,13 @@ class ConversationMemory:
         """Liste les sessions avec filtres."""
         sessions = []
         
-        for sid, ctx in self.contexts.items():
+        if self.db is not None:
+            # Requête indexée (updated_at), déjà triée et limitée
+            contexts = [(ctx.session_id, ctx) for ctx in self.db.list_contexts(status.value if status else None, limit)]
+        else:
+            contexts = self.contexts.items()
+        
+        for sid, ctx in contexts:
             if status and ctx.status != status:
                 continue
             
@@ -1330,61 +3253,83 @@ class ConversationMemory:
             if session_id is None:
                 session_id = self.default_session_id
             
-            # Sauvegarder avant d'effacer
-            if archive and session_id in self.sessions:
-                self.save_session(session_id)
-                self.contexts[session_id].status = SessionStatus.ARCHIVED
-            
-            # Effacer
-            if session_id in self.sessions:
-                self.sessions[session_id] = []
-                
-                # Réinitialiser contexte
-                self.contexts[session_id] = SessionContext(
-                    session_id=session_id,
-                    created_at=datetime.utcnow().isoformat(),
-                    updated_at=datetime.utcnow().isoformat()
-                )
-                
-                # Invalider caches
-                self.message_cache.clear()
-                self.context_cache.clear()
-                self.query_cache.clear()
+            with self._session_lock(session_id):
+                # Sauvegarder avant d'effacer
+                if archive and session_id in self.sessions:
+                    self.save_session(session_id)
+                    self.contexts[session_id].status = SessionStatus.ARCHIVED
                 
-                # Callback
-                self._trigger_callbacks('on_session_end', {'session_id': session_id})
-                
-                self._save_memory(force=True)
+                # Effacer
+                if session_id in self.sessions:
+                    self._unlink_messages(self.sessions.peek(session_id))
+                    self.sessions[session_id] = []
+                    self.session_stats.pop(session_id, None)
+                    self.dirty_sessions.add(session_id)
+                    self.search_index.remove_group(session_id)
+                    self._resign_session(session_id)
+                    
+                    # Réinitialiser contexte
+                    self.contexts[session_id] = SessionContext(
+                        session_id=session_id,
+                        created_at=datetime.utcnow().isoformat(),
+                        updated_at=datetime.utcnow().isoformat()
+                    )
+                    
+                    # Invalider caches
+                    self.message_cache.clear()
+                    self.context_cache.clear()
+                    self.query_cache.clear()
+                    
+                    # Callback
+                    self._trigger_callbacks('on_session_end', {'session_id': session_id})
+                    
+                    self._schedule_write(save=True)
         
         except Exception as e:
             print(f"Erreur clear_session: {e}")
     
     def delete_session(self, session_id: str):
         """Supprime définitivement une session."""
-        with self.lock:
+        with self._session_lock(session_id), self.lock:
             if session_id in self.sessions:
+                self._unlink_messages(self.sessions.peek(session_id))
                 del self.sessions[session_id]
+                self.session_stats.pop(session_id, None)
             if session_id in self.contexts:
                 del self.contexts[session_id]
+            self.search_index.remove_group(session_id)
+            self._resign_session(session_id)
             
-            self._save_memory(force=True)
+            if self.db is not None:
+                self.db.delete_session(session_id)
+            else:
+                self._schedule_write(save=True)
     
     def merge_sessions(self, source_id: str, target_id: str) -> bool:
         """Fusionne deux sessions."""
         try:
-            if source_id not in self.sessions or target_id not in self.sessions:
-                return False
-            
-            with self.lock:
-                # Ajouter messages
-                self.sessions[target_id].extend(self.sessions[source_id])
+            with self._sessions_locked(source_id, target_id), self.lock:
+                if source_id not in self.sessions or target_id not in self.sessions:
+                    return False
+                
+                # Ajouter messages (nouvelle liste, triée par _reindex_session)
+                self.sessions[target_id] = self.sessions[target_id] + self.sessions[source_id]
+                self.dirty_sessions.add(target_id)
                 
-                # Trier par timestamp
-                self.sessions[target_id].sort(key=lambda m: m.timestamp)
+                # Fusionner agrégats (reconstruits au besoin si l'un manque)
+                target_stats = self.session_stats.get(target_id)
+                source_stats = self.session_stats.get(source_id)
+                if target_stats is not None and source_stats is not None:
+                    target_stats.merge(source_stats)
+                else:
+                    self.session_stats.pop(target_id, None)
                 
-                # Fusionner contextes
+                # Fusionner contextes (copie publiée à la fin)
                 src_ctx = self.contexts[source_id]
-                tgt_ctx = self.contexts[target_id]
+                tgt_ctx = replace(
+                    self.contexts[target_id],
+                    entities={entity_type: list(values) for entity_type, values in self.contexts[target_id].entities.items()}
+                )
                 
                 tgt_ctx.message_count += src_ctx.message_count
                 tgt_ctx.total_tokens += src_ctx.total_tokens
@@ -1397,9 +3342,15 @@ class ConversationMemory:
                         tgt_ctx.entities[entity_type] = []
                     tgt_ctx.entities[entity_type].extend(values)
                     tgt_ctx.entities[entity_type] = list(set(tgt_ctx.entities[entity_type]))[:100]
+                self.contexts[target_id] = tgt_ctx
+                self.context_cache.set(target_id, tgt_ctx)
                 
                 # Supprimer source
                 self.delete_session(source_id)
+                self._reindex_session(target_id)
+                if self.db is not None:
+                    # Les messages déplacés vers la cible doivent être réécrits
+                    self._schedule_write(save=True)
                 
                 return True
         
@@ -1420,6 +3371,20 @@ class ConversationMemory:
         # Garder les plus récents
         to_archive = messages[:-keep]
         self.sessions[session_id] = messages[-keep:]
+        self.dirty_sessions.add(session_id)
+        if session_id in self.session_stats:
+            self.session_stats[session_id].remove(
+                [m for m in to_archive if m.message_id not in self.enrich_pending], self.sessions[session_id]
+            )
+        # La signature MinHash garde les mots archivés (historique de la session)
+        for message in to_archive:
+            self.search_index.remove(id(message))
+        self._unlink_messages(to_archive)
+        self._reposition_session(session_id)
+        if self.db is not None:
+            self.db.delete_messages(session_id, [m.message_id for m in to_archive])
+        elif self.auto_save:
+            self._schedule_write(('archive', {'session_id': session_id, 'keep': keep}))
         
         # Sauvegarder archive
         archive_data = {
@@ -1437,27 +3402,31 @@ class ConversationMemory:
     
     def get_statistics(self) -> Dict:
         """Récupère les statistiques globales détaillées."""
+        counts = self.sessions.message_counts()
+        statuses = Counter(ctx.status for ctx in list(self.contexts.values()))
+        analytics = self._serializable_analytics()
         stats = {
             'global': {
                 'total_sessions': len(self.sessions),
-                'active_sessions': len([s for s, c in self.contexts.items() if c.status == SessionStatus.ACTIVE]),
-                'archived_sessions': len([s for s, c in self.contexts.items() if c.status == SessionStatus.ARCHIVED]),
-                'total_messages': self.analytics['total_messages'],
-                'total_tokens': self.analytics['total_tokens'],
+                'active_sessions': statuses[SessionStatus.ACTIVE],
+                'archived_sessions': statuses[SessionStatus.ARCHIVED],
+                'total_messages': analytics['total_messages'],
+                'total_tokens': analytics['total_tokens'],
                 'avg_tokens_per_message': (
-                    self.analytics['total_tokens'] / self.analytics['total_messages']
-                    if self.analytics['total_messages'] > 0 else 0
+                    analytics['total_tokens'] / analytics['total_messages']
+                    if analytics['total_messages'] > 0 else 0
                 )
             },
-            'languages': dict(self.analytics['popular_languages'].most_common(10)),
-            'domains': dict(self.analytics['popular_domains'].most_common(10)),
-            'intents': dict(self.analytics['popular_intents'].most_common(10)),
+            'languages': dict(Counter(analytics['popular_languages']).most_common(10)),
+            'domains': dict(Counter(analytics['popular_domains']).most_common(10)),
+            'intents': dict(Counter(analytics['popular_intents']).most_common(10)),
+            'keywords': dict(Counter(analytics['top_keywords']).most_common(10)),
             'activity': {
-                'messages_by_hour': dict(self.analytics['message_by_hour']),
+                'messages_by_hour': analytics['message_by_hour'],
                 'peak_hour': max(
-                    self.analytics['message_by_hour'].items(),
+                    analytics['message_by_hour'].items(),
                     key=lambda x: x[1]
-                )[0] if self.analytics['message_by_hour'] else None
+                )[0] if analytics['message_by_hour'] else None
             },
             'cache': {
                 'message_cache': self.message_cache.stats(),
@@ -1466,75 +3435,72 @@ class ConversationMemory:
             },
             'sessions': {
                 'avg_messages_per_session': (
-                    sum(len(msgs) for msgs in self.sessions.values()) / len(self.sessions)
-                    if self.sessions else 0
+                    sum(counts.values()) / len(counts)
+                    if counts else 0
                 ),
                 'longest_session': max(
-                    [(sid, len(msgs)) for sid, msgs in self.sessions.items()],
+                    counts.items(),
                     key=lambda x: x[1]
-                )[0] if self.sessions else None
-            }
+                )[0] if counts else None
+            },
+            'paging': self.sessions.stats()
         }
         
         # Performance
-        if self.analytics['response_times']:
+        if analytics['response_times']:
             stats['performance'] = {
-                'avg_response_time': sum(self.analytics['response_times']) / len(self.analytics['response_times']),
-                'min_response_time': min(self.analytics['response_times']),
-                'max_response_time': max(self.analytics['response_times'])
+                'avg_response_time': sum(analytics['response_times']) / len(analytics['response_times']),
+                'min_response_time': min(analytics['response_times']),
+                'max_response_time': max(analytics['response_times'])
             }
         
         return stats
     
+    def _session_stats(self, session_id: str) -> SessionStats:
+        """Agrégats d'une session (construits une fois, puis incrémentaux)."""
+        with self._session_lock(session_id):
+            stats = self.session_stats.get(session_id)
+            if stats is None:
+                # Les messages en cours d'enrichissement y entreront à la fin de celui-ci
+                stats = SessionStats.from_messages([
+                    m for m in self.sessions[session_id] if m.message_id not in self.enrich_pending
+                ])
+                self.session_stats[session_id] = stats
+            return stats
+    
     def _get_session_analytics(self, session_id: str) -> Dict:
-        """Analytics pour une session spécifique."""
-        if session_id not in self.sessions:
-            return {}
-        
-        messages = self.sessions[session_id]
-        context = self.contexts[session_id]
-        
-        if not messages:
-            return {}
-        
-        # Compter par rôle
-        role_counts = Counter([m.role.value for m in messages])
+        """Analytics pour une session spécifique (agrégats courants, sans parcours des messages)."""
+        self.sessions.ensure(session_id)
         
-        # Langages utilisés
-        languages = Counter([m.language for m in messages if m.language])
-        
-        # Sentiments
-        sentiments = [m.sentiment for m in messages if m.sentiment is not None]
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        # Timestamps
-        timestamps = [datetime.fromisoformat(m.timestamp) for m in messages]
-        duration = (timestamps[-1] - timestamps[0]).total_seconds() if len(timestamps) > 1 else 0
-        
-        # Mots-clés globaux
-        all_keywords = []
-        for m in messages:
-            if 'keywords' in m.metadata:
-                all_keywords.extend(m.metadata['keywords'])
-        
-        top_keywords = Counter(all_keywords).most_common(10)
-        
-        return {
-            'session_id': session_id,
-            'message_count': len(messages),
-            'role_distribution': dict(role_counts),
-            'languages_used': dict(languages),
-            'avg_sentiment': avg_sentiment,
-            'duration_seconds': duration,
-            'total_tokens': context.total_tokens,
-            'avg_tokens_per_message': context.total_tokens / len(messages) if messages else 0,
-            'top_keywords': dict(top_keywords),
-            'topics': context.topics[:10],
-            'entities_count': {k: len(v) for k, v in context.entities.items()},
-            'status': context.status.value,
-            'created_at': context.created_at,
-            'updated_at': context.updated_at
-        }
+        # Sous le verrou de la session : agrégats cohérents pendant la lecture
+        with self._session_lock(session_id):
+            if session_id not in self.sessions:
+                return {}
+            
+            stats = self._session_stats(session_id)
+            context = self.contexts[session_id]
+            
+            if not stats.message_count:
+                return {}
+            
+            count = stats.message_count
+            
+            return {
+                'session_id': session_id,
+                'message_count': count,
+                'role_distribution': dict(stats.roles),
+                'languages_used': dict(stats.languages),
+                'avg_sentiment': stats.sentiment_sum / stats.sentiment_count if stats.sentiment_count else 0,
+                'duration_seconds': stats.last - stats.first if count > 1 else 0,
+                'total_tokens': context.total_tokens,
+                'avg_tokens_per_message': context.total_tokens / count,
+                'top_keywords': dict(stats.keywords.most_common(10)),
+                'topics': context.topics[:10],
+                'entities_count': {k: len(v) for k, v in context.entities.items()},
+                'status': context.status.value,
+                'created_at': context.created_at,
+                'updated_at': context.updated_at
+            }
     
     def get_session_summary(self, session_id: str) -> Dict:
         """Génère un résumé détaillé d'une session."""
@@ -1747,6 +3713,17 @@ class ConversationMemory:
                 }
                 content = base64.b64encode(pickle.dumps(data)).decode('utf-8')
             
+            elif format == ExportFormat.SQLITE:
+                # Base autonome (même schéma que le stockage SQLite), fichier requis
+                if not filepath:
+                    return None
+                db = SQLiteStorageBackend(filepath)
+                db.replace_all({session_id: messages}, {session_id: context}, {
+                    'analytics': self._get_session_analytics(session_id)
+                })
+                db.close()
+                return filepath
+            
             else:
                 return None
             
@@ -1779,6 +3756,9 @@ class ConversationMemory:
             result = self.export_session(session_id, format, filepath)
             if result:
                 exported.append(filepath)
+            
+            # Les sessions paginées relues pour l'export repartent sur disque
+            self._enforce_memory_budget()
         
         return exported
     
@@ -1790,6 +3770,33 @@ class ConversationMemory:
     ) -> bool:
         """Importe une session depuis un fichier."""
         try:
+            if format == ExportFormat.SQLITE:
+                db = SQLiteStorageBackend(filepath)
+                sessions, contexts, _ = db.load()
+                db.close()
+                if not sessions:
+                    return False
+                
+                source_id = next(iter(sessions))
+                sid = session_id or source_id
+                context = contexts.get(source_id) or SessionContext(
+                    session_id=sid,
+                    created_at=datetime.utcnow().isoformat(),
+                    updated_at=datetime.utcnow().isoformat()
+                )
+                context.session_id = sid
+                
+                with self._session_lock(sid), self.lock:
+                    self._unlink_messages(self.sessions.peek(sid))
+                    self.session_stats.pop(sid, None)
+                    self.sessions[sid] = sessions[source_id]
+                    self.contexts[sid] = context
+                    self.dirty_sessions.add(sid)
+                    self._reindex_session(sid)
+                    self._schedule_write(save=True)
+                
+                return True
+            
             with open(filepath, 'r', encoding='utf-8') as f:
                 content = f.read()
             
@@ -1799,11 +3806,16 @@ class ConversationMemory:
                 context = SessionContext.from_dict(data['context'])
                 
                 sid = session_id or data.get('session_id', f'imported_{int(time.time())}')
+                context.session_id = sid
                 
-                with self.lock:
+                with self._session_lock(sid), self.lock:
+                    self._unlink_messages(self.sessions.peek(sid))
+                    self.session_stats.pop(sid, None)
                     self.sessions[sid] = messages
                     self.contexts[sid] = context
-                    self._save_memory(force=True)
+                    self.dirty_sessions.add(sid)
+                    self._reindex_session(sid)
+                    self._schedule_write(save=True)
                 
                 return True
             
@@ -1815,10 +3827,14 @@ class ConversationMemory:
                 
                 sid = session_id or f'imported_{int(time.time())}'
                 
-                with self.lock:
+                with self._session_lock(sid), self.lock:
+                    self._unlink_messages(self.sessions.peek(sid))
+                    self.session_stats.pop(sid, None)
+                    self._create_session(sid)  # Contexte créé avant le remplacement des messages
                     self.sessions[sid] = messages
-                    self._create_session(sid)
-                    self._save_memory(force=True)
+                    self.dirty_sessions.add(sid)
+                    self._reindex_session(sid)
+                    self._schedule_write(save=True)
                 
                 return True
             
@@ -1855,15 +3871,116 @@ class ConversationMemory:
     #                          MAINTENANCE & UTILITIES
     # ═══════════════════════════════════════════════════════════════════════════
     
-    def _start_auto_save_timer(self, interval: int = 300):
-        """Démarre le timer d'auto-sauvegarde (5 minutes)."""
-        def auto_save():
-            while True:
-                time.sleep(interval)
-                self._save_memory()
+    def _start_flusher(self):
+        """Démarre le thread d'écriture différée (une seule fois)."""
+        with self.flush_cond:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flusher_loop, daemon=True)
+                self.flusher.start()
+    
+    def _schedule_write(self, op: Optional[Tuple[str, Dict]] = None, save: bool = False):
+        """
+        Enregistre une écriture différée et réveille le flusher.
         
-        timer = threading.Thread(target=auto_save, daemon=True)
-        timer.start()
+        Args:
+            op: Opération à journaliser (stockage fichiers)
+            save: Sauvegarde des sessions modifiées demandée (opérations non
+                journalisées : suppression, fusion, import, restauration...)
+        """
+        self._start_flusher()
+        
+        with self.flush_cond:
+            if not self.pending_count and not self.save_requested:
+                self.dirty_since = time.monotonic()
+            if op is not None:
+                self.pending_ops.append(op)
+            self.pending_count += 1
+            self.save_requested = self.save_requested or save
+            
+            # Réveil au début d'une rafale ou quand le lot est plein
+            if self.pending_count == 1 or self.pending_count >= self.flush_max_pending:
+                self.flush_cond.notify()
+    
+    def _flusher_loop(self):
+        """Regroupe chaque rafale de mutations (délai max / lot max) en une écriture."""
+        while True:
+            with self.flush_cond:
+                while not self.pending_count and not self.save_requested:
+                    self.flush_cond.wait()
+                
+                while self.pending_count < self.flush_max_pending:
+                    remaining = self.dirty_since + self.flush_max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.flush_cond.wait(remaining)
+            
+            if not self.flush():
+                # Échec (disque plein...) : ne pas boucler à vide
+                time.sleep(self.flush_max_delay)
+    
+    def flush(self) -> bool:
+        """
+        Écrit immédiatement les mutations en attente (synchrone : arrêt, tests).
+        
+        Stockage fichiers : les opérations en attente sont ajoutées au journal
+        en une écriture, puis les shards modifiés sont sauvegardés si une
+        opération l'a demandé ou si le journal est trop long. Stockage SQLite :
+        le lot est écrit en une transaction.
+        """
+        with self.flush_cond:
+            save = self.save_requested
+            self.pending_count = 0
+            self.save_requested = False
+        
+        try:
+            if self.db is not None:
+                self._flush_db()
+            else:
+                self._write_pending()
+                # Sans auto-save, rien n'est journalisé : sauvegarder l'état modifié
+                save = save or self.wal.records >= self.wal_compact_records or (
+                    not self.auto_save and bool(self.dirty_sessions)
+                )
+            
+            if save and not self._save_memory(force=True):
+                raise IOError("sauvegarde échouée")
+            
+            # Évictions reportées pendant l'écriture
+            self._enforce_memory_budget(wait=True)
+            return True
+        
+        except Exception as e:
+            print(f"Erreur écriture différée: {e}")
+            # Redemander la sauvegarde au prochain passage
+            with self.flush_cond:
+                self.save_requested = self.save_requested or save
+            self._trigger_callbacks('on_error', {'error': str(e), 'operation': 'flush'})
+            return False
+    
+    def _write_pending(self):
+        """Ajoute au journal, en une écriture, les opérations en attente."""
+        # save_lock : une sauvegarde ne peut pas s'intercaler entre le retrait
+        # du lot et son écriture
+        with self.save_lock:
+            with self.flush_cond:
+                batch, self.pending_ops = self.pending_ops, []
+            if not batch:
+                return
+            
+            try:
+                self.wal.append_many(batch)
+            except Exception:
+                with self.flush_cond:
+                    self.pending_ops[:0] = batch
+                raise
+    
+    def close(self):
+        """Arrêt propre : termine les enrichissements, écrit tout ce qui est en attente et ferme le stockage."""
+        self.wait_enriched()
+        self.flush()
+        self.wal.close()
+        if self.db is not None:
+            self.db.close()
     
     def _start_gc_timer(self, interval: int = 3600):
         """Démarre le garbage collector (1 heure)."""
@@ -1878,50 +3995,53 @@ class ConversationMemory:
     def _garbage_collect(self):
         """Nettoyage automatique."""
         try:
-            with self.lock:
-                # Supprimer sessions expirées (TTL)
-                now = datetime.utcnow()
-                expired = []
-                
-                for sid, ctx in self.contexts.items():
-                    if ctx.ttl:
-                        updated = datetime.fromisoformat(ctx.updated_at)
-                        age = (now - updated).total_seconds()
-                        
-                        if age > ctx.ttl:
-                            expired.append(sid)
-                
-                for sid in expired:
-                    print(f"GC: Session {sid} expirée (TTL)")
-                    self.delete_session(sid)
-                
-                # Limiter nombre de sessions
-                if len(self.sessions) > self.max_sessions:
-                    # Supprimer les plus anciennes
-                    sorted_sessions = sorted(
-                        self.contexts.items(),
-                        key=lambda x: x[1].updated_at
-                    )
+            # Supprimer sessions expirées (TTL) ; sans verrou global, chaque
+            # suppression prend les verrous de sa session
+            now = datetime.utcnow()
+            expired = []
+            
+            for sid, ctx in list(self.contexts.items()):
+                if ctx.ttl:
+                    updated = datetime.fromisoformat(ctx.updated_at)
+                    age = (now - updated).total_seconds()
                     
-                    to_remove = len(self.sessions) - self.max_sessions
-                    for i in range(to_remove):
-                        sid = sorted_sessions[i][0]
-                        print(f"GC: Suppression session {sid} (limite atteinte)")
-                        self.save_session(sid)  # Archiver d'abord
-                        self.delete_session(sid)
+                    if age > ctx.ttl:
+                        expired.append(sid)
+            
+            for sid in expired:
+                print(f"GC: Session {sid} expirée (TTL)")
+                self.delete_session(sid)
+            
+            # Limiter nombre de sessions
+            if len(self.sessions) > self.max_sessions:
+                # Supprimer les plus anciennes
+                sorted_sessions = sorted(
+                    list(self.contexts.items()),
+                    key=lambda x: x[1].updated_at
+                )
                 
-                # Nettoyer rate limits
-                now_ts = time.time()
-                for sid in list(self.rate_limits.keys()):
-                    self.rate_limits[sid] = [
-                        t for t in self.rate_limits[sid]
-                        if now_ts - t < self.rate_limit_config['window']
-                    ]
-                    
-                    if not self.rate_limits[sid]:
-                        del self.rate_limits[sid]
+                to_remove = len(self.sessions) - self.max_sessions
+                for i in range(to_remove):
+                    sid = sorted_sessions[i][0]
+                    print(f"GC: Suppression session {sid} (limite atteinte)")
+                    self.save_session(sid)  # Archiver d'abord
+                    self.delete_session(sid)
+            
+            # Nettoyer rate limits
+            now_ts = time.time()
+            for sid in list(self.rate_limits.keys()):
+                self.rate_limits[sid] = [
+                    t for t in self.rate_limits[sid]
+                    if now_ts - t < self.rate_limit_config['window']
+                ]
                 
-                print(f"GC: Nettoyage effectué - {len(self.sessions)} sessions actives")
+                if not self.rate_limits[sid]:
+                    del self.rate_limits[sid]
+            
+            # Sessions hydrées par des lectures depuis le dernier ajout
+            self._enforce_memory_budget()
+            
+            print(f"GC: Nettoyage effectué - {len(self.sessions)} sessions actives")
         
         except Exception as e:
             print(f"Erreur GC: {e}")
@@ -1930,8 +4050,8 @@ class ConversationMemory:
         """Optimise le stockage."""
         try:
             # Compresser sessions peu utilisées
-            for sid in self.sessions:
-                if len(self.sessions[sid]) > 100:
+            for sid, count in self.sessions.message_counts().items():
+                if count > 100:
                     # Archiver les anciens messages
                     self._archive_old_messages(sid, keep=100)
             
@@ -1941,7 +4061,7 @@ class ConversationMemory:
             self.query_cache.clear()
             
             # Forcer sauvegarde compressée
-            self._save_memory(force=True)
+            self._schedule_write(save=True)
             
             print("✓ Optimisation storage effectuée")
             return True
@@ -1951,11 +4071,30 @@ class ConversationMemory:
             return False
     
     def backup(self, backup_dir: str = 'backups') -> Optional[str]:
-        """Crée une sauvegarde complète."""
+        """
+        Crée une sauvegarde complète.
+        
+        Stockage fichiers : copie du jeu de shards dans `backup_<ts>/` (les
+        sessions ne sont pas réencodées). Stockage SQLite : archive JSON
+        compressée `backup_<ts>.json.gz`.
+        """
         try:
             os.makedirs(backup_dir, exist_ok=True)
             
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            
+            if self.db is None:
+                # Écrire les sessions modifiées, puis copier un jeu cohérent
+                if not self._save_memory(force=True):
+                    return None
+                
+                backup_path = os.path.join(backup_dir, f'backup_{timestamp}')
+                with self.save_lock:
+                    manifest = self.shards.copy_to(backup_path)
+                
+                print(f"✓ Backup créé: {backup_path} ({len(manifest['sessions'])} shards)")
+                return backup_path
+            
             backup_file = os.path.join(backup_dir, f'backup_{timestamp}.json.gz')
             
             # Créer backup
@@ -1969,12 +4108,7 @@ class ConversationMemory:
                     for sid, ctx in self.contexts.items()
                 },
                 'metadata': self.metadata,
-                'analytics': {
-                    **self.analytics,
-                    'popular_languages': dict(self.analytics['popular_languages']),
-                    'popular_domains': dict(self.analytics['popular_domains']),
-                    'popular_intents': dict(self.analytics['popular_intents'])
-                },
+                'analytics': self._serializable_analytics(),
                 'backup_info': {
                     'timestamp': timestamp,
                     'version': self.metadata['version']
@@ -1996,37 +4130,52 @@ class ConversationMemory:
             return None
     
     def restore(self, backup_file: str) -> bool:
-        """Restaure depuis une sauvegarde."""
+        """
+        Restaure depuis une sauvegarde : répertoire de shards (backup())
+        ou archive `.json.gz` (ancien format, stockage SQLite).
+        """
         try:
-            with open(backup_file, 'rb') as f:
-                compressed = f.read()
-            
-            json_data = gzip.decompress(compressed).decode('utf-8')
-            data = json.loads(json_data)
-            
-            with self.lock:
-                # Restaurer sessions
-                self.sessions = {}
-                for sid, messages in data['sessions'].items():
-                    self.sessions[sid] = [Message.from_dict(m) for m in messages]
+            if os.path.isdir(backup_file):
+                store = ShardStore(backup_file)
+                data = store.load_manifest()
+                if data is None:
+                    raise FileNotFoundError(os.path.join(backup_file, ShardStore.MANIFEST))
+                sessions, contexts, _ = self._read_shards(store, data)
+            else:
+                with open(backup_file, 'rb') as f:
+                    compressed = f.read()
                 
-                # Restaurer contexts
-                self.contexts = {}
-                for sid, ctx in data['contexts'].items():
-                    self.contexts[sid] = SessionContext.from_dict(ctx)
+                json_data = gzip.decompress(compressed).decode('utf-8')
+                data = json.loads(json_data)
+                
+                sessions = {
+                    sid: [Message.from_dict(m) for m in messages]
+                    for sid, messages in data['sessions'].items()
+                }
+                contexts = {
+                    sid: SessionContext.from_dict(ctx)
+                    for sid, ctx in data['contexts'].items()
+                }
+            
+            with self._exclusive():
+                # Restaurer sessions et contexts (toutes résidentes)
+                self.warmup_queue.clear()
+                self.shard_floors.clear()
+                self.sessions.reset(sessions)
+                self.session_stats.clear()
+                self.contexts = contexts
+                self.dirty_sessions.update(sessions)
+                self._rebuild_indexes()
                 
                 # Restaurer metadata
                 self.metadata = data['metadata']
                 
                 # Restaurer analytics
                 if 'analytics' in data:
-                    self.analytics = data['analytics']
-                    for key in ['popular_languages', 'popular_domains', 'popular_intents']:
-                        if key in self.analytics and isinstance(self.analytics[key], dict):
-                            self.analytics[key] = Counter(self.analytics[key])
+                    self._restore_analytics(data['analytics'])
                 
                 # Sauvegarder
-                self._save_memory(force=True)
+                self._schedule_write(save=True)
             
             print(f"✓ Restauration réussie depuis {backup_file}")
             return True
@@ -2059,20 +4208,28 @@ class ConversationMemory:
             status = 'warning'
             warnings.append(f"Faible taux de cache hit ({avg_cache_hit_rate:.1f}%)")
         
-        for sid, messages in self.sessions.items():
-            if len(messages) >= self.max_messages_per_session * 0.9:
+        for sid, count in self.sessions.message_counts().items():
+            if count >= self.max_messages_per_session * 0.9:
                 status = 'warning'
                 warnings.append(f"Session {sid} proche de la limite de messages")
         
+        paging = self.sessions.stats()
+        if self.sessions.resident_bytes > self.memory_budget:
+            warnings.append(f"Budget mémoire dépassé ({paging['resident_mb']} MB résidents)")
+        
         return {
             'status': status,
             'timestamp': datetime.utcnow().isoformat(),
             'warnings': warnings,
             'metrics': {
                 'total_sessions': len(self.sessions),
+                'resident_sessions': paging['resident_sessions'],
+                'paged_sessions': paging['paged_sessions'],
                 'total_messages': stats['global']['total_messages'],
                 'cache_hit_rate': f"{avg_cache_hit_rate:.1f}%",
                 'memory_usage_mb': self._estimate_memory_usage(),
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 2),
+                'enrichment_pending': len(self.enrich_pending),
                 'storage_size_mb': self._get_storage_size()
             }
         }
@@ -2087,7 +4244,7 @@ class ConversationMemory:
             total_size += sys.getsizeof(self.contexts)
             total_size += sys.getsizeof(self.analytics)
             
-            for messages in self.sessions.values():
+            for _, messages in self.sessions.resident_items():
                 total_size += sys.getsizeof(messages)
                 for msg in messages:
                     total_size += sys.getsizeof(msg.content)
@@ -2101,10 +4258,10 @@ class ConversationMemory:
         try:
             total_size = 0
             
-            for filename in os.listdir(self.storage.base_path):
-                filepath = os.path.join(self.storage.base_path, filename)
-                if os.path.isfile(filepath):
-                    total_size += os.path.getsize(filepath)
+            # Shards compris (sous-répertoires)
+            for root, _, filenames in os.walk(self.storage.base_path):
+                for filename in filenames:
+                    total_size += os.path.getsize(os.path.join(root, filename))
             
             return total_size / (1024 * 1024)
         except:
@@ -2114,19 +4271,25 @@ class ConversationMemory:
         """Représentation string."""
         return (
             f"<ConversationMemory sessions={len(self.sessions)} "
-            f"messages={sum(len(m) for m in self.sessions.values())} "
+            f"messages={len(self)} "
             f"cache_size={len(self.message_cache.cache)}>"
         )
     
     def __len__(self) -> int:
         """Nombre total de messages."""
-        return sum(len(messages) for messages in self.sessions.values())
+        return sum(self.sessions.message_counts().values())
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                              GLOBAL INSTANCE
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _memory_database_url() -> Optional[str]:
+    """URL de la base si Config.MEMORY_STORAGE = 'sqlite' (fichiers sinon)."""
+    from .config import get_config
+    config = get_config()
+    return config.DATABASE_URL if config.MEMORY_STORAGE == 'sqlite' else None
+
 # Instance globale avec configuration optimisée
 memory = ConversationMemory(
     cache_size=1000,
@@ -2134,10 +4297,19 @@ memory = ConversationMemory(
     auto_save=True,
     compress=True,
     enable_nlp=True,
-    max_sessions=100,
-    max_messages_per_session=10000
+    max_sessions=int(os.environ.get('NAMZ_MEMORY_MAX_SESSIONS', 10000)),  # Une session par client
+    max_messages_per_session=10000,
+    wal_fsync=os.environ.get('NAMZ_MEMORY_WAL_FSYNC', 'interval'),
+    database_url=_memory_database_url(),
+    flush_max_delay=float(os.environ.get('NAMZ_MEMORY_FLUSH_DELAY', 1.0)),
+    flush_max_pending=int(os.environ.get('NAMZ_MEMORY_FLUSH_MAX_PENDING', 256)),
+    memory_budget_mb=float(os.environ.get('NAMZ_MEMORY_BUDGET_MB', 256)),
+    enrich_queue_size=int(os.environ.get('NAMZ_MEMORY_ENRICH_QUEUE', 1024))
 )
 
+# Écrire les mutations en attente à l'arrêt du processus
+atexit.register(memory.close)
+
 def get_conversation_memory() -> ConversationMemory:
     """
     Récupère l'instance globale de mémoire de conversation.
@@ -2187,16 +4359,18 @@ def merge_memories(source: ConversationMemory, target: ConversationMemory) -> bo
         bool: Succès de la fusion
     """
     try:
-        with target.lock:
+        with target._exclusive():
             # Fusionner sessions
             for sid, messages in source.sessions.items():
                 if sid in target.sessions:
-                    # Fusionner avec session existante
-                    target.sessions[sid].extend(messages)
-                    target.sessions[sid].sort(key=lambda m: m.timestamp)
+                    # Fusionner avec session existante (nouvelle liste)
+                    target.sessions[sid] = target.sessions[sid] + messages
+                    target.session_stats.pop(sid, None)
+                    target.dirty_sessions.add(sid)
                 else:
                     # Copier session
                     target.sessions[sid] = messages.copy()
+                target._reindex_session(sid)
             
             # Fusionner contexts
             for sid, ctx in source.contexts.items():
@@ -2204,16 +4378,19 @@ def merge_memories(source: ConversationMemory, target: ConversationMemory) -> bo
                     target.contexts[sid] = ctx
             
             # Mettre à jour analytics
-            target.analytics['total_messages'] += source.analytics['total_messages']
-            target.analytics['total_tokens'] += source.analytics['total_tokens']
-            
-            for lang, count in source.analytics['popular_languages'].items():
-                target.analytics['popular_languages'][lang] += count
-            
-            for domain, count in source.analytics['popular_domains'].items():
-                target.analytics['popular_domains'][domain] += count
+            with target.analytics_lock:
+                target.analytics['total_messages'] += source.analytics['total_messages']
+                target.analytics['total_tokens'] += source.analytics['total_tokens']
+                
+                for lang, count in source.analytics['popular_languages'].items():
+                    target.analytics['popular_languages'][lang] += count
+                
+                for domain, count in source.analytics['popular_domains'].items():
+                    target.analytics['popular_domains'][domain] += count
+                
+                target.analytics['top_keywords'].update(source.analytics['top_keywords'])
             
-            target._save_memory(force=True)
+            target._schedule_write(save=True)
         
         return True
     except Exception as e:
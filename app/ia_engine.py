@@ -1,18 +1,29 @@
 from .user_examples import find_best_user_example
 from .code_templates import CODE_TEMPLATES
+from .text_index import get_template_index, get_knowledge_index, MinHashLSH
+from .message_features import (
+    MessageFeatures, CODE_REQUEST_KEYWORDS, CODE_HELPER_KEYWORDS, MULTI_FILE_KEYWORDS,
+    HELP_KEYWORDS, MOTIVATION_KEYWORDS, THANKS_KEYWORDS, HUMOUR_KEYWORDS,
+    GREETING_FR_WORDS, GREETING_EN_WORDS, LANGUAGE_HINTS, INTENT_HINTS, CODE_TYPE_HINTS,
+    DOMAIN_HINTS, COMPLEXITY_HINTS, SYMBOL_PATTERN, first_hint, normalize_message
+)
 from .knowledge_base import KNOWLEDGE_BASE
 from .conversation_memory import get_conversation_memory
 from .code_analyzer import get_code_analyzer
 from .proactive_suggester import get_proactive_suggester
 from .multi_file_generator import get_multi_file_generator
+from .rule_evaluator import RuleEvaluator
+from .cache_backends import MemoryCacheBackend, create_cache_backend
 import os
 import time
 import logging
 from collections import OrderedDict
 from functools import wraps
 from threading import Lock
+from typing import Optional
 import hashlib
 import json
+import struct
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -20,65 +31,53 @@ logger = logging.getLogger(__name__)
 # Flag pour activer le moteur V2 (mettre False pour utiliser V1 legacy)
 USE_ENGINE_V2 = os.getenv('NAMZ_USE_ENGINE_V2', 'true').lower() == 'true'
 
+# Cache de second niveau : forme canonique du message, + recherche floue MinHash optionnelle
+CACHE_NORMALIZED = os.getenv('NAMZ_CACHE_NORMALIZED', 'true').lower() == 'true'
+CACHE_FUZZY = os.getenv('NAMZ_CACHE_FUZZY', 'false').lower() == 'true'
+CACHE_FUZZY_THRESHOLD = float(os.getenv('NAMZ_CACHE_FUZZY_THRESHOLD', '0.8'))
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                        CACHE LRU INTELLIGENT
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class LRUCache:
-    """Cache LRU thread-safe avec TTL pour réponses IA."""
+    """
+    Cache LRU thread-safe avec TTL pour réponses IA.
+    
+    Le stockage est délégué à un backend (mémoire du processus par défaut,
+    ou mmap / SQLite partagé entre workers selon Config.CACHE_TYPE).
+    Les compteurs de hits/misses sont propres au processus.
+    """
     
-    def __init__(self, maxsize=1000, ttl=3600):
-        self.cache = OrderedDict()
+    def __init__(self, maxsize=1000, ttl=3600, backend=None):
         self.maxsize = maxsize
         self.ttl = ttl  # Time to live en secondes
+        self.backend = backend if backend is not None else MemoryCacheBackend(maxsize, ttl)
         self.lock = Lock()
         self.hits = 0
         self.misses = 0
     
-    def _make_key(self, message: str) -> str:
-        """Génère une clé de cache normalisée."""
+    def _make_key(self, message: str, scope: Optional[str] = None) -> str:
+        """Génère une clé de cache normalisée (propre à `scope`, une session, si donné)."""
         normalized = message.lower().strip()
+        if scope is not None:
+            normalized += '\x00' + scope  # Identifiant de session sensible à la casse
         return hashlib.md5(normalized.encode()).hexdigest()
     
-    def get(self, message: str):
+    def get(self, message: str, scope: Optional[str] = None):
         """Récupère une valeur du cache."""
-        key = self._make_key(message)
+        value = self.backend.get(self._make_key(message, scope))
         
         with self.lock:
-            if key not in self.cache:
+            if value is None:
                 self.misses += 1
-                return None
-            
-            # Vérifier TTL
-            entry = self.cache[key]
-            age = time.time() - entry['timestamp']
-            
-            if age > self.ttl:
-                del self.cache[key]
-                self.misses += 1
-                return None
-            
-            # Déplacer en fin (plus récent)
-            self.cache.move_to_end(key)
-            self.hits += 1
-            return entry['value']
+            else:
+                self.hits += 1
+        return value
     
-    def set(self, message: str, value):
-        """Ajoute une valeur au cache."""
-        key = self._make_key(message)
-        
-        with self.lock:
-            if key in self.cache:
-                self.cache.move_to_end(key)
-            
-            self.cache[key] = {
-                'value': value,
-                'timestamp': time.time()
-            }
-            
-            # Éviction LRU si dépassement
-            if len(self.cache) > self.maxsize:
-                self.cache.popitem(last=False)
+    def set(self, message: str, value, scope: Optional[str] = None):
+        """Ajoute une valeur au cache (TTL et éviction LRU gérés par le backend)."""
+        self.backend.set(self._make_key(message, scope), value)
     
     def stats(self):
         """Statistiques du cache."""
@@ -86,7 +85,8 @@ class LRUCache:
         hit_rate = (self.hits / total * 100) if total > 0 else 0
         
         return {
-            'size': len(self.cache),
+            'backend': self.backend.name,
+            'size': len(self.backend),
             'maxsize': self.maxsize,
             'hits': self.hits,
             'misses': self.misses,
@@ -95,11 +95,148 @@ class LRUCache:
     
     def clear(self):
         """Vide le cache."""
+        self.backend.clear()
         with self.lock:
-            self.cache.clear()
             self.hits = 0
             self.misses = 0
 
+class NormalizedResponseCache:
+    """
+    Second niveau de cache, consulté après un MISS du cache exact.
+    
+    Clé = forme canonique du message (normalize_message : casse, ponctuation,
+    stopwords et espaces ignorés). En mode flou, les clés sont aussi indexées
+    localement par signature MinHash : un message dont la similarité de
+    Jaccard (tokens canoniques) avec une entrée dépasse le seuil réutilise sa
+    réponse. Le stockage passe par le même type de backend que le cache exact.
+    Les messages avec blocs de code ou symboles significatifs (c#, c++,
+    opérateurs) ne passent pas par ce niveau : cache exact seulement.
+    """
+    
+    def __init__(self, maxsize=1000, ttl=3600, fuzzy=False, fuzzy_threshold=0.8, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryCacheBackend(maxsize, ttl)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.lsh = MinHashLSH() if fuzzy else None
+        self.lsh_keys = OrderedDict()  # Clés indexées dans le LSH (bornées à maxsize)
+        self.lock = Lock()
+        self.normalized_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+    
+    @staticmethod
+    def _canonical(message: str) -> Optional[str]:
+        """Clé de ce niveau, None pour un message qui ne doit pas y passer."""
+        if '```' in message:
+            return None
+        canonical = normalize_message(message)
+        if not canonical or SYMBOL_PATTERN.search(canonical):
+            return None
+        return canonical
+    
+    def get(self, message: str):
+        """Récupère une réponse pour un message équivalent (ou proche) déjà traité."""
+        canonical = self._canonical(message)
+        if canonical is None:
+            with self.lock:
+                self.bypassed += 1
+            return None
+        
+        value = self.backend.get(canonical)
+        if value is not None:
+            with self.lock:
+                self.normalized_hits += 1
+            return value
+        
+        if self.lsh is not None:
+            value = self._get_fuzzy(canonical)
+            if value is not None:
+                with self.lock:
+                    self.fuzzy_hits += 1
+                return value
+        
+        with self.lock:
+            self.misses += 1
+        return None
+    
+    def _get_fuzzy(self, canonical: str):
+        """Entrée la plus proche au-dessus du seuil parmi les candidats LSH."""
+        tokens = frozenset(canonical.split())
+        ranked = []
+        for key in self.lsh.candidates(self.lsh.signature(tokens)):
+            other = frozenset(key.split())
+            score = len(tokens & other) / len(tokens | other)
+            if score >= self.fuzzy_threshold:
+                ranked.append((-score, key))
+        
+        for _, key in sorted(ranked):
+            value = self.backend.get(key)
+            if value is not None:
+                return value
+            # Entrée expirée ou évincée du backend
+            self._forget(key)
+        return None
+    
+    def set(self, message: str, value):
+        """Ajoute une réponse sous la forme canonique du message."""
+        canonical = self._canonical(message)
+        if canonical is None:
+            return
+        
+        self.backend.set(canonical, value)
+        
+        if self.lsh is not None:
+            self.lsh.add(canonical, self.lsh.signature(canonical.split()))
+            with self.lock:
+                self.lsh_keys[canonical] = True
+                self.lsh_keys.move_to_end(canonical)
+                evicted = []
+                while len(self.lsh_keys) > self.maxsize:
+                    evicted.append(self.lsh_keys.popitem(last=False)[0])
+            for key in evicted:
+                self.lsh.remove(key)
+    
+    def _forget(self, key: str):
+        self.lsh.remove(key)
+        with self.lock:
+            self.lsh_keys.pop(key, None)
+    
+    def stats(self):
+        """Statistiques du cache (taux de hit normalisé et flou séparés)."""
+        total = self.normalized_hits + self.fuzzy_hits + self.misses
+        
+        def rate(count):
+            return f'{(count / total * 100) if total > 0 else 0:.1f}%'
+        
+        return {
+            'backend': self.backend.name,
+            'size': len(self.backend),
+            'maxsize': self.maxsize,
+            'fuzzy_enabled': self.lsh is not None,
+            'fuzzy_threshold': self.fuzzy_threshold,
+            'normalized_hits': self.normalized_hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'normalized_hit_rate': rate(self.normalized_hits),
+            'fuzzy_hit_rate': rate(self.fuzzy_hits),
+            'hit_rate': rate(self.normalized_hits + self.fuzzy_hits)
+        }
+    
+    def clear(self):
+        """Vide le cache."""
+        self.backend.clear()
+        if self.lsh is not None:
+            self.lsh.clear()
+        with self.lock:
+            self.lsh_keys.clear()
+            self.normalized_hits = 0
+            self.fuzzy_hits = 0
+            self.misses = 0
+            self.bypassed = 0
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                        CIRCUIT BREAKER
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -117,6 +254,34 @@ class CircuitBreaker:
     
     def call(self, func, *args, **kwargs):
         """Exécute une fonction avec protection circuit breaker."""
+        self._before_call()
+        
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._record_failure()
+            raise
+        
+        self._record_success()
+        return result
+    
+    def stream(self, func, *args, **kwargs):
+        """
+        Comme call() pour une fonction génératrice : relaie ses éléments,
+        l'appel réussit quand le générateur est épuisé sans erreur.
+        """
+        self._before_call()
+        
+        try:
+            yield from func(*args, **kwargs)
+        except Exception:
+            self._record_failure()
+            raise
+        
+        self._record_success()
+    
+    def _before_call(self):
+        """Refuse l'appel si le circuit est ouvert (le referme à l'essai après timeout)."""
         with self.lock:
             # Vérifier si le circuit doit se refermer
             if self.state == 'OPEN':
@@ -125,29 +290,23 @@ class CircuitBreaker:
                     self.failures = 0
                 else:
                     raise Exception('Circuit breaker OPEN: système surchargé')
-        
-        try:
-            result = func(*args, **kwargs)
-            
-            # Succès: réinitialiser compteur
-            with self.lock:
-                if self.state == 'HALF_OPEN':
-                    self.state = 'CLOSED'
-                self.failures = 0
-            
-            return result
-        
-        except Exception as e:
-            # Échec: incrémenter compteur
-            with self.lock:
-                self.failures += 1
-                self.last_failure_time = time.time()
-                
-                if self.failures >= self.failure_threshold:
-                    self.state = 'OPEN'
-                    logger.error(f'Circuit breaker OPEN après {self.failures} échecs')
+    
+    def _record_success(self):
+        # Succès: réinitialiser compteur
+        with self.lock:
+            if self.state == 'HALF_OPEN':
+                self.state = 'CLOSED'
+            self.failures = 0
+    
+    def _record_failure(self):
+        # Échec: incrémenter compteur
+        with self.lock:
+            self.failures += 1
+            self.last_failure_time = time.time()
             
-            raise e
+            if self.failures >= self.failure_threshold:
+                self.state = 'OPEN'
+                logger.error(f'Circuit breaker OPEN après {self.failures} échecs')
     
     def status(self):
         """État actuel du circuit breaker."""
@@ -213,7 +372,12 @@ class PerformanceMetrics:
             self.rule_usage = {}
 
 # Instances globales
-_cache = LRUCache(maxsize=1000, ttl=3600)
+# Stockage selon Config.CACHE_TYPE (partagé entre workers pour 'mmap' / 'sqlite')
+_cache = LRUCache(maxsize=1000, ttl=3600, backend=create_cache_backend('responses', 1000, 3600))
+_normalized_cache = NormalizedResponseCache(
+    maxsize=1000, ttl=3600, fuzzy=CACHE_FUZZY, fuzzy_threshold=CACHE_FUZZY_THRESHOLD,
+    backend=create_cache_backend('responses_normalized', 1000, 3600)
+) if CACHE_NORMALIZED else None
 _circuit_breaker = CircuitBreaker(failure_threshold=10, timeout=60)
 _metrics = PerformanceMetrics()
 
@@ -259,174 +423,172 @@ class IAResponse:
         return {"status": self.status, "response": self.response, "meta": self.meta}
 
 class Rule:
-    def __init__(self, name: str, condition: Callable[[str, str], float], action: Callable[[str, str], str], lang: str = "any"):
+    def __init__(self, name: str, condition: Callable[[str, str], float], action: Callable[[str, str], str], lang: str = "any", uses_features: bool = False,
+                 max_score: float = 1.0, expected_cost: float = 0.0, priority: int = 0):
         self.name = name
         self.condition = condition  # Retourne un score de confiance (0.0 à 1.0)
         self.action = action
         self.lang = lang
+        self.uses_features = uses_features  # Reçoit MessageFeatures au lieu du texte brut
+        self.max_score = max_score  # Score maximal que la condition peut retourner
+        self.expected_cost = expected_cost  # Coût estimé de la condition (s), avant mesure
+        self.priority = priority  # Plus élevé = évaluée plus tôt
+
+    def args(self, message: str, features: MessageFeatures, lang: str) -> tuple:
+        """Arguments passés à la condition et à l'action."""
+        return (features if self.uses_features else message, lang)
 
 class NamzIAEngine:
     """Moteur IA maison, modulaire, multilingue, scoring, logs."""
+
+    # Patterns conversationnels de demande de code (précompilés)
+    CONVERSATIONAL_PATTERNS = [
+        re.compile(r'\b(comment|how)\s+(faire|to|créer|make|coder|code)\b'),
+        re.compile(r'\b(je|j\')\s+(veux|voudrais|aimerais|cherche)\b'),
+        re.compile(r'\b(peux|pourrais|pourrait)(-tu|s-tu|\stu)\b'),
+        re.compile(r'\b(besoin|need)\s+(de|d\'|of)\b'),
+        re.compile(r'\b(aide|help)(-moi|me)\b'),
+        re.compile(r'\b(montre|show)(-moi|me)\b'),
+    ]
+
+    # Sessions dont les suggestions en attente sont conservées (les plus récentes)
+    MAX_SUGGESTION_SESSIONS = 10000
+    # Réponses de l'assistant parcourues pour retrouver le code précédent
+    PREVIOUS_CODE_LOOKBACK = 20
+
     def __init__(self):
         self.rules: List[Rule] = []
         self.memory = get_conversation_memory()
         self.code_analyzer = get_code_analyzer()
         self.suggester = get_proactive_suggester()
         self.multi_file_gen = get_multi_file_generator()
-        self.previous_suggestions = []
+        # Suggestions proposées en attente de choix, par session (LRU borné)
+        self.previous_suggestions: 'OrderedDict[str, list]' = OrderedDict()
+        self.suggestions_lock = Lock()
+        self.rule_evaluator = RuleEvaluator()
         self._register_default_rules()
 
     def _register_default_rules(self):
+        # Les règles par défaut consomment MessageFeatures (une seule tokenisation par requête)
         # Génération de code intelligente (analyse + synthèse)
         self.add_rule(
             "intelligent_code_generation",
-            lambda msg, lang: self._detect_code_request(msg),
-            lambda msg, lang: self._generate_code_intelligently(msg),
+            lambda f, lang: self._detect_code_request(f),
+            lambda f, lang: self._generate_code_intelligently(f),
+            uses_features=True
         )
         # Aide au code via base de connaissances (tous langages)
         self.add_rule(
             "code_helper",
-            lambda msg, lang: 0.95 if any(
-                kw in msg.lower()
-                for kw in [
-                    "python", "javascript", "js", "flask", "fonction", "function", "variable", "class", "boucle", "loop", "erreur", "error", "bug",
-                    "c#", ".net", "asp.net", "linq", "razor", "c ", "pointeur", "pointer"
-                ]
-            ) else 0.0,
-            lambda msg, lang: self._answer_from_knowledge_base(msg, lang),
+            lambda f, lang: 0.95 if f.has_any(CODE_HELPER_KEYWORDS) else 0.0,
+            lambda f, lang: self._answer_from_knowledge_base(f.text, lang),
+            uses_features=True,
+            max_score=0.95
         )
         # Salutations multilingues
         self.add_rule(
             "salutation_fr",
-            lambda msg, lang: 1.0 if re.search(r"\b(bonjour|salut|coucou)\b", msg, re.IGNORECASE) and lang == "fr" else 0.0,
-            lambda msg, lang: "Bonjour ! Comment puis-je vous aider ?",
-            lang="fr"
+            lambda f, lang: 1.0 if f.has_word(GREETING_FR_WORDS) and lang == "fr" else 0.0,
+            lambda f, lang: "Bonjour ! Comment puis-je vous aider ?",
+            lang="fr",
+            uses_features=True
         )
         self.add_rule(
             "salutation_en",
-            lambda msg, lang: 1.0 if re.search(r"\b(hello|hi|hey)\b", msg, re.IGNORECASE) and lang == "en" else 0.0,
-            lambda msg, lang: "Hello! How can I help you?",
-            lang="en"
+            lambda f, lang: 1.0 if f.has_word(GREETING_EN_WORDS) and lang == "en" else 0.0,
+            lambda f, lang: "Hello! How can I help you?",
+            lang="en",
+            uses_features=True
         )
         # Demande d'aide
         self.add_rule(
             "demande_aide",
-            lambda msg, lang: 0.9 if re.search(r"aide|help", msg, re.IGNORECASE) else 0.0,
-            lambda msg, lang: "Voici comment je peux vous aider... (documentation, support, etc.)" if lang == "fr" else "Here is how I can help you... (documentation, support, etc.)"
+            lambda f, lang: 0.9 if f.has_any(HELP_KEYWORDS) else 0.0,
+            lambda f, lang: "Voici comment je peux vous aider... (documentation, support, etc.)" if lang == "fr" else "Here is how I can help you... (documentation, support, etc.)",
+            uses_features=True,
+            max_score=0.9
         )
         # Question
         self.add_rule(
             "question",
-            lambda msg, lang: 0.8 if msg.strip().endswith("?") else 0.0,
-            lambda msg, lang: "C'est une excellente question. Je vais y réfléchir." if lang == "fr" else "That's a great question. I'll think about it."
+            lambda f, lang: 0.8 if f.stripped.endswith("?") else 0.0,
+            lambda f, lang: "C'est une excellente question. Je vais y réfléchir." if lang == "fr" else "That's a great question. I'll think about it.",
+            uses_features=True,
+            max_score=0.8
         )
         # Motivation
         self.add_rule(
             "motivation",
-            lambda msg, lang: 0.7 if re.search(r"(courage|force|motivation|bravo|success)", msg, re.IGNORECASE) else 0.0,
-            lambda msg, lang: "Vous êtes capable de grandes choses !" if lang == "fr" else "You are capable of great things!"
+            lambda f, lang: 0.7 if f.has_any(MOTIVATION_KEYWORDS) else 0.0,
+            lambda f, lang: "Vous êtes capable de grandes choses !" if lang == "fr" else "You are capable of great things!",
+            uses_features=True,
+            max_score=0.7
         )
         # Remerciement
         self.add_rule(
             "remerciement",
-            lambda msg, lang: 0.7 if re.search(r"merci|thanks|thank you", msg, re.IGNORECASE) else 0.0,
-            lambda msg, lang: "Avec plaisir ! N'hésitez pas si besoin." if lang == "fr" else "You're welcome! Let me know if you need anything."
+            lambda f, lang: 0.7 if f.has_any(THANKS_KEYWORDS) else 0.0,
+            lambda f, lang: "Avec plaisir ! N'hésitez pas si besoin." if lang == "fr" else "You're welcome! Let me know if you need anything.",
+            uses_features=True,
+            max_score=0.7
         )
         # Fallback humoristique
         self.add_rule(
             "humour",
-            lambda msg, lang: 0.5 if re.search(r"(blague|joke|rigole)", msg, re.IGNORECASE) else 0.0,
-            lambda msg, lang: "Pourquoi les programmeurs confondent Halloween et Noël ? Parce que OCT 31 == DEC 25 !"
+            lambda f, lang: 0.5 if f.has_any(HUMOUR_KEYWORDS) else 0.0,
+            lambda f, lang: "Pourquoi les programmeurs confondent Halloween et Noël ? Parce que OCT 31 == DEC 25 !",
+            uses_features=True,
+            max_score=0.5
         )
 
     def _answer_from_knowledge_base(self, message: str, lang: str) -> str:
         """Cherche la meilleure réponse de code dans la base de connaissances."""
-        best_score = 0.0
-        best_answer = "Je n'ai pas encore de connaissance précise sur cette question de code."
-        for item in KNOWLEDGE_BASE:
-            for pattern in item.get("patterns", []):
-                score = _similarity(message, pattern)
-                if score > best_score:
-                    best_score = score
-                    best_answer = item["answer"]
+        best_score, best_position = get_knowledge_index().best(message)
+        best_answer = KNOWLEDGE_BASE[best_position]["answer"] if best_position is not None else None
         # On ajoute une petite intro contextuelle
         if best_score > 0.0:
             prefix = "Voici un exemple de code :\n\n" if "fr" in lang else "Here is a code example:\n\n"
             return prefix + best_answer
         return "Je ne trouve pas encore d'exemple exact, mais essaie de préciser ta question (langage, erreur, contexte)."
 
-    def _detect_code_request(self, message: str) -> float:
+    def _detect_code_request(self, message) -> float:
         """Détecte si c'est une demande de génération de code ou d'amélioration."""
-        code_keywords = [
-            # Actions de création
-            'crée', 'créer', 'create', 'fait', 'fais', 'faire', 'make', 'écris', 'écrire', 'write',
-            'génère', 'générer', 'generate', 'développe', 'développer', 'develop', 'build', 'construis',
-            'code', 'programme', 'program', 'script', 'app', 'application', 'site', 'page',
-            
-            # Types de code
-            'fonction', 'function', 'classe', 'class', 'méthode', 'method', 'api', 'interface',
-            'algorithme', 'algorithm', 'structure', 'module', 'composant', 'component',
-            
-            # Actions d'amélioration
-            'optimise', 'optimiser', 'optimize', 'améliore', 'améliorer', 'improve', 'refactor',
-            'refactoriser', 'corriger', 'fix', 'debug', 'débugger', 'réparer', 'repair',
-            
-            # Langage conversationnel
-            'peux-tu', 'peux tu', 'pourrais-tu', 'pourrais tu', 'voudrais', 'aimerais',
-            'besoin de', 'besoin d', 'il me faut', 'je veux', 'je voudrais', 'j\'ai besoin',
-            'help me', 'aide-moi', 'montre-moi', 'show me', 'comment faire',
-            
-            # Contextes techniques
-            'html', 'css', 'javascript', 'python', 'java', 'php', 'ruby', 'go', 'rust',
-            'backend', 'frontend', 'fullstack', 'web', 'mobile', 'desktop',
-            'base de données', 'database', 'sql', 'api rest', 'graphql'
-        ]
+        features = MessageFeatures.of(message)
         
-        msg_lower = message.lower()
-        
-        # Détection par mots-clés
-        for kw in code_keywords:
-            if kw in msg_lower:
-                return 1.0
+        # Détection par mots-clés (hits calculés une fois dans MessageFeatures)
+        if features.has_any(CODE_REQUEST_KEYWORDS):
+            return 1.0
         
         # Détection de patterns conversationnels
-        conversational_patterns = [
-            r'\b(comment|how)\s+(faire|to|créer|make|coder|code)\b',
-            r'\b(je|j\')\s+(veux|voudrais|aimerais|cherche)\b',
-            r'\b(peux|pourrais|pourrait)(-tu|s-tu|\stu)\b',
-            r'\b(besoin|need)\s+(de|d\'|of)\b',
-            r'\b(aide|help)(-moi|me)\b',
-            r'\b(montre|show)(-moi|me)\b',
-        ]
-        
-        for pattern in conversational_patterns:
-            if re.search(pattern, msg_lower):
+        for pattern in self.CONVERSATIONAL_PATTERNS:
+            if pattern.search(features.lower):
                 return 1.0
         
         return 0.0
     
-    def _generate_code_intelligently(self, message: str) -> str:
+    def _generate_code_intelligently(self, message) -> str:
         """Génère du code en analysant la demande et en synthétisant depuis les templates existants."""
-        msg_lower = message.lower()
+        features = MessageFeatures.of(message)
+        message = features.text
         
-        # Analyse contextuelle avancée
-        context = self._analyze_context(message)
+        # Analyse contextuelle avancée (mise en cache dans les features)
+        context = self._analyze_context(features)
         
         # 1. Détecte le langage de manière plus intelligente
         lang = context.get('language')
         if not lang:
-            lang = self._detect_language_from_message(msg_lower)
+            lang = self._detect_language_from_message(features)
         
         # 2. Détecte le type de code demandé et l'intention
         code_type = context.get('code_type')
         intent = context.get('intent', 'create')
         
         if not code_type:
-            code_type, intent = self._detect_code_type_and_intent(msg_lower)
+            code_type, intent = self._detect_code_type_and_intent(features)
         
         # 3. Si l'intention est "improve_previous", récupérer le contexte précédent
         if intent == 'improve_previous':
-            previous_code = self._get_previous_generated_code(context.get('domain'))
+            previous_code = self._get_previous_generated_code(context.get('domain'), features.session_id)
             if previous_code:
                 return self._enhance_existing_code(previous_code, message, context)
             else:
@@ -453,11 +615,14 @@ class NamzIAEngine:
         # 7. Sinon, génère du code from scratch avec intention
         return self._synthesize_code_from_scratch(message, lang, code_type, name, intent)
     
-    def _get_previous_generated_code(self, domain: str = None) -> str:
-        """Récupère le code généré dans la conversation précédente."""
+    def _get_previous_generated_code(self, domain: str = None, session_id: str = None) -> str:
+        """Récupère le code généré dans la conversation précédente (session du client)."""
         try:
-            # Récupérer l'historique de conversation
-            history = self.memory.get_context().get('messages', [])
+            # Récupérer les dernières réponses de l'assistant dans cette session
+            history = self.memory.get_recent_messages(
+                limit=self.PREVIOUS_CODE_LOOKBACK, session_id=session_id,
+                role_filter='assistant', include_metadata=False
+            )
             
             # Chercher le dernier message de l'assistant contenant du code
             for msg in reversed(history):
@@ -564,110 +729,42 @@ Je peux créer une version améliorée. Que souhaitez-vous exactement ?
 Précisez votre besoin pour un résultat optimal !
 """
     
-    def _detect_language_from_message(self, msg_lower: str) -> str:
+    def _detect_language_from_message(self, message) -> str:
         """Détecte le langage depuis le message avec intelligence contextuelle."""
-        # Détection explicite
-        if any(w in msg_lower for w in ['python', 'py']):
-            return 'python'
-        elif any(w in msg_lower for w in ['typescript', 'ts']):
-            return 'typescript'
-        elif any(w in msg_lower for w in ['javascript', 'js', 'node']):
-            return 'javascript'
-        elif any(w in msg_lower for w in ['c#', 'csharp', 'dotnet', '.net']):
-            return 'csharp'
-        elif ' c ' in msg_lower or msg_lower.startswith('c ') or msg_lower.endswith(' c'):
-            return 'c'
-        elif any(w in msg_lower for w in ['java ', 'java']):
-            return 'java'
-        elif any(w in msg_lower for w in ['php']):
-            return 'php'
-        elif any(w in msg_lower for w in ['ruby', 'rb']):
-            return 'ruby'
-        elif any(w in msg_lower for w in ['go', 'golang']):
-            return 'go'
-        elif any(w in msg_lower for w in ['rust', 'rs']):
-            return 'rust'
-        elif any(w in msg_lower for w in ['swift']):
-            return 'swift'
-        elif any(w in msg_lower for w in ['kotlin', 'kt']):
-            return 'kotlin'
-        elif any(w in msg_lower for w in ['sql', 'database', 'base de données']):
-            return 'sql'
-        elif any(w in msg_lower for w in ['bash', 'shell', 'script shell']):
-            return 'bash'
-        
-        # Détection par contexte (site web = HTML)
-        elif any(w in msg_lower for w in ['site', 'page web', 'html', 'website']):
-            return 'html'
-        elif any(w in msg_lower for w in ['style', 'css', 'design']):
-            return 'css'
-        
-        # Détection par contexte projet
-        elif any(w in msg_lower for w in ['api rest', 'serveur', 'backend']):
-            return 'python'  # Par défaut Python pour backend
-        elif any(w in msg_lower for w in ['app mobile', 'android']):
-            return 'kotlin'
-        elif any(w in msg_lower for w in ['ios', 'iphone', 'ipad']):
-            return 'swift'
-        elif any(w in msg_lower for w in ['web app', 'frontend', 'spa']):
-            return 'javascript'
+        features = MessageFeatures.of(message)
+        hits, msg_lower = features.hits, features.lower
+        
+        # Tables ordonnées par priorité : détection explicite, puis par contexte
+        for category, language, _ in LANGUAGE_HINTS:
+            if category in hits.categories:
+                return language
+            if category == 'language:c' and (msg_lower.startswith('c ') or msg_lower.endswith(' c')):
+                return 'c'
         
         # Si aucun langage détecté, retourner None
         return None
     
-    def _detect_code_type_and_intent(self, msg_lower: str) -> tuple:
+    def _detect_code_type_and_intent(self, message) -> tuple:
         """Détecte le type de code et l'intention depuis le message."""
-        intent = 'create'
-        code_type = None
+        hits = MessageFeatures.of(message).hits
         
         # Détection d'intention avec référence au contexte précédent
-        if any(w in msg_lower for w in ['améliore', 'améliorer', 'improve', 'enhance', 'mieux', 'better']):
-            # Vérifier si on fait référence à quelque chose de précédent
-            if any(w in msg_lower for w in ['notre', 'le', 'ce', 'this', 'that', 'précédent', 'previous']):
-                intent = 'improve_previous'  # Améliorer quelque chose déjà généré
-            else:
-                intent = 'improve'
-        elif any(w in msg_lower for w in ['optimise', 'optimiser', 'optimize', 'performance', 'plus rapide', 'faster']):
-            intent = 'optimize'
-        elif any(w in msg_lower for w in ['refactor', 'refactoriser', 'restructure', 'nettoie', 'clean']):
-            intent = 'refactor'
-        elif any(w in msg_lower for w in ['debug', 'débugger', 'corriger', 'fix', 'réparer', 'repair', 'bug', 'erreur', 'error']):
-            intent = 'debug'
-        elif any(w in msg_lower for w in ['explique', 'expliquer', 'explain', 'comment', 'how', 'pourquoi', 'why']):
-            intent = 'explain'
+        intent = first_hint(hits, INTENT_HINTS) or 'create'
+        if intent == 'improve' and hits.any('intent:previous_reference'):
+            intent = 'improve_previous'  # Améliorer quelque chose déjà généré
         
         # Détection de type
-        if any(w in msg_lower for w in ['fonction', 'function', 'méthode', 'method', 'def ', 'fn ']):
-            code_type = 'function'
-        elif any(w in msg_lower for w in ['classe', 'class', 'objet', 'object']):
-            code_type = 'class'
-        elif any(w in msg_lower for w in ['boucle', 'loop', 'itérer', 'iterate', 'for', 'while']):
-            code_type = 'loop'
-        elif any(w in msg_lower for w in ['trier', 'sort', 'tri', 'sorting']):
-            code_type = 'sort'
-        elif any(w in msg_lower for w in ['lire', 'read', 'ouvrir', 'open', 'fichier']):
-            code_type = 'read_file'
-        elif any(w in msg_lower for w in ['écrire', 'write', 'sauver', 'save', 'enregistrer']):
-            code_type = 'write_file'
-        elif any(w in msg_lower for w in ['calculatrice', 'calculator', 'calcul', 'calculate']):
-            code_type = 'calculator'
-        elif any(w in msg_lower for w in ['api', 'requete', 'request', 'fetch', 'http', 'rest']):
-            code_type = 'api'
-        elif any(w in msg_lower for w in ['select', 'insert', 'update', 'delete', 'requête sql', 'query']):
-            code_type = 'sql_query'
-        elif any(w in msg_lower for w in ['test', 'unittest', 'tests', 'testing']):
-            code_type = 'test'
-        elif any(w in msg_lower for w in ['interface', 'ui', 'gui', 'formulaire', 'form']):
-            code_type = 'interface'
-        elif any(w in msg_lower for w in ['site', 'page', 'website', 'web']):
-            code_type = 'website'
-        elif any(w in msg_lower for w in ['app', 'application', 'programme', 'program']):
-            code_type = 'application'
+        code_type = first_hint(hits, CODE_TYPE_HINTS)
         
         return code_type, intent
     
-    def _analyze_context(self, message: str) -> dict:
-        """Analyse approfondie du contexte de la demande."""
+    def _analyze_context(self, message) -> dict:
+        """Analyse approfondie du contexte de la demande (calculée une fois par requête)."""
+        features = MessageFeatures.of(message)
+        if features.context is not None:
+            return features.context
+        message = features.text
+        
         context = {
             'language': None,
             'code_type': None,
@@ -678,48 +775,27 @@ Précisez votre besoin pour un résultat optimal !
             'domain': None  # Nouveau: domaine spécifique (e-commerce, blog, etc.)
         }
         
-        msg_lower = message.lower()
+        hits = features.hits
         
         # Détection du domaine/contexte spécifique
-        if any(w in msg_lower for w in ['dropshipping', 'e-commerce', 'ecommerce', 'boutique', 'shop', 'magasin', 'vente']):
-            context['domain'] = 'ecommerce'
-        elif any(w in msg_lower for w in ['blog', 'article', 'news', 'magazine', 'publication']):
-            context['domain'] = 'blog'
-        elif any(w in msg_lower for w in ['portfolio', 'cv', 'resume', 'professionnel']):
-            context['domain'] = 'portfolio'
-        elif any(w in msg_lower for w in ['landing', 'page de vente', 'conversion']):
-            context['domain'] = 'landing'
-        elif any(w in msg_lower for w in ['dashboard', 'admin', 'panneau', 'gestion']):
-            context['domain'] = 'dashboard'
-        elif any(w in msg_lower for w in ['social', 'réseau social', 'communauté']):
-            context['domain'] = 'social'
-        elif any(w in msg_lower for w in ['restaurant', 'menu', 'réservation']):
-            context['domain'] = 'restaurant'
-        elif any(w in msg_lower for w in ['immobilier', 'real estate', 'propriété']):
-            context['domain'] = 'realestate'
-        elif any(w in msg_lower for w in ['éducation', 'cours', 'formation', 'learning']):
-            context['domain'] = 'education'
-        elif any(w in msg_lower for w in ['fitness', 'sport', 'gym', 'santé']):
-            context['domain'] = 'fitness'
+        context['domain'] = first_hint(hits, DOMAIN_HINTS)
         
         # Analyse de complexité
-        if any(w in msg_lower for w in ['avancé', 'advanced', 'complexe', 'complex', 'complet', 'complete']):
-            context['complexity'] = 'advanced'
-        elif any(w in msg_lower for w in ['professionnel', 'professional', 'production', 'robuste', 'robust']):
-            context['complexity'] = 'production'
+        context['complexity'] = first_hint(hits, COMPLEXITY_HINTS) or 'simple'
         
         # Extraction des exigences
-        if 'avec' in msg_lower or 'with' in msg_lower:
+        if hits.any('context:requirements'):
             requirements_match = re.search(r'(?:avec|with)\s+([^\.]+)', message, re.IGNORECASE)
             if requirements_match:
                 context['requirements'] = [req.strip() for req in requirements_match.group(1).split(',')]
         
         # Détection de contraintes
-        if any(w in msg_lower for w in ['sans', 'without']):
+        if hits.any('context:constraints'):
             constraints_match = re.search(r'(?:sans|without)\s+([^\.]+)', message, re.IGNORECASE)
             if constraints_match:
                 context['constraints'] = [const.strip() for const in constraints_match.group(1).split(',')]
         
+        features.context = context
         return context
     
     def _fill_template_intelligently(self, template: str, message: str, lang: str, code_type: str, name: str) -> str:
@@ -2935,26 +3011,16 @@ if __name__ == "__main__":
 
     def _code_template_score(self, message: str) -> float:
         """Score si la demande correspond à un template de génération de code."""
-        for key, tpl in CODE_TEMPLATES.items():
-            for pattern in tpl["patterns"]:
-                if _similarity(message, pattern) > 0.7:
-                    return 1.0
+        if get_template_index().search(message, threshold=0.7, top_k=1):
+            return 1.0
         return 0.0
 
     def _generate_code_from_template(self, message: str) -> str:
         """Génère du code à partir d'un template si possible, en utilisant l'analyse intelligente pour remplir les paramètres."""
-        best_template = None
-        best_score = 0.0
-        best_key = ""
-        
-        # Trouve le meilleur template
-        for key, tpl in CODE_TEMPLATES.items():
-            for pattern in tpl["patterns"]:
-                score = _similarity(message, pattern)
-                if score > best_score:
-                    best_score = score
-                    best_template = tpl
-                    best_key = key
+        # Trouve le meilleur template via l'index inversé (pas de scan complet)
+        best_score, best_key = get_template_index().best(message)
+        best_template = CODE_TEMPLATES.get(best_key) if best_key else None
+        best_key = best_key or ""
         
         if not best_template or best_score < 0.3:
             return "Je n'ai pas de template pour cette demande. Précise le langage et le type de code souhaité, ou essaie : 'fonction python', 'calculatrice c', 'classe c#', etc."
@@ -3082,45 +3148,179 @@ if __name__ == "__main__":
             lambda msg, lang: "Pourquoi les programmeurs confondent Halloween et Noël ? Parce que OCT 31 == DEC 25 !"
         )
 
-    def add_rule(self, name: str, condition: Callable[[str, str], float], action: Callable[[str, str], str], lang: str = "any"):
-        self.rules.append(Rule(name, condition, action, lang))
+    def add_rule(self, name: str, condition: Callable[[str, str], float], action: Callable[[str, str], str], lang: str = "any", uses_features: bool = False,
+                 max_score: float = 1.0, expected_cost: float = 0.0, priority: int = 0):
+        self.rules.append(Rule(name, condition, action, lang, uses_features, max_score, expected_cost, priority))
 
-    def detect_language(self, message: str) -> str:
-        # Détection très légère, extensible (fr/en)
-        if re.search(r"\b(bonjour|salut|aide|merci|pourquoi|comment)\b", message, re.IGNORECASE):
-            return "fr"
-        if re.search(r"\b(hello|hi|help|thanks|why|how)\b", message, re.IGNORECASE):
-            return "en"
-        # Par défaut français
-        return "fr"
+    # ═══════════════════════════════════════════════════════════════════════════
+    # SESSIONS
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    def _session(self, session_id: Optional[str]) -> str:
+        """Session de conversation effective (session par défaut de la mémoire sinon)."""
+        return session_id or self.memory.default_session_id
+    
+    def _pending_suggestions(self, session_id: str) -> list:
+        """Suggestions proposées dans cette session et pas encore choisies."""
+        with self.suggestions_lock:
+            return self.previous_suggestions.get(session_id, [])
+    
+    def _set_pending_suggestions(self, session_id: str, suggestions: list):
+        """Mémorise (ou oublie, si vide) les suggestions en attente d'une session."""
+        with self.suggestions_lock:
+            if not suggestions:
+                self.previous_suggestions.pop(session_id, None)
+                return
+            self.previous_suggestions[session_id] = suggestions
+            self.previous_suggestions.move_to_end(session_id)
+            while len(self.previous_suggestions) > self.MAX_SUGGESTION_SESSIONS:
+                self.previous_suggestions.popitem(last=False)
+    
+    def history_scope(self, message: str, session_id: Optional[str] = None) -> Optional[str]:
+        """
+        Session dont dépend la réponse à ce message, None si elle n'en dépend pas.
+        
+        La réponse dépend de l'historique quand la session a des suggestions en
+        attente (le message peut en choisir une) ou quand le message demande
+        d'améliorer le code généré précédemment.
+        """
+        session_id = self._session(session_id)
+        if self._pending_suggestions(session_id):
+            return session_id
+        features = MessageFeatures.of(message)
+        if not features.code_blocks and self._detect_code_type_and_intent(features)[1] == 'improve_previous':
+            return session_id
+        return None
 
-    def analyse(self, message: str) -> IAResponse:
+    def detect_language(self, message) -> str:
+        # Détection très légère, extensible (fr/en), par défaut français
+        return MessageFeatures.of(message).lang
+
+    def _project_events(self, message: str, session_id: str):
+        """
+        Réponse multi-fichiers produite morceau par morceau.
+        
+        Produit ('header', ...), un ('file', ...) par fichier, ('suggestions', ...)
+        puis ('done', {'meta': ...}) ; chaque morceau porte son texte markdown
+        (leur concaténation est la réponse complète). Rien n'est produit si le
+        projet ne peut pas être généré.
+        """
+        project_type = self.multi_file_gen.detect_project_type(message)
+        chunks = []
+        files_count = 0
+        
+        for event, data in self.multi_file_gen.iter_project(project_type):
+            if event == 'error':
+                return
+            
+            if event == 'header':
+                markdown = f"## 📁 {data['name']}\n\n"
+                markdown += f"{data['description']}\n\n"
+                markdown += "### 📂 Structure du projet\n\n"
+                for filepath in data['files']:
+                    markdown += f"- `{filepath}`\n"
+                markdown += f"\n### 📄 Fichiers générés\n\n"
+                yield 'header', {**data, 'markdown': markdown}
+            
+            elif event == 'file':
+                files_count += 1
+                markdown = f"**{data['path']}**\n```\n{data['content'][:500]}...\n```\n\n"
+                yield 'file', {'path': data['path'], 'markdown': markdown}
+            
+            else:
+                markdown = f"\n{data['instructions']}"
+                yield 'suggestions', {'instructions': data['instructions'], 'markdown': markdown}
+            
+            chunks.append(markdown)
+        
+        self.memory.add_message('assistant', ''.join(chunks), {
+            'code_type': 'multi_file_project',
+            'project_type': project_type,
+            'files_count': files_count
+        }, session_id=session_id)
+        
+        yield 'done', {'meta': {
+            "rule": "multi_file_generation",
+            "project_type": project_type,
+            "files_count": files_count,
+            "timestamp": datetime.datetime.utcnow().isoformat()
+        }}
+    
+    def wants_project(self, message: str, session_id: Optional[str] = None) -> bool:
+        """Vrai si analyse() répondrait par un projet multi-fichiers."""
+        features = MessageFeatures.from_message(message)
+        if not features.has_any(MULTI_FILE_KEYWORDS) or features.code_blocks:
+            return False
+        pending = self._pending_suggestions(self._session(session_id))
+        if pending and self.suggester.detect_user_choice(message, pending):
+            return False
+        return self.multi_file_gen.detect_project_type(message) in self.multi_file_gen.project_templates
+    
+    def analyse_stream(self, message: str, session_id: Optional[str] = None):
+        """
+        Comme analyse(), en mode streaming pour les demandes de projet :
+        en-tête, puis chaque fichier, puis les suggestions, dès qu'ils sont prêts.
+        Les autres messages produisent un unique événement 'response'.
+        """
+        session_id = self._session(session_id)
+        if not self.wants_project(message, session_id):
+            yield 'response', self.analyse(message, session_id).to_dict()
+            return
+        
+        features = MessageFeatures.from_message(message, session_id)
+        self._remember_user_message(message, features)
+        yield from self._project_events(message, session_id)
+    
+    def _remember_user_message(self, message: str, features: MessageFeatures):
+        """Ajoute le message utilisateur à la mémoire de sa session (avec l'analyse d'intention)."""
+        intent_analysis = self.memory.analyze_user_intent(message, features.session_id)
+        metadata = {
+            'language': features.lang,
+            'is_followup': intent_analysis.get('is_followup'),
+            'refers_to_previous': intent_analysis.get('refers_to_previous')
+        }
+        self.memory.add_message('user', message, metadata, session_id=features.session_id)
+    
+    def remember_exchange(self, message: str, result: IAResponse, session_id: Optional[str] = None):
+        """
+        Enregistre dans la session un échange répondu par un autre moteur (V2) :
+        l'historique (code précédent, suivi de conversation) reste celui que
+        V1 lit et écrit.
+        """
+        session_id = self._session(session_id)
+        features = MessageFeatures.from_message(message, session_id)
+        self._remember_user_message(message, features)
+        self.memory.add_message('assistant', result.response, {
+            'language': features.lang,
+            'intent': result.meta.get('intent'),
+            'rule': result.meta.get('rule')
+        }, session_id=session_id)
+    
+    def analyse(self, message: str, session_id: Optional[str] = None) -> IAResponse:
         """
         Analyse enrichie avec mémoire, analyse de code, suggestions proactives et multi-fichiers.
+        
+        L'historique lu et écrit est celui de `session_id` (session par défaut
+        de la mémoire sinon).
         """
         logging.info(f"Analyse du message: {message}")
         if not message or not message.strip():
             return IAResponse("error", "Message vide.", meta={"timestamp": datetime.datetime.utcnow().isoformat()})
         
-        lang = self.detect_language(message)
-        msg_lower = message.lower()
+        # Une seule analyse du message, partagée par toutes les règles
+        session_id = self._session(session_id)
+        features = MessageFeatures.from_message(message, session_id)
+        lang = features.lang
         
         # === NOUVELLE FONCTIONNALITÉ 1: Mémoire de conversation ===
-        # Analyser l'intention avec le contexte des messages précédents
-        intent_analysis = self.memory.analyze_user_intent(message)
-        context = self.memory.get_context()
-        
-        # Ajouter le message utilisateur à la mémoire
-        metadata = {
-            'language': lang,
-            'is_followup': intent_analysis.get('is_followup'),
-            'refers_to_previous': intent_analysis.get('refers_to_previous')
-        }
-        self.memory.add_message('user', message, metadata)
+        # Analyser l'intention avec le contexte des messages précédents,
+        # puis ajouter le message utilisateur à la mémoire
+        context = self.memory.get_context(session_id)
+        self._remember_user_message(message, features)
         
         # === NOUVELLE FONCTIONNALITÉ 2: Analyse de code existant ===
         # Détecter si l'utilisateur montre du code à analyser/améliorer
-        code_blocks = re.findall(r'```[\s\S]*?```', message)
+        code_blocks = features.code_blocks
         if code_blocks:
             # Extraire le code
             code = code_blocks[0].replace('```', '').strip()
@@ -3150,7 +3350,7 @@ if __name__ == "__main__":
                 'language': analysis['language'],
                 'code_type': 'analysis',
                 'issues_count': len(analysis.get('issues', []))
-            })
+            }, session_id=session_id)
             
             return IAResponse("ok", response, meta={
                 "rule": "code_analysis",
@@ -3161,16 +3361,18 @@ if __name__ == "__main__":
         
         # === NOUVELLE FONCTIONNALITÉ 3: Réponse aux suggestions précédentes ===
         # Si l'utilisateur répond à une suggestion
-        if self.previous_suggestions:
-            chosen_suggestion = self.suggester.detect_user_choice(message, self.previous_suggestions)
+        pending = self._pending_suggestions(session_id)
+        if pending:
+            chosen_suggestion = self.suggester.detect_user_choice(message, pending)
             if chosen_suggestion:
                 # Générer le code pour la suggestion choisie
                 response = f"## ✅ {chosen_suggestion['title']}\n\n"
                 response += f"{chosen_suggestion['description']}\n\n"
                 response += f"```\n{chosen_suggestion['code_example']}\n```"
                 
-                self.memory.add_message('assistant', response, {'suggestion_chosen': chosen_suggestion['title']})
-                self.previous_suggestions = []  # Reset
+                self.memory.add_message('assistant', response, {'suggestion_chosen': chosen_suggestion['title']},
+                                        session_id=session_id)
+                self._set_pending_suggestions(session_id, [])  # Reset
                 
                 return IAResponse("ok", response, meta={
                     "rule": "suggestion_response",
@@ -3180,49 +3382,18 @@ if __name__ == "__main__":
         
         # === NOUVELLE FONCTIONNALITÉ 4: Génération multi-fichiers ===
         # Détecter si c'est une demande de projet complet
-        multi_file_keywords = [
-            'projet complet', 'complete project', 'architecture', 'structure complète',
-            'api complète', 'full stack', 'avec tous les fichiers', 'microservices'
-        ]
-        
-        if any(keyword in msg_lower for keyword in multi_file_keywords):
-            project_type = self.multi_file_gen.detect_project_type(message)
-            project = self.multi_file_gen.generate_project(project_type)
-            
-            if 'error' not in project:
-                # Construire la réponse avec tous les fichiers
-                response = f"## 📁 {project['name']}\n\n"
-                response += f"{project['description']}\n\n"
-                response += "### 📂 Structure du projet\n\n"
-                
-                for filepath in project['files'].keys():
-                    response += f"- `{filepath}`\n"
-                
-                response += f"\n### 📄 Fichiers générés\n\n"
-                
-                for filepath, content in project['files'].items():
-                    response += f"**{filepath}**\n```\n{content[:500]}...\n```\n\n"
-                
-                response += f"\n{project['instructions']}"
-                
-                self.memory.add_message('assistant', response, {
-                    'code_type': 'multi_file_project',
-                    'project_type': project_type,
-                    'files_count': len(project['files'])
-                })
-                
-                return IAResponse("ok", response, meta={
-                    "rule": "multi_file_generation",
-                    "project_type": project_type,
-                    "files_count": len(project['files']),
-                    "timestamp": datetime.datetime.utcnow().isoformat()
-                })
+        if features.has_any(MULTI_FILE_KEYWORDS):
+            chunks = []
+            for event, data in self._project_events(message, session_id):
+                if event == 'done':
+                    return IAResponse("ok", ''.join(chunks), meta=data['meta'])
+                chunks.append(data['markdown'])
         
         # === LOGIQUE CLASSIQUE ===
         # 1. Cherche d'abord dans la mémoire utilisateur
         user_code = find_best_user_example(message)
         if user_code:
-            self.memory.add_message('assistant', user_code, {'source': 'user_example'})
+            self.memory.add_message('assistant', user_code, {'source': 'user_example'}, session_id=session_id)
             return IAResponse("ok", user_code, meta={
                 "rule": "user_example",
                 "score": 1.0,
@@ -3230,29 +3401,27 @@ if __name__ == "__main__":
                 "timestamp": datetime.datetime.utcnow().isoformat()
             })
         
-        # 2. Applique les règles classiques
-        best_score = 0.0
-        best_rule = None
-        for rule in self.rules:
-            if rule.lang == "any" or rule.lang == lang:
-                score = rule.condition(message, lang)
-                if score > best_score:
-                    best_score = score
-                    best_rule = rule
+        # 2. Applique les règles classiques (arrêt dès qu'aucune règle restante ne peut gagner)
+        eligible = [(position, rule) for position, rule in enumerate(self.rules)
+                    if rule.lang == "any" or rule.lang == lang]
+        _, best = self.rule_evaluator.evaluate(
+            eligible, lambda rule: rule.condition(*rule.args(message, features, lang))
+        )
+        best_rule, best_score = (best[1], best[2]) if best else (None, 0.0)
         
         if best_rule and best_score > 0.0:
-            response = best_rule.action(message, lang)
+            response = best_rule.action(*best_rule.args(message, features, lang))
             
-            # Analyser le contexte pour les suggestions
-            analysis_context = self._analyze_context(message)
+            # Analyser le contexte pour les suggestions (réutilise l'analyse de l'action)
+            analysis_context = dict(self._analyze_context(features))
             analysis_context['message'] = message
             
             # === NOUVELLE FONCTIONNALITÉ 3 (suite): Suggestions proactives ===
             # Générer des suggestions après avoir fourni le code
-            suggestions = self.suggester.generate_suggestions(analysis_context)
+            suggestions = self.suggester.generate_suggestions(analysis_context, hits=features.hits)
             if suggestions:
                 response += self.suggester.format_suggestions_message(suggestions)
-                self.previous_suggestions = suggestions
+                self._set_pending_suggestions(session_id, suggestions)
             
             # Sauvegarder la réponse dans la mémoire
             response_metadata = {
@@ -3261,7 +3430,7 @@ if __name__ == "__main__":
                 'domain': analysis_context.get('domain'),
                 'intent': analysis_context.get('intent')
             }
-            self.memory.add_message('assistant', response, response_metadata)
+            self.memory.add_message('assistant', response, response_metadata, session_id=session_id)
             
             return IAResponse("ok", response, meta={
                 "rule": best_rule.name,
@@ -3273,7 +3442,7 @@ if __name__ == "__main__":
         
         # Fallback avec sauvegarde mémoire
         fallback_response = "Message reçu. Comment puis-je vous aider ?"
-        self.memory.add_message('assistant', fallback_response, {})
+        self.memory.add_message('assistant', fallback_response, {}, session_id=session_id)
         
         return IAResponse("ok", fallback_response, meta={
             "rule": "default",
@@ -3285,7 +3454,77 @@ if __name__ == "__main__":
 # Instance globale du moteur IA
 engine = NamzIAEngine()
 
-def analyse_texte(message: str) -> dict:
+# ═══════════════════════════════════════════════════════════════════════════════
+#                         RÉPONSES PRÉ-ENCODÉES (CACHE + HTTP)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Champs de meta propres à chaque requête : exclus du corps mis en cache
+# (renvoyés à part, en en-têtes HTTP côté route)
+VOLATILE_META_FIELDS = ('response_time', 'from_cache', 'timestamp')
+
+# Entrée de cache : horodatage de génération + ETag (32 hex) + corps JSON
+_ENTRY_HEADER = struct.Struct('<d32s')
+
+
+class EncodedResponse:
+    """
+    Réponse d'analyse_texte sous forme de corps JSON immuable (bytes).
+    
+    Le corps est encodé une seule fois, à la génération ; les hits du cache
+    le renvoient tel quel (aucun re-encodage, aucun dict partagé muté).
+    L'ETag fort est le hash du corps, calculé une seule fois lui aussi.
+    """
+    
+    __slots__ = ('body', 'etag', 'timestamp', 'from_cache', 'response_time')
+    
+    def __init__(self, body: bytes, etag: str, timestamp: float,
+                 from_cache: bool = False, response_time: float = 0.0):
+        self.body = body
+        self.etag = etag
+        self.timestamp = timestamp
+        self.from_cache = from_cache
+        self.response_time = response_time
+    
+    @classmethod
+    def encode(cls, response: dict, timestamp: float, response_time: float = 0.0) -> 'EncodedResponse':
+        """Encode une réponse (dict) en retirant les champs volatils de meta."""
+        meta = {k: v for k, v in response.get('meta', {}).items() if k not in VOLATILE_META_FIELDS}
+        body = json.dumps({**response, 'meta': meta}, ensure_ascii=False,
+                          separators=(',', ':'), default=str).encode('utf-8')
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        return cls(body, etag, timestamp, response_time=response_time)
+    
+    @classmethod
+    def from_entry(cls, entry: bytes, response_time: float) -> 'EncodedResponse':
+        """Reconstruit une réponse depuis une entrée de cache."""
+        timestamp, etag = _ENTRY_HEADER.unpack_from(entry)
+        return cls(entry[_ENTRY_HEADER.size:], etag.decode('ascii'), timestamp,
+                   from_cache=True, response_time=response_time)
+    
+    def to_entry(self) -> bytes:
+        """Entrée de cache (bytes immuables, partageables entre workers)."""
+        return _ENTRY_HEADER.pack(self.timestamp, self.etag.encode('ascii')) + self.body
+    
+    def headers(self) -> dict:
+        """Champs volatils sous forme d'en-têtes HTTP."""
+        return {
+            'X-Response-Time': f'{self.response_time:.4f}s',
+            'X-Cache': 'HIT' if self.from_cache else 'MISS',
+            'X-Generated-At': f'{self.timestamp:.6f}'
+        }
+    
+    def to_dict(self) -> dict:
+        """Réponse complète (corps décodé + champs volatils dans meta)."""
+        response = json.loads(self.body)
+        response.setdefault('meta', {}).update({
+            'response_time': f'{self.response_time:.4f}s',
+            'from_cache': self.from_cache,
+            'timestamp': self.timestamp
+        })
+        return response
+
+
+def analyse_texte(message: str, session_id: Optional[str] = None) -> dict:
     """
     Interface unique pour l'API Flask avec optimisations avancées.
     
@@ -3294,81 +3533,165 @@ def analyse_texte(message: str) -> dict:
     - 🛡️ Circuit breaker (protection surcharge)
     - 📊 Métriques temps réel
     - 🔄 Fallback V2 → V1 automatique
+    
+    `session_id` désigne la conversation du client (session par défaut de la
+    mémoire sinon). Voir analyse_texte_encoded pour la forme pré-encodée
+    (route /api/ia).
+    """
+    return analyse_texte_encoded(message, session_id).to_dict()
+
+def analyse_texte_encoded(message: str, session_id: Optional[str] = None) -> EncodedResponse:
+    """
+    Comme analyse_texte, mais renvoie le corps JSON pré-encodé et son ETag.
+    
+    Les champs volatils (response_time, from_cache, timestamp) ne font pas
+    partie du corps : un même message renvoie des bytes identiques tant que
+    l'entrée de cache est valide.
+    
+    Les réponses qui dépendent de l'historique de la session (choix d'une
+    suggestion, amélioration du code précédent) ou qui proposent des
+    suggestions (enregistrées pour cette session seulement) sont mises en
+    cache sous une clé propre à la session et jamais dans le cache normalisé ;
+    les autres restent partagées entre tous les clients.
     """
     start_time = time.time()
+    scope = engine.history_scope(message, session_id)
     
     # 1. Vérifier le cache (réponse instantanée si trouvée)
-    cached_response = _cache.get(message)
-    if cached_response:
-        duration = time.time() - start_time
-        logger.info(f"✓ Cache HIT ({duration:.4f}s)")
-        
-        # Ajouter métadonnée cache
-        cached_response['meta']['from_cache'] = True
-        cached_response['meta']['response_time'] = f'{duration:.4f}s'
-        
-        return cached_response
-    
-    logger.info(f"⚠ Cache MISS - Processing request")
+    cached = _cached_response(message, scope, start_time)
+    if cached is not None:
+        return cached
     
     try:
         # 2. Utiliser le circuit breaker pour éviter surcharge
         def _process_request():
+            # Demande de projet : génération multi-fichiers du moteur V1, le
+            # seul à générer des projets (même réponse qu'en mode streaming)
+            project = engine.wants_project(message, session_id)
+            
             # Tentative d'utilisation du moteur V2
-            if USE_ENGINE_V2:
+            if USE_ENGINE_V2 and not project:
                 try:
                     from .ia_engine_v2 import get_engine_v2
                     engine_v2 = get_engine_v2()
-                    result = engine_v2.analyse(message)
+                    result = engine_v2.analyse(message, {'session_id': engine._session(session_id)})
+                    engine.remember_exchange(message, result, session_id)
+                    
+                    # Corps éventuellement partagé entre clients : sans l'id de session
+                    response = result.to_dict()
+                    response['meta'] = {k: v for k, v in response['meta'].items() if k != 'session_id'}
                     
                     logger.info(f"✓ Engine V2 used")
-                    return result.to_dict(), 'V2'
+                    return response, 'V2'
                 
                 except Exception as e:
                     logger.warning(f"Engine V2 failed, falling back to V1: {e}")
             
             # Moteur V1 (legacy, toujours disponible)
-            result = engine.analyse(message)
+            result = engine.analyse(message, session_id)
             logger.info(f"✓ Engine V1 used")
             return result.to_dict(), 'V1'
         
         # Exécuter avec circuit breaker
         response, engine_version = _circuit_breaker.call(_process_request)
-        
-        # 3. Enrichir la réponse avec métriques
-        duration = time.time() - start_time
-        
-        response['meta']['engine'] = engine_version
-        response['meta']['response_time'] = f'{duration:.4f}s'
-        response['meta']['from_cache'] = False
-        response['meta']['timestamp'] = time.time()
-        
-        # 4. Enregistrer métriques
-        rule_name = response['meta'].get('rule', 'unknown')
-        _metrics.record(duration, rule_name)
-        
-        # 5. Mettre en cache pour futures requêtes similaires
-        _cache.set(message, response)
-        
-        logger.info(f"✓ Request processed in {duration:.4f}s (engine={engine_version}, rule={rule_name})")
-        
-        return response
+        return _store_response(message, response, engine_version, scope, session_id, start_time)
     
     except Exception as e:
-        # Gestion d'erreur avec fallback gracieux
+        # Gestion d'erreur avec fallback gracieux (jamais mise en cache)
         duration = time.time() - start_time
         
         logger.error(f"✗ Error processing request: {e}", exc_info=True)
         
-        return {
+        return EncodedResponse.encode({
             'status': 'error',
             'response': f"Désolé, une erreur est survenue: {str(e)}",
             'meta': {
-                'error': str(e),
-                'response_time': f'{duration:.4f}s',
-                'timestamp': time.time()
+                'error': str(e)
             }
-        }
+        }, time.time(), response_time=duration)
+
+def _cached_response(message: str, scope: Optional[str], start_time: float) -> Optional[EncodedResponse]:
+    """Réponse en cache pour ce message (cache exact puis normalisé), None sinon."""
+    entry = _cache.get(message, scope)
+    cache_tier = 'exact'
+    
+    # Second niveau : message équivalent (forme canonique) ou proche (MinHash)
+    if entry is None and scope is None and _normalized_cache is not None:
+        entry = _normalized_cache.get(message)
+        if entry is not None:
+            cache_tier = 'normalized'
+            _cache.set(message, entry)  # Promotion vers le cache exact
+    
+    if entry is None:
+        logger.info(f"⚠ Cache MISS - Processing request")
+        return None
+    
+    duration = time.time() - start_time
+    logger.info(f"✓ Cache HIT ({cache_tier}, {duration:.4f}s)")
+    return EncodedResponse.from_entry(entry, duration)
+
+def _store_response(message: str, response: dict, engine_version: str, scope: Optional[str],
+                    session_id: Optional[str], start_time: float) -> EncodedResponse:
+    """Encode une réponse calculée, enregistre ses métriques et la met en cache."""
+    # Suggestions proposées : en attente pour cette session uniquement, la
+    # réponse servie à un autre client ne lui permettrait pas d'en choisir une
+    if scope is None and response['meta'].get('suggestions_count'):
+        scope = engine._session(session_id)
+    
+    # Enrichir la réponse avec métriques
+    response['meta']['engine'] = engine_version
+    rule_name = response['meta'].get('rule', 'unknown')
+    encoded = EncodedResponse.encode(response, time.time())
+    
+    duration = time.time() - start_time
+    encoded.response_time = duration
+    
+    # Enregistrer métriques
+    _metrics.record(duration, rule_name)
+    
+    # Mettre en cache pour futures requêtes similaires (bytes immuables)
+    entry = encoded.to_entry()
+    _cache.set(message, entry, scope)
+    if scope is None and _normalized_cache is not None:
+        _normalized_cache.set(message, entry)
+    
+    logger.info(f"✓ Request processed in {duration:.4f}s (engine={engine_version}, rule={rule_name})")
+    
+    return encoded
+
+def analyse_texte_stream(message: str, session_id: Optional[str] = None):
+    """
+    Mode streaming de analyse_texte : produit des événements (nom, données).
+    
+    Les demandes de projet multi-fichiers absentes du cache sont produites
+    morceau par morceau ('header', 'file'..., 'suggestions', 'done') par le
+    moteur V1, celui qu'analyse_texte choisit aussi pour ces demandes ; le
+    projet complet est ensuite mis en cache comme en mode JSON. Les autres
+    messages passent par analyse_texte et produisent un unique événement
+    'response' : le mode streaming ne change jamais la réponse.
+    """
+    start_time = time.time()
+    scope = engine.history_scope(message, session_id)
+    
+    if not engine.wants_project(message, session_id):
+        yield 'response', analyse_texte_encoded(message, session_id).to_dict()
+        return
+    
+    cached = _cached_response(message, scope, start_time)
+    if cached is not None:
+        yield 'response', cached.to_dict()
+        return
+    
+    chunks = []
+    for event, data in _circuit_breaker.stream(engine.analyse_stream, message, session_id):
+        if event == 'done':
+            response = {'status': 'ok', 'response': ''.join(chunks), 'meta': data['meta']}
+            encoded = _store_response(message, response, 'V1', scope, session_id, start_time)
+            data['meta']['response_time'] = f'{encoded.response_time:.4f}s'
+            data['meta']['from_cache'] = False
+        elif event in ('header', 'file', 'suggestions'):
+            chunks.append(data['markdown'])
+        yield event, data
 
 def get_engine_stats() -> dict:
     """
@@ -3378,14 +3701,36 @@ def get_engine_stats() -> dict:
     """
     return {
         'cache': _cache.stats(),
+        'cache_normalized': _normalized_cache.stats() if _normalized_cache is not None else None,
         'circuit_breaker': _circuit_breaker.status(),
         'performance': _metrics.stats(),
+        'rules': _rule_stats(),
         'engine_version': 'V2' if USE_ENGINE_V2 else 'V1',
         'uptime': 'N/A'  # TODO: calculer uptime
     }
 
+def _rule_stats() -> dict:
+    """Compteurs évaluées/sautées par règle, pour chaque moteur actif."""
+    stats = {'V1': engine.rule_evaluator.get_stats()}
+    if USE_ENGINE_V2:
+        try:
+            from .ia_engine_v2 import get_engine_v2
+            stats['V2'] = get_engine_v2().rule_evaluator.get_stats()
+        except Exception as e:
+            logger.warning(f"Engine V2 rule stats unavailable: {e}")
+    return stats
+
 def reset_engine_stats():
     """Réinitialise toutes les statistiques."""
     _cache.clear()
+    if _normalized_cache is not None:
+        _normalized_cache.clear()
     _metrics.reset()
+    engine.rule_evaluator.reset()
+    if USE_ENGINE_V2:
+        try:
+            from .ia_engine_v2 import get_engine_v2
+            get_engine_v2().rule_evaluator.reset()
+        except Exception as e:
+            logger.warning(f"Engine V2 rule stats unavailable: {e}")
     logger.info("✓ Engine stats reset")
@@ -27,7 +27,7 @@ import datetime
 import threading
 from typing import List, Dict, Any, Callable, Optional, Tuple
 from dataclasses import dataclass, field
-from collections import OrderedDict, defaultdict, deque
+from collections import defaultdict, deque
 from functools import wraps, lru_cache
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 
@@ -38,6 +38,9 @@ from .conversation_memory import get_conversation_memory
 from .code_analyzer import get_code_analyzer
 from .proactive_suggester import get_proactive_suggester
 from .multi_file_generator import get_multi_file_generator
+from .message_features import MessageFeatures
+from .rule_evaluator import RuleEvaluator
+from .cache_backends import MemoryCacheBackend, create_cache_backend
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                              CONFIGURATION
@@ -79,13 +82,18 @@ class EngineConfig:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class LRUCacheWithTTL:
-    """Cache LRU avec expiration temporelle."""
+    """
+    Cache LRU avec expiration temporelle.
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    Le stockage (TTL + éviction LRU) est délégué à un backend : mémoire du
+    processus par défaut, mmap ou SQLite partagé entre workers selon
+    Config.CACHE_TYPE. Les métriques restent propres au processus.
+    """
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 3600, backend=None):
         self.max_size = max_size
         self.ttl = ttl
-        self.cache: OrderedDict = OrderedDict()
-        self.timestamps: Dict[str, float] = {}
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_size, ttl)
         self.lock = threading.Lock()
         
         # Métriques
@@ -94,44 +102,22 @@ class LRUCacheWithTTL:
     
     def get(self, key: str) -> Optional[Any]:
         """Récupère une valeur du cache."""
+        value = self.backend.get(key)
         with self.lock:
-            if key not in self.cache:
-                self.misses += 1
-                return None
-            
-            # Vérifier TTL
-            if time.time() - self.timestamps[key] > self.ttl:
-                del self.cache[key]
-                del self.timestamps[key]
+            if value is None:
                 self.misses += 1
-                return None
-            
-            # Déplacer en fin (LRU)
-            self.cache.move_to_end(key)
-            self.hits += 1
-            return self.cache[key]
+            else:
+                self.hits += 1
+        return value
     
     def set(self, key: str, value: Any):
         """Stocke une valeur dans le cache."""
-        with self.lock:
-            # Si existe, mettre à jour
-            if key in self.cache:
-                self.cache.move_to_end(key)
-            else:
-                # Si plein, supprimer le plus ancien
-                if len(self.cache) >= self.max_size:
-                    oldest_key = next(iter(self.cache))
-                    del self.cache[oldest_key]
-                    del self.timestamps[oldest_key]
-            
-            self.cache[key] = value
-            self.timestamps[key] = time.time()
+        self.backend.set(key, value)
     
     def clear(self):
         """Vide le cache."""
+        self.backend.clear()
         with self.lock:
-            self.cache.clear()
-            self.timestamps.clear()
             self.hits = 0
             self.misses = 0
     
@@ -140,14 +126,16 @@ class LRUCacheWithTTL:
         with self.lock:
             total = self.hits + self.misses
             hit_rate = (self.hits / total * 100) if total > 0 else 0
-            return {
-                'size': len(self.cache),
-                'max_size': self.max_size,
-                'hits': self.hits,
-                'misses': self.misses,
-                'hit_rate': f'{hit_rate:.1f}%',
-                'ttl': self.ttl
-            }
+            hits, misses = self.hits, self.misses
+        return {
+            'backend': self.backend.name,
+            'size': len(self.backend),
+            'max_size': self.max_size,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': f'{hit_rate:.1f}%',
+            'ttl': self.ttl
+        }
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                              CIRCUIT BREAKER
@@ -503,6 +491,16 @@ class IAResponse:
             'meta': self.meta
         }
 
+# Classes de coût des règles : les règles "cheap" (lookups sur MessageFeatures)
+# s'exécutent dans le thread de la requête, seules les règles "expensive" sont
+# envoyées au thread pool (une soumission groupée par requête)
+RULE_COST_CHEAP = "cheap"
+RULE_COST_EXPENSIVE = "expensive"
+
+# Règles reprises de V1 dont l'action est lourde (synthèse de code, lecture de
+# l'historique) : thread pool avec timeout, comme avant les classes de coût
+LEGACY_EXPENSIVE_RULES = frozenset({'intelligent_code_generation'})
+
 @dataclass
 class Rule:
     """Règle du moteur IA avec métadonnées étendues."""
@@ -515,6 +513,18 @@ class Rule:
     category: str = "general"
     description: str = ""
     enabled: bool = True
+    uses_features: bool = False  # Reçoit MessageFeatures au lieu du texte brut
+    cost: str = RULE_COST_CHEAP  # RULE_COST_CHEAP (inline) ou RULE_COST_EXPENSIVE (thread pool)
+    max_score: float = 1.0  # Score maximal que la condition peut retourner
+    expected_cost: float = 0.0  # Coût estimé de la condition (s), avant mesure
+    
+    def args(self, message: str, features: MessageFeatures, lang: str) -> tuple:
+        """Arguments passés à la condition et à l'action."""
+        return (features if self.uses_features else message, lang)
+    
+    @property
+    def expensive(self) -> bool:
+        return self.cost == RULE_COST_EXPENSIVE
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                          NAMZ IA ENGINE V2
@@ -537,7 +547,8 @@ class NamzIAEngineV2:
         # Composants V2
         self.cache = LRUCacheWithTTL(
             max_size=self.config.cache_max_size,
-            ttl=self.config.cache_ttl
+            ttl=self.config.cache_ttl,
+            backend=create_cache_backend('responses_v2', self.config.cache_max_size, self.config.cache_ttl)
         ) if self.config.cache_enabled else None
         
         self.circuit_breaker = CircuitBreaker(
@@ -547,6 +558,9 @@ class NamzIAEngineV2:
         
         self.metrics = MetricsCollector() if self.config.metrics_enabled else None
         
+        # Ordre d'évaluation des règles + compteurs évaluées/sautées
+        self.rule_evaluator = RuleEvaluator()
+        
         self.semantic_analyzer = SemanticAnalyzer()
         
         self.pattern_learner = PatternLearner(
@@ -575,14 +589,30 @@ class NamzIAEngineV2:
                 condition=old_rule.condition,
                 action=old_rule.action,
                 lang=old_rule.lang,
-                category="legacy"
+                category="legacy",
+                uses_features=old_rule.uses_features,
+                cost=RULE_COST_EXPENSIVE if old_rule.name in LEGACY_EXPENSIVE_RULES else RULE_COST_CHEAP,
+                max_score=old_rule.max_score,
+                expected_cost=old_rule.expected_cost
             )
             self.rules.append(new_rule)
     
     def add_rule(self, name: str, condition: Callable, action: Callable, 
                  lang: str = "any", timeout: int = 30, priority: int = 0,
-                 category: str = "custom", description: str = ""):
-        """Ajoute une règle au moteur."""
+                 category: str = "custom", description: str = "",
+                 uses_features: bool = False, cost: str = RULE_COST_CHEAP,
+                 max_score: float = 1.0, expected_cost: float = 0.0):
+        """
+        Ajoute une règle au moteur.
+        
+        `cost` : RULE_COST_EXPENSIVE pour les conditions/actions lentes (I/O,
+        calcul lourd) qui doivent passer par le thread pool avec timeout.
+        `max_score` : score maximal de la condition (permet de sauter la règle
+        quand elle ne peut plus gagner) ; `expected_cost` : durée estimée (s).
+        """
+        if cost not in (RULE_COST_CHEAP, RULE_COST_EXPENSIVE):
+            raise ValueError(f"Invalid rule cost: {cost}")
+        
         rule = Rule(
             name=name,
             condition=condition,
@@ -591,14 +621,18 @@ class NamzIAEngineV2:
             timeout=timeout,
             priority=priority,
             category=category,
-            description=description
+            description=description,
+            uses_features=uses_features,
+            cost=cost,
+            max_score=max_score,
+            expected_cost=expected_cost
         )
         self.rules.append(rule)
         
         # Trier par priorité
         self.rules.sort(key=lambda r: r.priority, reverse=True)
         
-        self.logger.info(f"Rule '{name}' added (priority={priority}, category={category})")
+        self.logger.info(f"Rule '{name}' added (priority={priority}, category={category}, cost={cost})")
     
     def analyse(self, message: str, context: Dict = None) -> IAResponse:
         """
@@ -620,7 +654,7 @@ class NamzIAEngineV2:
                 cached_response = self.cache.get(cache_key)
                 if cached_response:
                     self.logger.debug(f"Cache HIT for: {message[:50]}...")
-                    return cached_response
+                    return IAResponse(**cached_response)
                 self.logger.debug(f"Cache MISS for: {message[:50]}...")
             
             # Exécuter l'analyse avec circuit breaker
@@ -631,7 +665,8 @@ class NamzIAEngineV2:
             
             # Stocker dans le cache
             if self.cache:
-                self.cache.set(cache_key, response)
+                # Forme dict : sérialisable par les backends partagés (mmap, SQLite)
+                self.cache.set(cache_key, response.to_dict())
             
             # Enregistrer les métriques
             duration = time.time() - start_time
@@ -661,12 +696,16 @@ class NamzIAEngineV2:
     
     def _analyse_internal(self, message: str, context: Dict = None) -> IAResponse:
         """Analyse interne du message."""
+        # Une seule analyse du message, partagée par toutes les règles
+        # (session du contexte : historique lu par les actions reprises de V1)
+        features = MessageFeatures.from_message(message, (context or {}).get('session_id'))
+        
         # Détection de langue
-        lang = self._detect_language(message)
+        lang = self._detect_language(features)
         
         # Analyse sémantique
         entities = self.semantic_analyzer.extract_entities(message)
-        intent = self.semantic_analyzer.extract_intent(message)
+        intent = self.semantic_analyzer.extract_intent(features.lower)
         
         # Enrichir le contexte
         enriched_context = {
@@ -679,30 +718,8 @@ class NamzIAEngineV2:
         if context:
             enriched_context.update(context)
         
-        # Évaluer toutes les règles
-        candidates = []
-        
-        for rule in self.rules:
-            if not rule.enabled:
-                continue
-            
-            try:
-                # Timeout par règle
-                score = self._execute_with_timeout(
-                    rule.condition,
-                    args=(message, lang),
-                    timeout=rule.timeout
-                )
-                
-                if score >= self.config.min_confidence_score:
-                    candidates.append((rule, score))
-            
-            except Exception as e:
-                self.logger.warning(f"Rule '{rule.name}' failed: {e}")
-                continue
-        
-        # Trier par score
-        candidates.sort(key=lambda x: x[1], reverse=True)
+        # Évaluer toutes les règles (triées par score, ordre des règles à score égal)
+        candidates = self._evaluate_rules(message, features, lang)
         
         if not candidates:
             return self._fallback_response(message, enriched_context)
@@ -712,11 +729,7 @@ class NamzIAEngineV2:
             top_responses = []
             for rule, score in candidates[:self.config.top_n_responses]:
                 try:
-                    response_text = self._execute_with_timeout(
-                        rule.action,
-                        args=(message, lang),
-                        timeout=rule.timeout
-                    )
+                    response_text = self._run_action(rule, message, features, lang)
                     top_responses.append({
                         'rule': rule.name,
                         'score': score,
@@ -738,11 +751,7 @@ class NamzIAEngineV2:
         best_rule, best_score = candidates[0]
         
         try:
-            response_text = self._execute_with_timeout(
-                best_rule.action,
-                args=(message, lang),
-                timeout=best_rule.timeout
-            )
+            response_text = self._run_action(best_rule, message, features, lang)
             
             return IAResponse(
                 status="ok",
@@ -754,6 +763,70 @@ class NamzIAEngineV2:
             self.logger.error(f"Best rule action failed: {e}")
             return self._fallback_response(message, enriched_context)
     
+    def _evaluate_rules(self, message: str, features: MessageFeatures, lang: str) -> List[Tuple[Rule, float]]:
+        """
+        Évalue les conditions des règles actives.
+        
+        Les règles "cheap" sont évaluées inline, par priorité / score maximal /
+        coût observé, en sautant celles qui ne peuvent plus battre le meilleur
+        score. Les règles "expensive" qui peuvent encore gagner partent ensuite
+        en une seule soumission au thread pool ; au timeout elles sont ignorées.
+        En mode multi-réponse toutes les règles sont évaluées.
+        
+        Returns:
+            Liste de (règle, score) au-dessus du seuil, triée par score décroissant
+        """
+        cheap, expensive = [], []
+        for position, rule in enumerate(self.rules):
+            if not rule.enabled:
+                continue
+            if rule.expensive and self.executor:
+                expensive.append((position, rule))
+            else:
+                cheap.append((position, rule))
+        
+        def score(rule: Rule) -> Optional[float]:
+            try:
+                return rule.condition(*rule.args(message, features, lang))
+            except Exception as e:
+                self.logger.warning(f"Rule '{rule.name}' failed: {e}")
+                return None
+        
+        options = {
+            'threshold': self.config.min_confidence_score,
+            'inclusive': True,
+            'exhaustive': self.config.enable_multi_response
+        }
+        candidates, best = self.rule_evaluator.evaluate(cheap, score, **options)
+        
+        if expensive:
+            if options['exhaustive'] or any(
+                self.rule_evaluator.can_beat(rule, position, best, options['threshold'], True)
+                for position, rule in expensive
+            ):
+                timeout = max(rule.timeout for _, rule in expensive)
+                batch = self.executor.submit(self.rule_evaluator.evaluate, expensive, score, best=best, **options)
+                try:
+                    expensive_candidates, _ = batch.result(timeout=timeout)
+                    candidates.extend(expensive_candidates)
+                except FuturesTimeoutError:
+                    self.logger.warning(
+                        f"Expensive rules timed out after {timeout}s: {[rule.name for _, rule in expensive]}"
+                    )
+            else:
+                # Aucune règle expensive ne peut gagner : seulement comptabilisées
+                self.rule_evaluator.evaluate(expensive, score, best=best, **options)
+        
+        candidates.sort(key=lambda c: (-c[2], c[0]))
+        return [(rule, value) for _, rule, value in candidates]
+    
+    def _run_action(self, rule: Rule, message: str, features: MessageFeatures, lang: str) -> str:
+        """Exécute l'action d'une règle (thread pool + timeout si elle est expensive)."""
+        args = rule.args(message, features, lang)
+        if rule.expensive:
+            return self._execute_with_timeout(rule.action, args=args, timeout=rule.timeout)
+        return rule.action(*args)
+    
     def _execute_with_timeout(self, func: Callable, args: tuple, timeout: int) -> Any:
         """Exécute une fonction avec timeout."""
         if not self.executor:
@@ -765,14 +838,14 @@ class NamzIAEngineV2:
         except FuturesTimeoutError:
             raise TimeoutError(f"Function execution exceeded {timeout}s")
     
-    def _detect_language(self, message: str) -> str:
+    def _detect_language(self, message) -> str:
         """Détecte la langue du message."""
         # Mots français courants
         fr_words = {'le', 'la', 'les', 'un', 'une', 'des', 'et', 'ou', 'mais', 'donc', 'car', 'pour', 'dans', 'sur', 'avec', 'sans', 'par'}
         # Mots anglais courants
         en_words = {'the', 'a', 'an', 'and', 'or', 'but', 'so', 'for', 'in', 'on', 'with', 'without', 'by', 'from', 'to'}
         
-        words = set(message.lower().split())
+        words = MessageFeatures.of(message).token_set
         
         fr_count = len(words & fr_words)
         en_count = len(words & en_words)
@@ -795,8 +868,8 @@ class NamzIAEngineV2:
         )
     
     def _generate_cache_key(self, message: str, context: Dict = None) -> str:
-        """Génère une clé de cache unique."""
-        key_parts = [message]
+        """Génère une clé de cache unique (même normalisation que le cache exact V1)."""
+        key_parts = [message.lower().strip()]
         
         if context:
             # Inclure seulement les éléments pertinents pour le cache
@@ -813,6 +886,7 @@ class NamzIAEngineV2:
         stats = {
             'rules_count': len(self.rules),
             'rules_enabled': sum(1 for r in self.rules if r.enabled),
+            'rules_expensive': sum(1 for r in self.rules if r.enabled and r.expensive),
             'config': {
                 'cache_enabled': self.config.cache_enabled,
                 'circuit_breaker_enabled': self.config.circuit_breaker_enabled,
@@ -833,6 +907,8 @@ class NamzIAEngineV2:
         if self.pattern_learner:
             stats['learning'] = self.pattern_learner.get_stats()
         
+        stats['rule_evaluation'] = self.rule_evaluator.get_stats()
+        
         return stats
     
     def clear_cache(self):
@@ -843,6 +919,7 @@ class NamzIAEngineV2:
     
     def reset_metrics(self):
         """Réinitialise les métriques."""
+        self.rule_evaluator.reset()
         if self.metrics:
             self.metrics.reset()
             self.logger.info("Metrics reset")
@@ -0,0 +1,150 @@
+"""
+Automate Aho-Corasick pour la détection de mots-clés
+Une seule passe sur le message trouve tous les mots-clés de toutes les tables
+(langages, intentions, domaines, suggestions...) avec leur catégorie
+"""
+
+import threading
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class KeywordHits:
+    """Résultat d'un scan : mots-clés trouvés, regroupés par catégorie."""
+
+    __slots__ = ('keywords', 'bounded', 'categories')
+
+    def __init__(self, keywords: Set[str], bounded: Set[str], categories: Dict[str, Set[str]]):
+        self.keywords = keywords        # Trouvés comme sous-chaîne
+        self.bounded = bounded          # Trouvés au moins une fois comme mot entier
+        self.categories = categories    # catégorie → mots-clés trouvés
+
+    def any(self, category: str, whole_word: bool = False) -> bool:
+        """Vrai si un mot-clé de la catégorie apparaît (sous-chaîne ou mot entier)."""
+        found = self.categories.get(category)
+        if not found:
+            return False
+        if whole_word:
+            return not self.bounded.isdisjoint(found)
+        return True
+
+    def matched(self, category: str) -> Set[str]:
+        """Mots-clés trouvés pour une catégorie."""
+        return self.categories.get(category, set())
+
+    def count(self, category: str) -> int:
+        """Nombre de mots-clés distincts trouvés pour une catégorie."""
+        return len(self.categories.get(category, ()))
+
+
+class KeywordAutomaton:
+    """
+    Automate multi-motifs (Aho-Corasick) compilé à partir des tables de mots-clés.
+
+    Les modules enregistrent leurs tables avec `register(catégorie, mots_clés)` ;
+    l'automate est (re)compilé paresseusement au premier scan suivant un ajout.
+    Les mots-clés sont insensibles à la casse (le texte scanné doit être en
+    minuscules).
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, FrozenSet[str]] = {}
+        self.keyword_categories: Dict[str, Tuple[str, ...]] = {}
+        self.goto: List[Dict[str, int]] = [{}]
+        self.output: List[Tuple[str, ...]] = [()]
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def register(self, category: str, keywords: Iterable[str]):
+        """Enregistre (ou remplace) une table de mots-clés."""
+        with self.lock:
+            self.tables[category] = frozenset(kw.lower() for kw in keywords if kw)
+            self.dirty = True
+
+    def compile(self):
+        """Construit le trie, les liens d'échec et les sorties fusionnées."""
+        with self.lock:
+            if not self.dirty:
+                return
+
+            keyword_categories: Dict[str, List[str]] = {}
+            for category, keywords in self.tables.items():
+                for kw in keywords:
+                    keyword_categories.setdefault(kw, []).append(category)
+
+            goto: List[Dict[str, int]] = [{}]
+            output: List[List[str]] = [[]]
+            for kw in keyword_categories:
+                state = 0
+                for ch in kw:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        output.append([])
+                    state = nxt
+                output[state].append(kw)
+
+            # Liens d'échec en largeur ; chaque état hérite ensuite des transitions
+            # de son état d'échec (déjà complet), ce qui donne un automate
+            # déterministe : le scan ne remonte jamais les liens d'échec
+            fail = [0] * len(goto)
+            queue = deque(goto[0].values())
+            while queue:
+                state = queue.popleft()
+                output[state].extend(output[fail[state]])
+                for ch, nxt in goto[state].items():
+                    fail[nxt] = goto[fail[state]].get(ch, 0)
+                    queue.append(nxt)
+                for ch, nxt in goto[fail[state]].items():
+                    goto[state].setdefault(ch, nxt)
+
+            self.goto = goto
+            self.output = [tuple(o) for o in output]
+            self.keyword_categories = {kw: tuple(cats) for kw, cats in keyword_categories.items()}
+            self.dirty = False
+
+    def scan(self, text: str) -> KeywordHits:
+        """Une passe sur `text` (en minuscules) : tous les mots-clés et leurs catégories."""
+        if self.dirty:
+            self.compile()
+
+        goto, output = self.goto, self.output
+        keywords: Set[str] = set()
+        bounded: Set[str] = set()
+        state = 0
+        length = len(text)
+
+        for i, ch in enumerate(text):
+            state = goto[state].get(ch, 0)
+            if not state:
+                continue
+            for kw in output[state]:
+                keywords.add(kw)
+                if kw in bounded:
+                    continue
+                start = i - len(kw) + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and \
+                        (i + 1 == length or not _is_word_char(text[i + 1])):
+                    bounded.add(kw)
+
+        categories: Dict[str, Set[str]] = {}
+        keyword_categories = self.keyword_categories
+        for kw in keywords:
+            for category in keyword_categories.get(kw, ()):
+                categories.setdefault(category, set()).add(kw)
+
+        return KeywordHits(keywords, bounded, categories)
+
+
+# Instance globale partagée par tous les détecteurs
+keyword_automaton = KeywordAutomaton()
+
+def get_keyword_automaton() -> KeywordAutomaton:
+    """Récupère l'automate global de mots-clés."""
+    return keyword_automaton
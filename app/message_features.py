@@ -0,0 +1,259 @@
+"""
+Caractéristiques d'un message calculées une seule fois par requête
+Partagées par les conditions et actions des règles des moteurs V1 et V2
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Union
+
+from .keyword_automaton import KeywordHits, get_keyword_automaton
+
+CODE_BLOCK_PATTERN = re.compile(r'```[\s\S]*?```')
+WORD_PATTERN = re.compile(r'\w+')
+# Ponctuation retirée par la forme canonique ; les symboles significatifs
+# (c#, c++, opérateurs) restent, "!" seulement dans "!=" et "-" hors des mots
+# composés ("peux-tu")
+PUNCTUATION_PATTERN = re.compile(r'!(?!=)|(?<=[^\W\d_])-(?=[^\W\d_])|[^\w\s#+\-*/%=<>&|^~!]')
+SYMBOL_PATTERN = re.compile(r'[#+\-*/%=<>&|^~!]')
+
+# Mots très communs ignorés par la forme canonique d'un message
+STOPWORDS = frozenset(['le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'a', 'à', 'the', 'an', 'of'])
+
+
+def normalize_message(text: str) -> str:
+    """
+    Forme canonique d'un message, clé du cache normalisé (NormalizedResponseCache) :
+    minuscules, ponctuation retirée, stopwords retirés, espaces normalisés
+    ("Crée une fonction Python !" → "crée fonction python").
+    Les symboles significatifs restent ("classe c#" ≠ "classe c++", "a -> b" ≠
+    "a > b"), ainsi qu'un "?" final (la règle "question" en dépend).
+    """
+    lower = text.lower()
+    words = [w for w in PUNCTUATION_PATTERN.sub(' ', lower).split() if w not in STOPWORDS]
+    if lower.rstrip().endswith('?'):
+        words.append('?')
+    return ' '.join(words)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          TABLES DE MOTS-CLÉS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Recherche par sous-chaîne (équivalent des anciens `kw in msg.lower()`)
+CODE_REQUEST_KEYWORDS = frozenset([
+    # Actions de création
+    'crée', 'créer', 'create', 'fait', 'fais', 'faire', 'make', 'écris', 'écrire', 'write',
+    'génère', 'générer', 'generate', 'développe', 'développer', 'develop', 'build', 'construis',
+    'code', 'programme', 'program', 'script', 'app', 'application', 'site', 'page',
+
+    # Types de code
+    'fonction', 'function', 'classe', 'class', 'méthode', 'method', 'api', 'interface',
+    'algorithme', 'algorithm', 'structure', 'module', 'composant', 'component',
+
+    # Actions d'amélioration
+    'optimise', 'optimiser', 'optimize', 'améliore', 'améliorer', 'improve', 'refactor',
+    'refactoriser', 'corriger', 'fix', 'debug', 'débugger', 'réparer', 'repair',
+
+    # Langage conversationnel
+    'peux-tu', 'peux tu', 'pourrais-tu', 'pourrais tu', 'voudrais', 'aimerais',
+    'besoin de', 'besoin d', 'il me faut', 'je veux', 'je voudrais', 'j\'ai besoin',
+    'help me', 'aide-moi', 'montre-moi', 'show me', 'comment faire',
+
+    # Contextes techniques
+    'html', 'css', 'javascript', 'python', 'java', 'php', 'ruby', 'go', 'rust',
+    'backend', 'frontend', 'fullstack', 'web', 'mobile', 'desktop',
+    'base de données', 'database', 'sql', 'api rest', 'graphql'
+])
+
+CODE_HELPER_KEYWORDS = frozenset([
+    "python", "javascript", "js", "flask", "fonction", "function", "variable", "class", "boucle", "loop", "erreur", "error", "bug",
+    "c#", ".net", "asp.net", "linq", "razor", "c ", "pointeur", "pointer"
+])
+
+MULTI_FILE_KEYWORDS = frozenset([
+    'projet complet', 'complete project', 'architecture', 'structure complète',
+    'api complète', 'full stack', 'avec tous les fichiers', 'microservices'
+])
+
+HELP_KEYWORDS = frozenset(['aide', 'help'])
+MOTIVATION_KEYWORDS = frozenset(['courage', 'force', 'motivation', 'bravo', 'success'])
+THANKS_KEYWORDS = frozenset(['merci', 'thanks', 'thank you'])
+HUMOUR_KEYWORDS = frozenset(['blague', 'joke', 'rigole'])
+
+KEYWORD_TABLES = {
+    'code_request': CODE_REQUEST_KEYWORDS,
+    'code_helper': CODE_HELPER_KEYWORDS,
+    'multi_file': MULTI_FILE_KEYWORDS,
+    'help': HELP_KEYWORDS,
+    'motivation': MOTIVATION_KEYWORDS,
+    'thanks': THANKS_KEYWORDS,
+    'humour': HUMOUR_KEYWORDS,
+}
+
+# Mots entiers (équivalent des anciens `\b(...)\b`)
+GREETING_FR_WORDS = frozenset(['bonjour', 'salut', 'coucou'])
+GREETING_EN_WORDS = frozenset(['hello', 'hi', 'hey'])
+FR_MARKER_WORDS = frozenset(['bonjour', 'salut', 'aide', 'merci', 'pourquoi', 'comment'])
+EN_MARKER_WORDS = frozenset(['hello', 'hi', 'help', 'thanks', 'why', 'how'])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          TABLES DES DÉTECTEURS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# (catégorie, valeur, mots-clés) : l'ordre de chaque liste est l'ordre de priorité
+# des anciennes chaînes if/elif de NamzIAEngine (recherche par sous-chaîne)
+LANGUAGE_HINTS = [
+    ('language:python', 'python', ['python', 'py']),
+    ('language:typescript', 'typescript', ['typescript', 'ts']),
+    ('language:javascript', 'javascript', ['javascript', 'js', 'node']),
+    ('language:csharp', 'csharp', ['c#', 'csharp', 'dotnet', '.net']),
+    ('language:c', 'c', [' c ']),  # + 'c ' en début / ' c' en fin de message
+    ('language:java', 'java', ['java ', 'java']),
+    ('language:php', 'php', ['php']),
+    ('language:ruby', 'ruby', ['ruby', 'rb']),
+    ('language:go', 'go', ['go', 'golang']),
+    ('language:rust', 'rust', ['rust', 'rs']),
+    ('language:swift', 'swift', ['swift']),
+    ('language:kotlin', 'kotlin', ['kotlin', 'kt']),
+    ('language:sql', 'sql', ['sql', 'database', 'base de données']),
+    ('language:bash', 'bash', ['bash', 'shell', 'script shell']),
+    # Détection par contexte (site web = HTML)
+    ('language:html', 'html', ['site', 'page web', 'html', 'website']),
+    ('language:css', 'css', ['style', 'css', 'design']),
+    # Détection par contexte projet
+    ('language:backend', 'python', ['api rest', 'serveur', 'backend']),
+    ('language:android', 'kotlin', ['app mobile', 'android']),
+    ('language:ios', 'swift', ['ios', 'iphone', 'ipad']),
+    ('language:webapp', 'javascript', ['web app', 'frontend', 'spa']),
+]
+
+INTENT_HINTS = [
+    ('intent:improve', 'improve', ['améliore', 'améliorer', 'improve', 'enhance', 'mieux', 'better']),
+    ('intent:optimize', 'optimize', ['optimise', 'optimiser', 'optimize', 'performance', 'plus rapide', 'faster']),
+    ('intent:refactor', 'refactor', ['refactor', 'refactoriser', 'restructure', 'nettoie', 'clean']),
+    ('intent:debug', 'debug', ['debug', 'débugger', 'corriger', 'fix', 'réparer', 'repair', 'bug', 'erreur', 'error']),
+    ('intent:explain', 'explain', ['explique', 'expliquer', 'explain', 'comment', 'how', 'pourquoi', 'why']),
+]
+
+# Référence à un code déjà généré ("améliore notre site")
+PREVIOUS_REFERENCE_KEYWORDS = ['notre', 'le', 'ce', 'this', 'that', 'précédent', 'previous']
+
+CODE_TYPE_HINTS = [
+    ('code_type:function', 'function', ['fonction', 'function', 'méthode', 'method', 'def ', 'fn ']),
+    ('code_type:class', 'class', ['classe', 'class', 'objet', 'object']),
+    ('code_type:loop', 'loop', ['boucle', 'loop', 'itérer', 'iterate', 'for', 'while']),
+    ('code_type:sort', 'sort', ['trier', 'sort', 'tri', 'sorting']),
+    ('code_type:read_file', 'read_file', ['lire', 'read', 'ouvrir', 'open', 'fichier']),
+    ('code_type:write_file', 'write_file', ['écrire', 'write', 'sauver', 'save', 'enregistrer']),
+    ('code_type:calculator', 'calculator', ['calculatrice', 'calculator', 'calcul', 'calculate']),
+    ('code_type:api', 'api', ['api', 'requete', 'request', 'fetch', 'http', 'rest']),
+    ('code_type:sql_query', 'sql_query', ['select', 'insert', 'update', 'delete', 'requête sql', 'query']),
+    ('code_type:test', 'test', ['test', 'unittest', 'tests', 'testing']),
+    ('code_type:interface', 'interface', ['interface', 'ui', 'gui', 'formulaire', 'form']),
+    ('code_type:website', 'website', ['site', 'page', 'website', 'web']),
+    ('code_type:application', 'application', ['app', 'application', 'programme', 'program']),
+]
+
+DOMAIN_HINTS = [
+    ('domain:ecommerce', 'ecommerce', ['dropshipping', 'e-commerce', 'ecommerce', 'boutique', 'shop', 'magasin', 'vente']),
+    ('domain:blog', 'blog', ['blog', 'article', 'news', 'magazine', 'publication']),
+    ('domain:portfolio', 'portfolio', ['portfolio', 'cv', 'resume', 'professionnel']),
+    ('domain:landing', 'landing', ['landing', 'page de vente', 'conversion']),
+    ('domain:dashboard', 'dashboard', ['dashboard', 'admin', 'panneau', 'gestion']),
+    ('domain:social', 'social', ['social', 'réseau social', 'communauté']),
+    ('domain:restaurant', 'restaurant', ['restaurant', 'menu', 'réservation']),
+    ('domain:realestate', 'realestate', ['immobilier', 'real estate', 'propriété']),
+    ('domain:education', 'education', ['éducation', 'cours', 'formation', 'learning']),
+    ('domain:fitness', 'fitness', ['fitness', 'sport', 'gym', 'santé']),
+]
+
+COMPLEXITY_HINTS = [
+    ('complexity:advanced', 'advanced', ['avancé', 'advanced', 'complexe', 'complex', 'complet', 'complete']),
+    ('complexity:production', 'production', ['professionnel', 'professional', 'production', 'robuste', 'robust']),
+]
+
+REQUIREMENT_KEYWORDS = ['avec', 'with']
+CONSTRAINT_KEYWORDS = ['sans', 'without']
+
+
+def first_hint(hits: KeywordHits, hints: List) -> Optional[str]:
+    """Valeur de la première entrée (par priorité) dont un mot-clé a été trouvé."""
+    for category, value, _ in hints:
+        if category in hits.categories:
+            return value
+    return None
+
+
+# Compilation de toutes les tables dans l'automate global
+_automaton = get_keyword_automaton()
+for _name, _table in KEYWORD_TABLES.items():
+    _automaton.register(_name, _table)
+for _hints in (LANGUAGE_HINTS, INTENT_HINTS, CODE_TYPE_HINTS, DOMAIN_HINTS, COMPLEXITY_HINTS):
+    for _category, _, _keywords in _hints:
+        _automaton.register(_category, _keywords)
+_automaton.register('intent:previous_reference', PREVIOUS_REFERENCE_KEYWORDS)
+_automaton.register('context:requirements', REQUIREMENT_KEYWORDS)
+_automaton.register('context:constraints', CONSTRAINT_KEYWORDS)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                          MESSAGE FEATURES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class MessageFeatures:
+    """Vue pré-analysée d'un message (une tokenisation par requête)."""
+    text: str
+    lower: str
+    stripped: str
+    tokens: List[str]
+    token_set: FrozenSet[str]
+    words: FrozenSet[str]
+    lang: str
+    code_blocks: List[str]
+    hits: KeywordHits  # Scan unique par l'automate de mots-clés
+    context: Optional[Dict] = None  # Rempli par _analyze_context (calculé une fois)
+    session_id: Optional[str] = None  # Session de conversation (historique lu par les actions)
+
+    @classmethod
+    def from_message(cls, message: str, session_id: Optional[str] = None) -> 'MessageFeatures':
+        """Analyse le message en une passe."""
+        lower = message.lower()
+        tokens = lower.split()
+        words = frozenset(WORD_PATTERN.findall(lower))
+
+        # Langue (fr/en), par défaut français
+        if not words.isdisjoint(FR_MARKER_WORDS):
+            lang = 'fr'
+        elif not words.isdisjoint(EN_MARKER_WORDS):
+            lang = 'en'
+        else:
+            lang = 'fr'
+
+        return cls(
+            text=message,
+            lower=lower,
+            stripped=message.strip(),
+            tokens=tokens,
+            token_set=frozenset(tokens),
+            words=words,
+            lang=lang,
+            code_blocks=CODE_BLOCK_PATTERN.findall(message),
+            hits=get_keyword_automaton().scan(lower),
+            session_id=session_id
+        )
+
+    @classmethod
+    def of(cls, message: Union[str, 'MessageFeatures']) -> 'MessageFeatures':
+        """Retourne les features d'un message (réutilise celles déjà calculées)."""
+        if isinstance(message, cls):
+            return message
+        return cls.from_message(message)
+
+    def has_any(self, keywords: Iterable[str]) -> bool:
+        """Vrai si au moins un mot-clé de la table apparaît dans le message."""
+        return not self.hits.keywords.isdisjoint(keywords)
+
+    def has_word(self, words: Iterable[str]) -> bool:
+        """Vrai si au moins un mot entier de la table apparaît dans le message."""
+        return not self.words.isdisjoint(words)
@@ -3,7 +3,7 @@ Générateur de projets multi-fichiers pour Namz IA
 Génère des structures complètes de projets avec plusieurs fichiers liés
 """
 
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 import os
 
 class MultiFileGenerator:
@@ -125,45 +125,74 @@ class MultiFileGenerator:
     
     def generate_project(self, project_type: str) -> Dict:
         """Génère un projet complet avec validation."""
+        project = {}
+        files = {}
+        
+        for event, data in self.iter_project(project_type):
+            if event == 'error':
+                return data
+            if event == 'header':
+                project = {'name': data['name'], 'description': data['description'], 'files': files}
+            elif event == 'file':
+                files[data['path']] = data['content']
+            elif event == 'instructions':
+                project['instructions'] = data['instructions']
+        
+        return project
+    
+    def iter_project(self, project_type: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        Génère un projet fichier par fichier (mode streaming).
+        
+        Produit ('header', {...}) avec la liste des fichiers, puis un
+        ('file', {'path', 'content'}) par fichier dès qu'il est généré, puis
+        ('instructions', {...}). En cas d'erreur : un unique ('error', {...}).
+        """
         try:
             # Validation
             if not project_type or not isinstance(project_type, str):
-                return {
+                yield 'error', {
                     'error': 'Type de projet invalide',
                     'available_types': list(self.project_templates.keys())
                 }
+                return
             
             project_type = project_type.strip().lower()
             
             if project_type not in self.project_templates:
-                return {
+                yield 'error', {
                     'error': f'Type de projet inconnu: {project_type}',
                     'available_types': list(self.project_templates.keys())
                 }
+                return
             
             template = self.project_templates[project_type]
-            files = {}
-            
-            # Générer chaque fichier avec gestion d'erreur
-            for filepath, generator_func in template['files'].items():
-                try:
-                    files[filepath] = generator_func()
-                except Exception as e:
-                    files[filepath] = f"# Erreur génération: {str(e)}"
-                    print(f"Erreur génération {filepath}: {e}")
-            
-            return {
-                'name': template['name'],
-                'description': template['description'],
-                'files': files,
-                'instructions': self._get_project_instructions(project_type)
-            }
+            instructions = self._get_project_instructions(project_type)
         
         except Exception as e:
-            return {
+            yield 'error', {
                 'error': f'Erreur génération projet: {str(e)}',
                 'available_types': list(self.project_templates.keys())
             }
+            return
+        
+        yield 'header', {
+            'project_type': project_type,
+            'name': template['name'],
+            'description': template['description'],
+            'files': list(template['files'].keys())
+        }
+        
+        # Générer chaque fichier avec gestion d'erreur
+        for filepath, generator_func in template['files'].items():
+            try:
+                content = generator_func()
+            except Exception as e:
+                content = f"# Erreur génération: {str(e)}"
+                print(f"Erreur génération {filepath}: {e}")
+            yield 'file', {'path': filepath, 'content': content}
+        
+        yield 'instructions', {'instructions': instructions}
     
     def _get_project_instructions(self, project_type: str) -> str:
         """Retourne les instructions d'utilisation du projet."""
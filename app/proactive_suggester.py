@@ -5,11 +5,20 @@ Propose automatiquement des améliorations et fonctionnalités
 
 from typing import Dict, List, Optional
 
+from .keyword_automaton import KeywordHits, get_keyword_automaton
+
 class ProactiveSuggester:
     """Génère des suggestions proactives basées sur le contexte."""
     
     def __init__(self):
         self.suggestion_rules = self._initialize_rules()
+        self._register_triggers()
+    
+    def _register_triggers(self):
+        """Compile les triggers dans l'automate de mots-clés partagé."""
+        automaton = get_keyword_automaton()
+        for category, rules in self.suggestion_rules.items():
+            automaton.register(f'suggest:{category}', rules.get('triggers', []))
     
     def _initialize_rules(self) -> Dict:
         """Initialise les règles de suggestions."""
@@ -191,13 +200,20 @@ class ProactiveSuggester:
             }
         }
     
-    def generate_suggestions(self, context: Dict) -> List[Dict]:
-        """Génère des suggestions basées sur le contexte avec validation."""
+    def generate_suggestions(self, context: Dict, hits: Optional[KeywordHits] = None) -> List[Dict]:
+        """
+        Génère des suggestions basées sur le contexte avec validation.
+        
+        `hits` : scan du message déjà fait par l'appelant (sinon scanné ici, une fois).
+        """
         try:
             # Validation
             if not context or not isinstance(context, dict):
                 return []
             
+            if hits is None:
+                hits = get_keyword_automaton().scan(str(context.get('message', '')).lower())
+            
             suggestions = []
             
             # Analyser le contexte pour déterminer les suggestions pertinentes
@@ -207,13 +223,12 @@ class ProactiveSuggester:
                     triggers = rules.get('triggers', [])
                     
                     # Vérification sécurisée des valeurs
-                    message = str(context.get('message', '')).lower()
                     code_type = str(context.get('code_type', '')).lower()
                     domain = str(context.get('domain', '')).lower()
-                    language = str(context.get('language', '')).lower()
                     
-                    # Si un trigger correspond
-                    if any(trigger in message or trigger in code_type or trigger in domain for trigger in triggers):
+                    # Si un trigger correspond (message : lookup dans le scan de l'automate)
+                    if hits.any(f'suggest:{category}') or \
+                            any(trigger in code_type or trigger in domain for trigger in triggers):
                         # Ajouter les suggestions de cette catégorie
                         category_suggestions = rules.get('suggestions', [])
                         suggestions.extend(category_suggestions)
@@ -1,11 +1,13 @@
 
-from flask import Blueprint, jsonify, request, current_app, render_template
+from flask import Blueprint, jsonify, request, current_app, render_template, stream_with_context
 from .web_fetcher import fetch_stackoverflow_snippets
 import json
 import os
 import datetime
+import secrets
 from .code_templates import CODE_TEMPLATES
-from .security import require_valid_input, rate_limit
+from .text_index import get_template_index
+from .security import require_valid_input, rate_limit, InputValidator
 bp = Blueprint('main', __name__)
 from app.auto_learn import start_auto_learn, stop_auto_learn, get_auto_learn_log
 
@@ -65,6 +67,7 @@ def api_code_templates():
             return jsonify({'error': 'Champs manquants'}), 400
         # Met à jour le dict en mémoire
         CODE_TEMPLATES[key] = {'patterns': patterns, 'template': template}
+        get_template_index().add(key, patterns)
         # Persiste dans le fichier code_templates.py
         with open(templates_path, 'w', encoding='utf-8') as f:
             f.write('CODE_TEMPLATES = ' + json.dumps(CODE_TEMPLATES, ensure_ascii=False, indent=4))
@@ -86,9 +89,64 @@ def hello():
     return jsonify({'message': 'Hello, world!'})
 
 # API IA maison, innovante et efficace
-from .ia_engine import analyse_texte
 import logging
 
+def _wants_stream(data) -> bool:
+    """Mode streaming demandé ({"stream": true} ou Accept: text/event-stream)."""
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+# Session de conversation du client (historique propre dans ConversationMemory)
+SESSION_HEADER = 'X-Session-ID'
+SESSION_COOKIE = 'namz_session'
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 3600  # 30 jours
+SEC_FETCH_HEADER = 'Sec-Fetch-Mode'
+
+def _client_session(data, create: bool = True):
+    """
+    Session du client : champ JSON `session_id`, en-tête X-Session-ID puis
+    cookie. Renvoie (session_id, créée) ; sans session fournie, une nouvelle
+    est générée si `create` et que la requête vient d'un navigateur (qui
+    renverra le cookie), sinon None : session par défaut de la mémoire (curl,
+    scripts... ne reçoivent pas une session neuve à chaque appel).
+    Lève ValueError si l'identifiant est invalide.
+    """
+    if not isinstance(data, dict):
+        data = {}
+    for session_id in (data.get('session_id'), request.headers.get(SESSION_HEADER),
+                       request.cookies.get(SESSION_COOKIE)):
+        if session_id is not None:
+            valid, error = InputValidator.validate_session_id(session_id)
+            if not valid:
+                raise ValueError(error)
+            return session_id, False
+    # En-têtes Fetch Metadata : envoyés par les navigateurs uniquement
+    if not create or SEC_FETCH_HEADER not in request.headers:
+        return None, False
+    return secrets.token_urlsafe(16), True
+
+def _remember_session(response, session_id: str, created: bool):
+    """Renvoie au client la session créée pour lui (cookie httpOnly)."""
+    if created:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax', secure=request.is_secure)
+    return response
+
+def _sse_response(events):
+    """Réponse Server-Sent Events : un événement par (nom, données), envoyé dès qu'il est prêt."""
+    def generate():
+        try:
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            current_app.logger.exception(f"Erreur streaming: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Erreur interne du serveur'})}\n\n"
+    
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 
 
 # Nouvelle route pour apprendre via Internet (StackOverflow)
@@ -110,7 +168,7 @@ def web_learn_page():
 @rate_limit(max_requests=10, window=60)  # 10 req/min
 @require_valid_input('message')
 def ia():
-    from .ia_engine import analyse_texte
+    from .ia_engine import analyse_texte_encoded
     from markupsafe import escape
     import traceback
     
@@ -152,10 +210,26 @@ def ia():
         # Sanitization
         message = escape(message)
         
+        # Conversation du client (historique et suggestions propres)
+        session_id, created = _client_session(data)
+        
+        # Mode streaming (SSE) : en-tête, fichiers puis suggestions au fil de l'eau
+        if _wants_stream(data):
+            from .ia_engine import analyse_texte_stream
+            return _remember_session(_sse_response(analyse_texte_stream(message, session_id)), session_id, created)
+        
         # Analyse
-        resultat = analyse_texte(message)
+        resultat = analyse_texte_encoded(message, session_id)
         current_app.logger.info(f"[IA] Message analysé: {message[:50]}... | Succès")
-        return jsonify(resultat)
+        
+        # Corps pré-encodé + ETag fort ; champs volatils en en-têtes
+        if request.if_none_match.contains_weak(resultat.etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(resultat.body, mimetype='application/json')
+        response.set_etag(resultat.etag)
+        response.headers.update(resultat.headers())
+        return _remember_session(response, session_id, created)
     
     except ValueError as e:
         current_app.logger.warning(f"Erreur validation: {e}")
@@ -203,18 +277,26 @@ def memory_stats():
 
 @bp.route('/api/memory/clear', methods=['POST'])
 def memory_clear():
-    """Efface la session de conversation courante."""
+    """Efface la session de conversation du client (session par défaut sinon)."""
     from .conversation_memory import get_conversation_memory
+    try:
+        session_id, _ = _client_session(request.get_json(silent=True) or {}, create=False)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     memory = get_conversation_memory()
-    memory.clear_session()
+    memory.clear_session(session_id)
     return jsonify({'status': 'ok', 'message': 'Session effacée'})
 
 @bp.route('/api/memory/context', methods=['GET'])
 def memory_context():
-    """Récupère le contexte de conversation actuel."""
+    """Récupère le contexte de conversation du client (session par défaut sinon)."""
     from .conversation_memory import get_conversation_memory
+    try:
+        session_id, _ = _client_session(request.get_json(silent=True) or {}, create=False)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     memory = get_conversation_memory()
-    context = memory.get_context()
+    context = memory.get_context(session_id)
     return jsonify(context)
 
 @bp.route('/api/analyze_code', methods=['POST'])
@@ -288,6 +370,11 @@ def generate_project():
             project_type = generator.detect_project_type(message)
         
         generator = get_multi_file_generator()
+        
+        # Mode streaming (SSE) : chaque fichier est envoyé dès qu'il est généré
+        if _wants_stream(data):
+            return _sse_response(generator.iter_project(project_type))
+        
         project = generator.generate_project(project_type)
         
         return jsonify(project)
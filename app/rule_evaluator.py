@@ -0,0 +1,150 @@
+"""
+Évaluation ordonnée des règles avec arrêt au plafond de score
+Partagée par les moteurs V1 et V2
+"""
+
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# (position de la règle, règle, score)
+Candidate = Tuple[int, Any, float]
+
+
+class RuleEvaluator:
+    """
+    Évalue les règles par priorité, score maximal déclaré (`max_score`) puis
+    coût observé, et saute toute règle qui ne peut plus battre le meilleur
+    candidat courant.
+
+    Le résultat est identique à une évaluation exhaustive dans l'ordre des
+    règles : meilleur score, et à score égal la règle de plus petite position.
+    Le coût observé est une moyenne mobile du temps de la condition, mesurée
+    une évaluation sur `sample_every` ; tant qu'une règle n'a pas été mesurée,
+    son `expected_cost` déclaré est utilisé. L'ordre calculé est mis en cache
+    jusqu'à la mesure suivante.
+    """
+
+    def __init__(self, smoothing: float = 0.2, sample_every: int = 16):
+        self.smoothing = smoothing
+        self.sample_every = sample_every
+        self.costs: Dict[str, float] = {}
+        self.evaluated: Dict[str, int] = defaultdict(int)
+        self.skipped: Dict[str, int] = defaultdict(int)
+        self.calls = 0
+        self.orders: Dict[tuple, List[Tuple[int, Any]]] = {}
+        self.lock = Lock()
+
+    def observed_cost(self, rule) -> float:
+        """Coût moyen observé de la condition (secondes)."""
+        return self.costs.get(rule.name, rule.expected_cost)
+
+    def order(self, rules: Iterable[Tuple[int, Any]]) -> List[Tuple[int, Any]]:
+        """Trie les (position, règle) : priorité, plafond de score, coût observé."""
+        rules = list(rules)
+        signature = tuple((position, id(rule)) for position, rule in rules)
+        ordered = self.orders.get(signature)
+        if ordered is None:
+            ordered = sorted(rules, key=lambda pr: (
+                -pr[1].priority, -pr[1].max_score, self.observed_cost(pr[1]), pr[0]
+            ))
+            self.orders[signature] = ordered
+        return ordered
+
+    @staticmethod
+    def can_beat(rule, position: int, best: Optional[Candidate],
+                 threshold: float = 0.0, inclusive: bool = False) -> bool:
+        """Vrai si la règle peut encore devenir le meilleur candidat."""
+        ceiling = rule.max_score
+        if best is None:
+            return ceiling > threshold or (inclusive and ceiling == threshold)
+        return ceiling > best[2] or (ceiling == best[2] and position < best[0])
+
+    def evaluate(self, rules: Iterable[Tuple[int, Any]], score: Callable[[Any], Optional[float]],
+                 threshold: float = 0.0, inclusive: bool = False,
+                 best: Optional[Candidate] = None,
+                 exhaustive: bool = False) -> Tuple[List[Candidate], Optional[Candidate]]:
+        """
+        Évalue les conditions des règles.
+
+        Args:
+            rules: (position, règle) ; la position départage les scores égaux
+            score: Calcule le score d'une règle (None = règle ignorée)
+            threshold: Score minimal d'un candidat
+            inclusive: Candidat si score >= threshold (sinon score > threshold)
+            best: Meilleur candidat déjà connu (évaluation en plusieurs passes)
+            exhaustive: Évalue toutes les règles (pas d'arrêt au plafond)
+
+        Returns:
+            (candidats évalués triés par score décroissant puis position,
+             meilleur candidat ou None)
+        """
+        self.calls += 1
+        sample = self.calls % self.sample_every == 0
+        candidates: List[Candidate] = []
+        evaluated: List[str] = []
+        skipped: List[str] = []
+        timings: List[Tuple[str, float]] = []
+
+        try:
+            for position, rule in self.order(rules):
+                if not exhaustive and not self.can_beat(rule, position, best, threshold, inclusive):
+                    skipped.append(rule.name)
+                    continue
+
+                evaluated.append(rule.name)
+                if sample:
+                    start = time.perf_counter()
+                    try:
+                        value = score(rule)
+                    finally:
+                        timings.append((rule.name, time.perf_counter() - start))
+                else:
+                    value = score(rule)
+
+                if value is None:
+                    continue
+                if value > threshold or (inclusive and value == threshold):
+                    candidate = (position, rule, value)
+                    candidates.append(candidate)
+                    if best is None or value > best[2] or (value == best[2] and position < best[0]):
+                        best = candidate
+        finally:
+            self._record(evaluated, skipped, timings)
+
+        candidates.sort(key=lambda c: (-c[2], c[0]))
+        return candidates, best
+
+    def _record(self, evaluated: List[str], skipped: List[str], timings: List[Tuple[str, float]]):
+        with self.lock:
+            for name in evaluated:
+                self.evaluated[name] += 1
+            for name in skipped:
+                self.skipped[name] += 1
+            if timings:
+                for name, duration in timings:
+                    previous = self.costs.get(name)
+                    self.costs[name] = duration if previous is None else \
+                        previous + self.smoothing * (duration - previous)
+                # Les coûts ont changé : l'ordre sera recalculé
+                self.orders = {}
+
+    def get_stats(self) -> Dict:
+        """Compteurs évaluées/sautées et coût moyen par règle."""
+        with self.lock:
+            names = sorted(set(self.evaluated) | set(self.skipped))
+            return {
+                name: {
+                    'evaluated': self.evaluated.get(name, 0),
+                    'skipped': self.skipped.get(name, 0),
+                    'avg_cost_ms': round(self.costs.get(name, 0.0) * 1000, 4)
+                }
+                for name in names
+            }
+
+    def reset(self):
+        """Réinitialise les compteurs (les coûts observés sont conservés)."""
+        with self.lock:
+            self.evaluated.clear()
+            self.skipped.clear()
@@ -95,7 +95,7 @@ class InputValidator:
             return False, "Session ID trop long"
         
         # Alphanumeric + underscore/hyphen seulement
-        if not re.match(r'^[a-zA-Z0-9_-]+$', session_id):
+        if not re.fullmatch(r'[a-zA-Z0-9_-]+', session_id):
             return False, "Session ID contient des caractères invalides"
         
         return True, None
@@ -288,7 +288,7 @@ def rate_limit(max_requests: int = None, window: int = None):
                 response_obj, status_code = response
             else:
                 response_obj = response
-                status_code = 200
+                status_code = getattr(response, 'status_code', 200)
             
             # Ajouter headers si c'est une response Flask
             if hasattr(response_obj, 'headers'):
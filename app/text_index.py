@@ -0,0 +1,564 @@
+"""
+Index inversé pour la recherche par similarité de Jaccard
+Évite de rescanner tous les patterns de CODE_TEMPLATES et de la
+KNOWLEDGE_BASE à chaque requête
+"""
+
+import heapq
+import math
+import random
+import re
+import threading
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .code_templates import CODE_TEMPLATES
+from .knowledge_base import KNOWLEDGE_BASE
+
+
+def tokenize(text: str) -> frozenset:
+    """Tokenisation identique à `_similarity` (minuscules + split)."""
+    return frozenset(text.lower().split())
+
+
+WORD_RE = re.compile(r'\w+')
+
+def words(text: str) -> List[str]:
+    """Mots (\\w+) en minuscules, comme NLPAnalyzer.calculate_similarity."""
+    return WORD_RE.findall(text.lower())
+
+
+class JaccardIndex:
+    """
+    Index token → postings avec tailles de patterns précalculées.
+
+    Chaque posting est trié par (taille du pattern, id) ce qui permet de
+    filtrer par longueur avec bisect : un pattern de taille p ne peut pas
+    dépasser min(q, p) / max(q, p) pour une requête de q tokens.
+    Les tokens de la requête sont parcourus du plus rare au plus fréquent
+    et la recherche s'arrête dès qu'aucune entrée non vue ne peut battre
+    le k-ième meilleur score (prefix filtering).
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.entries: List[Optional[Tuple[Hashable, frozenset]]] = []
+        self.key_entries: Dict[Hashable, List[int]] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.key_entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.key_entries
+
+    def add(self, key: Hashable, patterns: Iterable[str]):
+        """Indexe (ou réindexe) les patterns d'une clé."""
+        with self.lock:
+            self._remove_unlocked(key)
+            ids = []
+            for pattern in patterns:
+                tokens = tokenize(pattern)
+                if not tokens:
+                    continue
+                entry_id = len(self.entries)
+                self.entries.append((key, tokens))
+                size = len(tokens)
+                for token in tokens:
+                    insort(self.postings.setdefault(token, []), (size, entry_id))
+                ids.append(entry_id)
+            self.key_entries[key] = ids
+
+    def remove(self, key: Hashable):
+        """Retire une clé de l'index."""
+        with self.lock:
+            self._remove_unlocked(key)
+
+    def _remove_unlocked(self, key: Hashable):
+        for entry_id in self.key_entries.pop(key, []):
+            _, tokens = self.entries[entry_id]
+            size = len(tokens)
+            for token in tokens:
+                posting = self.postings.get(token)
+                if posting:
+                    posting.remove((size, entry_id))
+                    if not posting:
+                        del self.postings[token]
+            self.entries[entry_id] = None
+
+    def refresh(self, mapping: Dict[str, Dict]):
+        """Indexe les clés du dictionnaire absentes de l'index (ajouts externes)."""
+        if len(mapping) == len(self.key_entries):
+            return
+        for key, item in list(mapping.items()):
+            if key not in self.key_entries:
+                self.add(key, item.get('patterns', []))
+
+    def search(self, text: str, threshold: float = 0.0, top_k: int = 1,
+               strict: bool = True) -> List[Tuple[float, Hashable]]:
+        """
+        Retourne les top-k clés les plus similaires à `text`.
+
+        Args:
+            text: Texte de la requête
+            threshold: Score minimal
+            top_k: Nombre de clés retournées
+            strict: Score > threshold (sinon >=)
+
+        Returns:
+            Liste de (score, clé) triée par score décroissant ; à score égal
+            l'ordre d'insertion est conservé, comme pour un scan linéaire.
+        """
+        query = tokenize(text)
+        q = len(query)
+        if not q or top_k <= 0:
+            return []
+
+        with self.lock:
+            tokens = sorted(
+                (t for t in query if t in self.postings),
+                key=lambda t: len(self.postings[t])
+            )
+            best: Dict[Hashable, Tuple[float, int]] = {}
+            seen = set()
+            kth = 0.0
+
+            for i, token in enumerate(tokens):
+                # Une entrée pas encore vue partage au plus len(tokens) - i tokens
+                bound = (len(tokens) - i) / q
+                if bound < threshold or (strict and bound <= threshold):
+                    break
+                if len(best) >= top_k and bound < kth:
+                    break
+
+                floor = max(threshold, kth if len(best) >= top_k else 0.0)
+                posting = self.postings[token]
+                lo, hi = 0, len(posting)
+                if floor > 0:
+                    min_size = math.ceil(floor * q - 1e-9)
+                    max_size = math.floor(q / floor + 1e-9)
+                    lo = bisect_left(posting, (min_size, -1))
+                    hi = bisect_right(posting, (max_size, len(self.entries)))
+
+                for size, entry_id in posting[lo:hi]:
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    key, entry_tokens = self.entries[entry_id]
+                    inter = len(query & entry_tokens)
+                    score = inter / (q + size - inter)
+                    if score < threshold or (strict and score <= threshold):
+                        continue
+                    current = best.get(key)
+                    if current is None or score > current[0] or (score == current[0] and entry_id < current[1]):
+                        best[key] = (score, entry_id)
+
+                if len(best) >= top_k:
+                    kth = sorted((s for s, _ in best.values()), reverse=True)[top_k - 1]
+
+        ranked = sorted(best.items(), key=lambda kv: (-kv[1][0], kv[1][1]))
+        return [(score, key) for key, (score, _) in ranked[:top_k]]
+
+    def best(self, text: str, threshold: float = 0.0) -> Tuple[float, Optional[Hashable]]:
+        """Meilleure clé (score > threshold) ou (0.0, None)."""
+        hits = self.search(text, threshold=threshold, top_k=1)
+        return hits[0] if hits else (0.0, None)
+
+    def stats(self) -> Dict:
+        """Statistiques de l'index."""
+        with self.lock:
+            return {
+                'keys': len(self.key_entries),
+                'patterns': sum(len(ids) for ids in self.key_entries.values()),
+                'tokens': len(self.postings),
+                'max_posting': max((len(p) for p in self.postings.values()), default=0)
+            }
+
+
+class MinHashLSH:
+    """
+    Signatures MinHash + LSH par bandes pour la recherche approximative.
+
+    Deux ensembles de similarité de Jaccard s ont une probabilité
+    1 - (1 - s^r)^b de partager au moins une bande (b bandes de r lignes) :
+    avec 32 permutations en 8 bandes de 4, ~0.9 pour s = 0.8 et ~0.03 pour
+    s = 0.3. Les hashes (crc32 + permutations à graine fixe) sont stables
+    d'un processus à l'autre.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 32, bands: int = 8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, self.PRIME), rng.randrange(0, self.PRIME)) for _ in range(num_perm)]
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = {}
+        self.signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        """Signature MinHash d'un ensemble de tokens (tuple vide si aucun token)."""
+        hashes = [zlib.crc32(token.encode('utf-8')) for token in set(tokens)]
+        if not hashes:
+            return ()
+        prime = self.PRIME
+        return tuple(min((a * h + b) % prime for h in hashes) for a, b in self.params)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        """Indexe (ou réindexe) la signature d'une clé."""
+        if not signature:
+            return
+        with self.lock:
+            self._remove_unlocked(key)
+            self.signatures[key] = signature
+            for band_key in self._band_keys(signature):
+                self.buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        """Retire une clé de l'index."""
+        with self.lock:
+            self._remove_unlocked(key)
+
+    def _remove_unlocked(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        """Clés partageant au moins une bande avec la signature."""
+        if not signature:
+            return set()
+        found: Set[Hashable] = set()
+        with self.lock:
+            for band_key in self._band_keys(signature):
+                bucket = self.buckets.get(band_key)
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.signatures.clear()
+
+    @staticmethod
+    def estimate(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Similarité de Jaccard estimée (proportion de minimums égaux)."""
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class BM25Index:
+    """
+    Index inversé incrémental de documents (messages) avec classement BM25.
+
+    - postings : token → groupe (session) → {clé: tf}, pour l'accès direct ;
+      une recherche limitée à un groupe ne parcourt que ses postings
+    - impacts : token → groupe → tf → [(longueur, ordre, clé)] triés ; à tf
+      fixé le score BM25 décroît avec la longueur, la fusion de ces listes
+      parcourt donc un token par score décroissant
+
+    Le top-k BM25 utilise l'algorithme à seuil (Fagin) : accès trié sur le
+    token de plus forte borne, score complet des documents vus, arrêt dès
+    que le k-ième score atteint la somme des bornes des tokens.
+    La latence dépend de k et de la distribution des scores, pas du nombre
+    de documents. Chaque ajout ou retrait incrémente la version globale et
+    celle du groupe (invalidation exacte des résultats mis en cache).
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, Dict[Hashable, int]]] = {}
+        self.impacts: Dict[str, Dict[Hashable, Dict[int, List[Tuple[int, int, Hashable]]]]] = {}
+        self.df: Counter = Counter()
+        # clé → (groupe, longueur, nb de mots distincts, ordre d'insertion, payload)
+        self.docs: Dict[Hashable, Tuple[Hashable, int, int, int, Any]] = {}
+        self.doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self.groups: Dict[Hashable, Set[Hashable]] = {}
+        self.total_length = 0
+        self.seq = 0
+        self.version = 0
+        self.group_versions: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.docs
+
+    def group_version(self, group: Optional[Hashable] = None) -> int:
+        """Version de l'index (ou d'un groupe) : change à chaque modification."""
+        return self.version if group is None else self.group_versions[group]
+
+    def add(self, key: Hashable, text: str, group: Hashable = None, payload: Any = None):
+        """Indexe (ou réindexe) un document."""
+        tokens = words(text)
+        counts = Counter(tokens)
+        length = len(tokens)
+        with self.lock:
+            self._remove_unlocked(key)
+            self.seq += 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, {}).setdefault(group, {})[key] = tf
+                buckets = self.impacts.setdefault(token, {}).setdefault(group, {})
+                insort(buckets.setdefault(tf, []), (length, self.seq, key))
+                self.df[token] += 1
+            self.docs[key] = (group, length, len(counts), self.seq, payload)
+            self.doc_terms[key] = tuple(counts)
+            self.groups.setdefault(group, set()).add(key)
+            self.total_length += length
+            self._touch(group)
+
+    def remove(self, key: Hashable):
+        """Retire un document de l'index."""
+        with self.lock:
+            self._remove_unlocked(key)
+
+    def remove_group(self, group: Hashable):
+        """Retire tous les documents d'un groupe."""
+        with self.lock:
+            for key in list(self.groups.get(group, ())):
+                self._remove_unlocked(key)
+            self.groups.pop(group, None)
+
+    def clear(self):
+        with self.lock:
+            # Les versions ne reculent jamais (sinon un cache périmé redeviendrait valide)
+            for group in self.groups:
+                self._touch(group)
+            self.version += 1
+            self.postings.clear()
+            self.impacts.clear()
+            self.df.clear()
+            self.docs.clear()
+            self.doc_terms.clear()
+            self.groups.clear()
+            self.total_length = 0
+
+    def _touch(self, group: Hashable):
+        self.version += 1
+        self.group_versions[group] += 1
+
+    def _remove_unlocked(self, key: Hashable):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        group, length, _, seq, _ = doc
+        for token in self.doc_terms.pop(key):
+            by_group = self.postings[token]
+            posting = by_group[group]
+            tf = posting.pop(key)
+            if not posting:
+                del by_group[group]
+                if not by_group:
+                    del self.postings[token]
+
+            buckets = self.impacts[token][group]
+            entries = buckets[tf]
+            del entries[bisect_left(entries, (length, seq))]
+            if not entries:
+                del buckets[tf]
+                if not buckets:
+                    del self.impacts[token][group]
+                    if not self.impacts[token]:
+                        del self.impacts[token]
+
+            self.df[token] -= 1
+            if not self.df[token]:
+                del self.df[token]
+        members = self.groups.get(group)
+        if members is not None:
+            members.discard(key)
+        self.total_length -= length
+        self._touch(group)
+
+    def _postings(self, token: str, group: Optional[Hashable]) -> Iterable[Tuple[Hashable, int]]:
+        by_group = self.postings.get(token)
+        if not by_group:
+            return ()
+        if group is not None:
+            return by_group.get(group, {}).items()
+        return (item for posting in by_group.values() for item in posting.items())
+
+    @staticmethod
+    def _bucket_stream(entries, weight: float, base: float, slope: float):
+        # Score BM25 du token pour chaque document d'un seau (tf fixé)
+        for length, seq, key in entries:
+            yield weight / (base + slope * length), seq, key
+
+    def _sorted_access(self, token: str, idf: float, group: Optional[Hashable], avgdl: float):
+        """Documents contenant `token`, par score (du token) décroissant."""
+        k1, b = self.k1, self.b
+        by_group = self.impacts.get(token, {})
+        scopes = [by_group.get(group, {})] if group is not None else by_group.values()
+        streams = [
+            self._bucket_stream(entries, idf * tf * (k1 + 1), tf + k1 * (1 - b), k1 * b / avgdl)
+            for buckets in scopes for tf, entries in buckets.items()
+        ]
+        return heapq.merge(*streams, key=lambda e: (-e[0], e[1]))
+
+    def _top(self, scores: Dict[Hashable, float], top_k: int) -> List[Tuple[float, Any]]:
+        # Tas de taille k ; à score égal l'ordre d'insertion est conservé
+        docs = self.docs
+        best = heapq.nsmallest(top_k, scores.items(), key=lambda kv: (-kv[1], docs[kv[0]][3]))
+        return [(score, docs[key][4]) for key, score in best]
+
+    def search(self, query: str, top_k: int = 10, group: Optional[Hashable] = None) -> List[Tuple[float, Any]]:
+        """
+        Top-k BM25 des documents contenant au moins un mot de la requête.
+
+        Returns:
+            Liste de (score, payload) triée par score décroissant (à score
+            égal, ordre d'insertion)
+        """
+        terms = set(words(query))
+        if not terms or top_k <= 0:
+            return []
+
+        with self.lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self.total_length / n or 1.0
+            k1, b = self.k1, self.b
+            docs, postings = self.docs, self.postings
+
+            idfs = {}
+            for term in terms:
+                df = self.df.get(term)
+                if df:
+                    idfs[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+            def score(key):
+                doc_group, length = docs[key][0], docs[key][1]
+                norm = k1 * (1 - b + b * length / avgdl)
+                total = 0.0
+                for term, idf in idfs.items():
+                    tf = postings[term].get(doc_group, {}).get(key)
+                    if tf:
+                        total += idf * tf * (k1 + 1) / (tf + norm)
+                return total
+
+            streams = [self._sorted_access(term, idf, group, avgdl) for term, idf in idfs.items()]
+            # bounds[i] : score du prochain document du flux i (borne des non vus)
+            bounds = [0.0] * len(streams)
+            heads = []  # tas max (-borne, flux, entrée)
+            for i, stream in enumerate(streams):
+                entry = next(stream, None)
+                if entry is not None:
+                    bounds[i] = entry[0]
+                    heads.append((-entry[0], i, entry))
+            heapq.heapify(heads)
+            top: List[Tuple[float, int, Hashable]] = []  # tas min de (score, -ordre, clé)
+            seen = set()
+
+            while heads:
+                # Aucun document non vu ne peut dépasser la somme des bornes
+                if len(top) >= top_k and top[0][0] >= sum(bounds):
+                    break
+
+                # Avancer le flux de plus forte borne (la somme baisse au plus vite)
+                _, i, entry = heapq.heappop(heads)
+                key = entry[2]
+                if key not in seen:
+                    seen.add(key)
+                    item = (score(key), -docs[key][3], key)
+                    if len(top) < top_k:
+                        heapq.heappush(top, item)
+                    elif item[:2] > top[0][:2]:
+                        heapq.heapreplace(top, item)
+
+                entry = next(streams[i], None)
+                bounds[i] = entry[0] if entry is not None else 0.0
+                if entry is not None:
+                    heapq.heappush(heads, (-entry[0], i, entry))
+
+            ranked = sorted(top, key=lambda item: item[:2], reverse=True)
+            return [(s, docs[key][4]) for s, _, key in ranked]
+
+    def jaccard(self, query: str, top_k: int = 10, threshold: float = 0.0,
+                group: Optional[Hashable] = None) -> List[Tuple[float, Any]]:
+        """
+        Top-k par similarité de Jaccard des ensembles de mots (résultats
+        identiques à NLPAnalyzer.calculate_similarity), score > threshold.
+        """
+        terms = set(words(query))
+        if not terms or top_k <= 0:
+            return []
+
+        with self.lock:
+            shared: Counter = Counter()
+            for term in terms:
+                for key, _ in self._postings(term, group):
+                    shared[key] += 1
+
+            q = len(terms)
+            docs = self.docs
+            scores = {}
+            for key, inter in shared.items():
+                score = inter / (q + docs[key][2] - inter)
+                if score > threshold:
+                    scores[key] = score
+
+            return self._top(scores, top_k)
+
+    def stats(self) -> Dict:
+        """Statistiques de l'index."""
+        with self.lock:
+            return {
+                'documents': len(self.docs),
+                'groups': len(self.groups),
+                'tokens': len(self.postings),
+                'avg_length': round(self.total_length / len(self.docs), 1) if self.docs else 0.0,
+                'version': self.version
+            }
+
+
+def build_index(mapping: Dict[str, Dict]) -> JaccardIndex:
+    """Construit un index à partir d'un dict {clé: {'patterns': [...]}}."""
+    index = JaccardIndex()
+    for key, item in mapping.items():
+        index.add(key, item.get('patterns', []))
+    return index
+
+
+# Instance globale (construite une seule fois au chargement)
+template_index = build_index(CODE_TEMPLATES)
+
+def get_template_index() -> JaccardIndex:
+    """Récupère l'index des CODE_TEMPLATES, synchronisé avec les ajouts dynamiques."""
+    template_index.refresh(CODE_TEMPLATES)
+    return template_index
+
+
+# Index de la base de connaissances (clé = position dans KNOWLEDGE_BASE)
+knowledge_index = JaccardIndex()
+
+def get_knowledge_index() -> JaccardIndex:
+    """Récupère l'index de KNOWLEDGE_BASE, en indexant les entrées ajoutées depuis."""
+    for position in range(len(knowledge_index), len(KNOWLEDGE_BASE)):
+        knowledge_index.add(position, KNOWLEDGE_BASE[position].get('patterns', []))
+    return knowledge_index
+
+get_knowledge_index()
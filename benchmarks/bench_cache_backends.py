@@ -0,0 +1,82 @@
+"""
+Benchmark : cache de réponses partagé entre N workers (processus)
+Compare le backend mémoire (un cache par processus) aux backends partagés
+mmap et SQLite : débit get/set cumulé et taux de hit global.
+Chaque worker tire ses requêtes dans un même espace de messages (qui tient
+dans le cache) : get, puis set de la réponse en cas de MISS.
+Usage : python benchmarks/bench_cache_backends.py [requêtes_par_worker]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.cache_backends import create_cache_backend
+
+KEY_SPACE = 800
+MAXSIZE = 1000
+
+
+def response_for(key):
+    """Réponse de taille réaliste (comme analyse_texte)."""
+    return {
+        'status': 'ok',
+        'response': f"Réponse pour {key} " * 20,
+        'meta': {'rule': 'question', 'score': 0.8, 'engine': 'V1'}
+    }
+
+
+def worker(cache_type, cache_dir, seed, requests, results):
+    cache = create_cache_backend('bench', MAXSIZE, 3600, cache_type=cache_type, cache_dir=cache_dir)
+    rng = random.Random(seed)
+    keys = [f"message-{rng.randrange(KEY_SPACE)}" for _ in range(requests)]
+    hits = 0
+
+    start = time.perf_counter()
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, response_for(key))
+    results.put((hits, requests, time.perf_counter() - start))
+
+
+def run(cache_type, workers, requests):
+    cache_dir = tempfile.mkdtemp(prefix="namz_cache_")
+    results = multiprocessing.Queue()
+    try:
+        procs = [
+            multiprocessing.Process(target=worker, args=(cache_type, cache_dir, n, requests, results))
+            for n in range(workers)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        stats = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    hits = sum(s[0] for s in stats)
+    total = sum(s[1] for s in stats)
+    return total / elapsed, hits / total * 100
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"{KEY_SPACE} messages distincts, cache {MAXSIZE} entrées, {requests} requêtes/worker")
+    for workers in (1, 4, 8):
+        line = [f"{workers:>2} workers"]
+        for cache_type in ('memory', 'mmap', 'sqlite'):
+            rps, hit_rate = run(cache_type, workers, requests)
+            line.append(f"{cache_type} {rps:9.0f} op/s hit {hit_rate:5.1f}%")
+        print(" | ".join(line))
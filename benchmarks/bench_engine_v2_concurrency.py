@@ -0,0 +1,98 @@
+"""
+Benchmark : débit du moteur V2 avec N clients concurrents
+Compare l'ancienne évaluation (chaque condition soumise au thread pool)
+à l'évaluation inline des règles "cheap".
+Usage : python benchmarks/bench_engine_v2_concurrency.py [requêtes_par_client]
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.ia_engine_v2 import EngineConfig, NamzIAEngineV2
+
+MESSAGES = [
+    "bonjour",
+    "hello",
+    "merci beaucoup",
+    "raconte une blague",
+    "aide",
+    "pourquoi le ciel est bleu ?",
+    "erreur python dans ma boucle",
+    "crée une fonction python qui trie une liste",
+]
+
+
+class LegacyEngineV2(NamzIAEngineV2):
+    """Ancienne évaluation : un submit + result() par condition."""
+
+    def _evaluate_rules(self, message, features, lang):
+        candidates = []
+        for rule in self.rules:
+            if not rule.enabled:
+                continue
+            try:
+                score = self._execute_with_timeout(
+                    rule.condition, args=rule.args(message, features, lang), timeout=rule.timeout
+                )
+                if score >= self.config.min_confidence_score:
+                    candidates.append((rule, score))
+            except Exception:
+                continue
+        candidates.sort(key=lambda x: x[1], reverse=True)
+        return candidates
+
+
+def run(engine, clients, per_client):
+    """Lance `clients` threads qui appellent _analyse_internal (sans cache)."""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(offset):
+        local = []
+        barrier.wait()
+        for i in range(per_client):
+            message = MESSAGES[(offset + i) % len(MESSAGES)]
+            start = time.perf_counter()
+            engine._analyse_internal(message)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return len(latencies) / elapsed, p99
+
+
+if __name__ == "__main__":
+    per_client = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    config = EngineConfig(cache_enabled=False, auto_learn_enabled=False)
+    legacy = LegacyEngineV2(config)
+    inline = NamzIAEngineV2(config)
+
+    for message in MESSAGES:
+        assert legacy._analyse_internal(message).response == inline._analyse_internal(message).response
+
+    print(f"Moteur V2 : {len(inline.rules)} règles, {config.max_workers} workers, {per_client} requêtes/client")
+    for clients in (1, 8, 32):
+        old_rps, old_p99 = run(legacy, clients, per_client)
+        new_rps, new_p99 = run(inline, clients, per_client)
+        print(f"{clients:>3} clients | pool/condition {old_rps:8.0f} req/s p99 {old_p99 * 1000:7.2f} ms | "
+              f"inline {new_rps:8.0f} req/s p99 {new_p99 * 1000:7.2f} ms | x{new_rps / old_rps:5.1f}")
+
+    legacy.executor.shutdown()
+    inline.executor.shutdown()
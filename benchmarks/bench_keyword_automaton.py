@@ -0,0 +1,61 @@
+"""
+Benchmark : automate de mots-clés (une passe) vs chaînes `any(kw in msg)` par table
+Usage : python benchmarks/bench_keyword_automaton.py [nb_rounds]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import app.message_features  # noqa: F401  (enregistre les tables)
+import app.conversation_memory  # noqa: F401
+from app.proactive_suggester import get_proactive_suggester
+from app.keyword_automaton import get_keyword_automaton
+
+MESSAGES = [
+    "bonjour",
+    "crée une fonction python qui calcule la factorielle",
+    "améliore notre site ecommerce avec un panier et un design responsive",
+    "optimise ce code javascript pour qu'il soit plus rapide",
+    "crée une api rest flask avec authentification jwt sans base de données",
+    "dashboard admin avancé avec graphiques, filtres et export csv",
+    "pourquoi mon programme java plante avec une NullPointerException ?",
+    "écris un script bash qui sauvegarde les fichiers du serveur chaque nuit "
+    "puis les compresse et les envoie sur un stockage distant avec rotation",
+]
+
+
+def substring_scan(tables, lower):
+    """Ancien fonctionnement : une boucle de sous-chaînes par table."""
+    return {category for category, keywords in tables.items() if any(kw in lower for kw in keywords)}
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    get_proactive_suggester()
+    automaton = get_keyword_automaton()
+    automaton.compile()
+    tables = dict(automaton.tables)
+    keywords = sum(len(t) for t in tables.values())
+    print(f"{len(tables)} tables / {keywords} mots-clés / {len(automaton.goto)} états")
+
+    for message in MESSAGES:
+        lower = message.lower()
+        assert substring_scan(tables, lower) == set(automaton.scan(lower).categories), message
+
+    for message in MESSAGES:
+        lower = message.lower()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            substring_scan(tables, lower)
+        old = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            automaton.scan(lower)
+        new = (time.perf_counter() - start) / rounds
+
+        print(f"{len(lower):>4} car. | any() {old * 1e6:8.1f} µs | automate {new * 1e6:7.1f} µs | x{old / new:5.1f}")
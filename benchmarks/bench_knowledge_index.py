@@ -0,0 +1,91 @@
+"""
+Benchmark : index KNOWLEDGE_BASE vs scan linéaire (latences p50/p99)
+Usage : python benchmarks/bench_knowledge_index.py
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.knowledge_base import KNOWLEDGE_BASE
+from app.text_index import JaccardIndex
+
+QUERIES = [
+    "boucle for en python",
+    "python error",
+    "comment faire une fonction python",
+    "erreur javascript undefined",
+    "pointeur en c",
+    "requête linq c#",
+    "classe python avec héritage",
+    "bug dans ma boucle while",
+    "function javascript async await",
+    "variable globale python",
+    "flask route post json",
+    "asp.net razor page",
+]
+
+
+def linear_best(items, message):
+    """Ancien algorithme de _answer_from_knowledge_base."""
+    sa = set(message.lower().split())
+    best_score, best_position = 0.0, None
+    for position, item in enumerate(items):
+        for pattern in item.get("patterns", []):
+            sb = set(pattern.lower().split())
+            if not sa or not sb:
+                continue
+            score = len(sa & sb) / len(sa | sb)
+            if score > best_score:
+                best_score, best_position = score, position
+    return best_score, best_position
+
+
+def grow(count, seed=7):
+    """Agrandit la base avec des entrées au vocabulaire réaliste."""
+    rng = random.Random(seed)
+    vocab = sorted({w for item in KNOWLEDGE_BASE for p in item["patterns"] for w in p.lower().split()})
+    vocab += [f"terme{i}" for i in range(5000)]
+    items = list(KNOWLEDGE_BASE)
+    for _ in range(count):
+        patterns = [' '.join(rng.sample(vocab, rng.randint(2, 7))) for _ in range(rng.randint(2, 5))]
+        items.append({"patterns": patterns, "answer": ""})
+    return items
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def bench(items, rounds):
+    index = JaccardIndex()
+    for position, item in enumerate(items):
+        index.add(position, item["patterns"])
+
+    linear, indexed = [], []
+    for _ in range(rounds):
+        for message in QUERIES:
+            start = time.perf_counter()
+            expected = linear_best(items, message)
+            linear.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            got = index.best(message)
+            indexed.append(time.perf_counter() - start)
+            assert expected[1] == got[1], (message, expected, got)
+
+    l50, l99 = percentiles(linear)
+    i50, i99 = percentiles(indexed)
+    print(f"{len(items):>7} entrées | linéaire p50 {l50 * 1e6:9.1f} µs p99 {l99 * 1e6:9.1f} µs | "
+          f"index p50 {i50 * 1e6:7.1f} µs p99 {i99 * 1e6:7.1f} µs")
+
+
+if __name__ == "__main__":
+    print("Index KNOWLEDGE_BASE (meilleure réponse, résultats vérifiés identiques)")
+    bench(list(KNOWLEDGE_BASE), rounds=50)
+    for count in (1000, 10000, 50000):
+        bench(grow(count), rounds=5 if count > 1000 else 20)
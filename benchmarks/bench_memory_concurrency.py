@@ -0,0 +1,126 @@
+"""
+Benchmark : ConversationMemory sous charge concurrente (nombreuses sessions)
+Des threads écrivains ajoutent des messages chacun dans leurs sessions pendant
+que des threads lecteurs lisent messages récents (get_messages_since) et
+analytics de sessions quelconques. Compare l'ancien verrou global (reproduit :
+lock_stripes=1 et lecteurs sous ce même verrou) aux verrous par session avec
+lectures sur instantanés, sessions toutes résidentes puis paginées (budget
+mémoire réduit : les lectures hydratent depuis le disque).
+- débit : opérations/s, écritures et lectures cumulées
+- latence des lectures pendant les écritures : p50 / p99 (µs)
+Usage : python benchmarks/bench_memory_concurrency.py [secondes] [sessions]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import ConversationMemory
+
+THREADS = ((4, 4), (8, 8), (16, 16))
+STRIPES = (1, 64)
+SCENARIOS = (("résidentes", 2.0), ("paginées (budget : moitié de l'historique)", 0.5))
+
+
+def build_history(sessions):
+    """Écrit 20 messages par session (répertoire courant = répertoire temporaire)."""
+    memory = ConversationMemory(auto_save=False, enable_nlp=False)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    for i in range(sessions * 20):
+        memory.add_message('user', f"crée une fonction python numéro {i}", session_id=f"s{i % sessions}")
+    memory._save_memory(force=True)
+
+
+def make_memory(stripes, resident_share):
+    """Mémoire sans persistance ni NLP rechargée depuis l'historique ; budget = part de l'historique."""
+    memory = ConversationMemory(auto_save=False, enable_nlp=False, lock_stripes=stripes)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    for sid in list(memory.sessions):
+        memory.sessions.ensure(sid)
+    memory.memory_budget = int(memory.sessions.resident_bytes * resident_share)
+    memory._enforce_memory_budget()
+    return memory
+
+
+def run(memory, writers, readers, sessions, duration, global_lock):
+    """Lance écrivains et lecteurs pendant `duration` s ; renvoie (ops/s, latences de lecture)."""
+    stop = threading.Event()
+    counts = [0] * (writers + readers)
+    latencies = [[] for _ in range(readers)]
+
+    def write(slot):
+        rng = random.Random(slot)
+        own = [f"s{i}" for i in range(slot, sessions, writers)]
+        n = 0
+        while not stop.is_set():
+            memory.add_message('user', f"message concurrent {n}", session_id=rng.choice(own))
+            n += 1
+        counts[slot] = n
+
+    def read(slot):
+        rng = random.Random(1000 + slot)
+        samples = latencies[slot]
+        n = 0
+        while not stop.is_set():
+            sid = f"s{rng.randrange(sessions)}"
+            start = time.perf_counter()
+            if global_lock:
+                with memory._session_lock(sid):
+                    memory.get_messages_since(time.time() - 60, session_id=sid, limit=10)
+                    memory._get_session_analytics(sid)
+            else:
+                memory.get_messages_since(time.time() - 60, session_id=sid, limit=10)
+                memory._get_session_analytics(sid)
+            samples.append(time.perf_counter() - start)
+            n += 1
+        counts[writers + slot] = n
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(s for per_thread in latencies for s in per_thread)
+    return sum(counts) / duration, samples
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1e6 if samples else 0.0
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    # Bascules de thread fréquentes : les sections critiques longues se voient
+    sys.setswitchinterval(0.0005)
+
+    workdir = tempfile.mkdtemp(prefix="namz_concurrency_")
+    os.chdir(workdir)
+    try:
+        build_history(sessions)
+        print(f"{sessions} sessions, {duration:.0f} s par mesure")
+        for scenario, resident_share in SCENARIOS:
+            print(f"sessions {scenario}")
+            for writers, readers in THREADS:
+                line = [f"  {writers:>2} écrivains + {readers:>2} lecteurs"]
+                for stripes in STRIPES:
+                    memory = make_memory(stripes, resident_share)
+                    ops, samples = run(memory, writers, readers, sessions, duration, global_lock=stripes == 1)
+                    label = "verrou global" if stripes == 1 else f"{stripes} verrous"
+                    line.append(f"{label}: {ops:8.0f} ops/s, lecture p50 {percentile(samples, 0.5):6.1f}"
+                                f" / p99 {percentile(samples, 0.99):7.1f} µs")
+                print(" | ".join(line))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,90 @@
+"""
+Benchmark : latence de ConversationMemory.search_messages selon le nombre de messages
+Compare l'ancien scan linéaire (minuscules + sous-chaîne, ou Jaccard par
+message en mode sémantique) à l'index inversé (BM25 / Jaccard sur postings).
+Cache de requêtes vidé avant chaque mesure.
+Usage : python benchmarks/bench_memory_search.py [requêtes]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import ConversationMemory, NLPAnalyzer
+
+SIZES = (1000, 10000, 50000)
+VOCAB = 5000
+QUERIES = ["fonction python", "erreur flask", "mot42 mot1337", "base de données"]
+
+# Fréquences des mots en loi de Zipf (rang r ∝ 1/r), comme un texte réel
+WORDS = "de la le python fonction erreur base données flask classe liste".split()
+WORDS += [f"mot{r}" for r in range(len(WORDS), VOCAB)]
+CUM_WEIGHTS = []
+for rank in range(1, VOCAB + 1):
+    CUM_WEIGHTS.append((CUM_WEIGHTS[-1] if CUM_WEIGHTS else 0.0) + 1.0 / rank)
+
+
+def make_memory(size):
+    """Mémoire sans persistance ni NLP, messages de 5 à 20 mots tirés selon Zipf."""
+    memory = ConversationMemory(auto_save=False, enable_nlp=False)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    rng = random.Random(size)
+    for i in range(size):
+        text = ' '.join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(5, 20)))
+        memory.add_message('user', text, session_id=f"s{i % 50}")
+    return memory
+
+
+def linear_scan(memory, query, semantic):
+    """Ancien search_messages (sans cache)."""
+    results = []
+    query_lower = query.lower()
+    for sid, messages in memory.sessions.items():
+        for msg in messages:
+            if semantic:
+                score = NLPAnalyzer.calculate_similarity(query, msg.content)
+                if score > 0.2:
+                    results.append((score, sid))
+            else:
+                content_lower = msg.content.lower()
+                if query_lower in content_lower:
+                    results.append((min(content_lower.count(query_lower) / 10, 1.0), sid))
+    results.sort(key=lambda x: x[0], reverse=True)
+    return results[:10]
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workdir = tempfile.mkdtemp(prefix="namz_search_")
+    os.chdir(workdir)
+    try:
+        print(f"latence moyenne (ms) sur {rounds} requêtes, top 10")
+        for size in SIZES:
+            memory = make_memory(size)
+            line = [f"{size:>6} messages"]
+            for semantic in (False, True):
+                label = 'sémantique' if semantic else 'mots-clés'
+                scan = timed(lambda q: linear_scan(memory, q, semantic), rounds)
+
+                def indexed(q):
+                    memory.query_cache.clear()
+                    return memory.search_messages(q, limit=10, semantic=semantic)
+
+                line.append(f"{label}: scan {scan:8.2f} / index {timed(indexed, rounds):7.2f}")
+            print(" | ".join(line))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,58 @@
+"""
+Benchmark : coût d'une sauvegarde de ConversationMemory après un message
+100 sessions pré-remplies ; compare la réécriture de toutes les sessions
+(ancien snapshot complet) à la réécriture du seul shard modifié.
+Usage : python benchmarks/bench_memory_shards.py [messages_par_session]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import ConversationMemory
+
+SESSIONS = 100
+ROUNDS = 10
+
+
+def make_memory(per_session):
+    """Mémoire neuve (répertoire courant = répertoire temporaire), shards écrits une fois."""
+    memory = ConversationMemory(auto_save=False)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    for s in range(SESSIONS):
+        for i in range(per_session):
+            memory.add_message('user', f"crée une fonction python numéro {i}", session_id=f"s{s}")
+    memory._save_memory(force=True)
+    return memory
+
+
+def save_after_message(memory, all_dirty):
+    """Temps moyen (ms) d'un add_message suivi d'une sauvegarde."""
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        memory.add_message('user', f"message mesuré {i}", session_id='s0')
+        if all_dirty:
+            memory.dirty_sessions.update(memory.sessions)
+        memory._save_memory(force=True)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    per_session = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    workdir = tempfile.mkdtemp(prefix="namz_shards_")
+    os.chdir(workdir)
+    try:
+        memory = make_memory(per_session)
+        full = save_after_message(memory, all_dirty=True)
+        sharded = save_after_message(memory, all_dirty=False)
+        print(f"{SESSIONS} sessions x {per_session} messages, {ROUNDS} sauvegardes")
+        print(f"toutes sessions réécrites {full:8.1f} ms | shard modifié seul {sharded:8.1f} ms"
+              f" | x{full / sharded:.0f}")
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,55 @@
+"""
+Benchmark : temps de démarrage de ConversationMemory selon la taille de l'historique
+Compare le chargement complet des shards (ancien démarrage : tous les messages
+désérialisés) au démarrage paresseux (contextes du manifeste seulement, messages
+hydratés au premier accès), puis mesure la première hydratation d'une session.
+Usage : python benchmarks/bench_memory_startup.py [sessions]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import ConversationMemory
+
+HISTORY_SIZES = (1000, 10000, 50000)
+
+
+def build_history(size, sessions):
+    """Écrit un historique de `size` messages répartis sur `sessions` sessions."""
+    memory = ConversationMemory(auto_save=False, enable_nlp=False)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    for i in range(size):
+        memory.add_message('user', f"crée une fonction python numéro {i}", session_id=f"s{i % sessions}")
+    memory._save_memory(force=True)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"démarrage (ms), {sessions} sessions")
+    for size in HISTORY_SIZES:
+        workdir = tempfile.mkdtemp(prefix="namz_startup_")
+        os.chdir(workdir)
+        try:
+            build_history(size, sessions)
+
+            memory, lazy = timed(lambda: ConversationMemory(auto_save=False, enable_nlp=False, memory_budget_mb=0))
+            _, first_access = timed(lambda: memory.get_recent_messages(limit=5, session_id='s1'))
+            _, eager = timed(lambda: ConversationMemory._read_shards(memory.shards, memory.shards.load_manifest()))
+
+            print(f"{size:>6} messages | chargement complet {eager:8.1f} | paresseux {lazy:7.1f}"
+                  f" | 1re hydratation {first_access:6.1f}")
+        finally:
+            os.chdir("/")
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,71 @@
+"""
+Benchmark : débit de ConversationMemory.add_message selon la taille de l'historique
+Compare l'ancienne sauvegarde complète à chaque message (_save_memory) au
+journal append-only écrit par le flusher (lots regroupés + politique fsync),
+flush final compris.
+Usage : python benchmarks/bench_memory_wal.py [messages_mesurés]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import ConversationMemory
+
+HISTORY_SIZES = (0, 1000, 5000, 20000)
+PER_SESSION = 1000
+
+
+def make_memory(history, **kwargs):
+    """Mémoire neuve (répertoire courant = répertoire temporaire) pré-remplie sans persistance."""
+    memory = ConversationMemory(auto_save=False, wal_compact_records=10 ** 9, **kwargs)
+    memory.rate_limit_config['max_requests'] = 10 ** 9
+    for i in range(history):
+        memory.add_message('user', f"crée une fonction python numéro {i}", session_id=f"s{i // PER_SESSION}")
+    return memory
+
+
+def full_save(history, count):
+    """Ancien comportement : snapshot complet après chaque message."""
+    memory = make_memory(history)
+    start = time.perf_counter()
+    for i in range(count):
+        memory.add_message('user', f"message mesuré {i}", session_id='bench')
+        memory.dirty_sessions.update(memory.sessions)
+        memory._save_memory(force=True)
+    return count / (time.perf_counter() - start)
+
+
+def wal_append(history, count, fsync):
+    """Journal : opérations écrites par le flusher (compaction désactivée pendant la mesure)."""
+    memory = make_memory(history, wal_fsync=fsync)
+    memory.auto_save = True
+    start = time.perf_counter()
+    for i in range(count):
+        memory.add_message('user', f"message mesuré {i}", session_id='bench')
+    memory.flush()
+    elapsed = time.perf_counter() - start
+    memory.close()
+    return count / elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workdir = tempfile.mkdtemp(prefix="namz_wal_")
+    os.chdir(workdir)
+    try:
+        print(f"{count} add_message mesurés par configuration (msg/s)")
+        for history in HISTORY_SIZES:
+            old = full_save(history, count)
+            line = [f"historique {history:>6}", f"save complet {old:9.1f}"]
+            for fsync in ('never', 'interval', 'always'):
+                line.append(f"wal/{fsync} {wal_append(history, count, fsync):9.1f}")
+            print(" | ".join(line))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,125 @@
+"""
+Benchmark : empreinte mémoire et sérialisation de Message
+Compare l'ancienne dataclass (__dict__, horodatage ISO, metadata/tags toujours
+alloués, to_dict via dataclasses.asdict) au Message compact (__slots__, epoch
+float, métadonnées paresseuses, to_dict écrit à la main).
+- mémoire : octets/message mesurés par tracemalloc (contenu compris)
+- sérialisation : to_dict et from_dict, µs/message
+Usage : python benchmarks/bench_message_compact.py [messages] [messages_sérialisés]
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tracemalloc
+from datetime import datetime
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import Message, MessageRole, Priority
+
+
+@dataclass
+class LegacyMessage:
+    """Message avant compaction (copie de l'ancienne dataclass)."""
+    role: MessageRole
+    content: str
+    timestamp: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    session_id: str = "default"
+    message_id: str = field(default_factory=lambda: hashlib.md5(str(time.time()).encode()).hexdigest()[:16])
+    parent_id: Optional[str] = None
+    thread_id: Optional[str] = None
+    priority: Priority = Priority.NORMAL
+    tags: List[str] = field(default_factory=list)
+    embedding: Optional[List[float]] = None
+    tokens: int = 0
+    sentiment: Optional[float] = None
+    language: Optional[str] = None
+    edited: bool = False
+    deleted: bool = False
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['role'] = self.role.value
+        data['priority'] = self.priority.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LegacyMessage':
+        data = data.copy()
+        if 'role' in data:
+            if isinstance(data['role'], str):
+                data['role'] = MessageRole(data['role'])
+        if 'priority' in data:
+            if isinstance(data['priority'], (int, str)):
+                data['priority'] = Priority(data.get('priority', Priority.NORMAL.value))
+        else:
+            data['priority'] = Priority.NORMAL
+        if 'session_id' not in data:
+            data['session_id'] = 'default'
+        if 'timestamp' not in data:
+            data['timestamp'] = datetime.utcnow().isoformat()
+        return cls(**data)
+
+
+def make_messages(cls, count, iso):
+    """Alternance user (métadonnées NLP) / assistant (sans métadonnées), 100 sessions."""
+    messages = []
+    for i in range(count):
+        user = i % 2 == 0
+        stamp = datetime.utcnow()
+        messages.append(cls(
+            role=MessageRole.USER if user else MessageRole.ASSISTANT,
+            content=f"crée une fonction python numéro {i}",
+            timestamp=stamp.isoformat() if iso else stamp.timestamp(),
+            metadata={'domain': 'backend', 'intents': ['create'], 'keywords': ['fonction', 'python']} if user else {},
+            session_id=f"s{i % 100}",
+            language='python' if user else None,
+            tokens=6,
+        ))
+    return messages
+
+
+def bytes_per_message(cls, count, iso):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    messages = make_messages(cls, count, iso)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del messages
+    return used / count
+
+
+def per_message_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    serialized = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    legacy = bytes_per_message(LegacyMessage, count, iso=True)
+    compact = bytes_per_message(Message, count, iso=False)
+    print(f"mémoire, {count} messages : dataclass {legacy:7.1f} o/msg | compact {compact:7.1f} o/msg"
+          f" | -{(1 - compact / legacy) * 100:.0f}%")
+
+    old = make_messages(LegacyMessage, serialized, iso=True)
+    new = make_messages(Message, serialized, iso=False)
+    old_dicts = [m.to_dict() for m in old]
+    new_dicts = [m.to_dict() for m in new]
+    print(f"sérialisation, {serialized} messages (µs/msg)")
+    for label, fn_old, fn_new, old_items, new_items in (
+        ("to_dict  ", LegacyMessage.to_dict, Message.to_dict, old, new),
+        ("from_dict", LegacyMessage.from_dict, Message.from_dict, old_dicts, new_dicts),
+    ):
+        before = per_message_us(fn_old, old_items)
+        after = per_message_us(fn_new, new_items)
+        print(f"{label} : asdict/dataclass {before:6.2f} | compact {after:6.2f} | x{before / after:.1f}")
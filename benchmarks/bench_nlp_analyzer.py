@@ -0,0 +1,151 @@
+"""
+Benchmark : analyse NLP d'un message (enrichissement de ConversationMemory)
+Compare l'ancien enchaînement de méthodes (minuscules et tokenisation refaites
+par chaque méthode, motifs regex en chaînes, lexiques en listes) à
+NLPAnalyzer.analyze (une passe, motifs précompilés, frozensets), sur un
+corpus de messages réalistes. Vérifie d'abord que les résultats sont identiques.
+Usage : python benchmarks/bench_nlp_analyzer.py [répétitions]
+"""
+
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.conversation_memory import NLPAnalyzer
+from app.keyword_automaton import get_keyword_automaton
+
+CORPUS = [
+    "Comment créer une API REST avec Flask et SQLAlchemy ?",
+    "crée une fonction python qui trie une liste de dictionnaires par date",
+    "J'ai une erreur 500 sur mon backend, le fichier app.py plante au démarrage",
+    "Merci, c'est parfait ! Et si je veux ajouter l'authentification JWT ?",
+    "non pas ça, corrige plutôt la requête SELECT * FROM users WHERE id = 42",
+    "How do I deploy a docker container with kubernetes and a CI/CD pipeline?",
+    "Voici mon code :\n```python\ndef total(items):\n    return sum(i.price for i in items)\n```\nça renvoie None",
+    "écris un composant React avec useState et useEffect pour charger https://api.example.com/users",
+    "Pourquoi mon modèle tensorflow a une accuracy de 0.52 après 10 epochs ?",
+    "génère un script bash pour sauvegarder /var/www chaque nuit et envoyer un mail à admin@example.com",
+    "et aussi ajoute des tests unitaires avec pytest pour test_models.py",
+    "La page index.html ne charge pas le fichier style.css, le margin: 0 ne s'applique pas",
+    "fix the bug in the async function, await is not working inside the forEach loop",
+    "Analyse ce dataframe pandas : 12000 lignes, colonnes date, montant, catégorie",
+    "c'est super, bravo ! Maintenant fais la version Java avec une classe public static",
+    "Is this vulnerable to sql injection or xss? The form posts to /login without escaping",
+]
+
+
+class LegacyNLP:
+    """Ancien enchaînement (copie des méthodes avant la passe unique)."""
+
+    INTENT_PATTERNS = {
+        'question': [r'\?$', r'^(comment|pourquoi|quoi|qui|où|quand|combien)', r'^(how|why|what|who|where|when)'],
+        'request': [r'^(crée|créer|fait|faire|génère|générer|écris|écrire)', r'^(create|make|generate|write|build)'],
+        'correction': [r'^(non|pas ça|erreur|corrige|change|modifie)', r'^(no|not that|error|fix|change|modify)'],
+        'continuation': [r'^(et|aussi|également|en plus|puis)', r'^(and|also|then|plus|additionally)'],
+        'clarification': [r'^(tu veux dire|c\'est à dire|donc)', r'^(you mean|so|therefore|thus)'],
+    }
+
+    @staticmethod
+    def detect_category(hits, prefix, table):
+        scores = {}
+        for name in table:
+            score = hits.count(f'{prefix}{name}')
+            if score > 0:
+                scores[name] = score
+        if scores:
+            return max(scores.items(), key=lambda x: x[1])[0]
+        return None
+
+    @staticmethod
+    def detect_intent(text):
+        intents = []
+        text_lower = text.lower().strip()
+        for intent, patterns in LegacyNLP.INTENT_PATTERNS.items():
+            for pattern in patterns:
+                if re.search(pattern, text_lower):
+                    intents.append(intent)
+                    break
+        return intents if intents else ['statement']
+
+    @staticmethod
+    def extract_entities(text):
+        entities = {
+            'urls': re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text),
+            'emails': re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text),
+            'files': re.findall(r'\b\w+\.(py|js|html|css|json|txt|md|csv|sql|java|cpp|c|h)\b', text),
+            'numbers': re.findall(r'\b\d+(?:\.\d+)?\b', text),
+            'code_blocks': re.findall(r'```[\s\S]*?```', text),
+        }
+        return {k: v for k, v in entities.items() if v}
+
+    @staticmethod
+    def sentiment_analysis(text):
+        positive_words = [
+            'bon', 'bien', 'super', 'excellent', 'parfait', 'génial', 'merci', 'bravo',
+            'good', 'great', 'excellent', 'perfect', 'awesome', 'thanks', 'wonderful'
+        ]
+        negative_words = [
+            'mauvais', 'mal', 'erreur', 'problème', 'bug', 'nul', 'pas bon',
+            'bad', 'wrong', 'error', 'problem', 'bug', 'terrible', 'awful'
+        ]
+        words = re.findall(r'\w+', text.lower())
+        positive_count = sum(1 for w in words if w in positive_words)
+        negative_count = sum(1 for w in words if w in negative_words)
+        total = positive_count + negative_count
+        if total == 0:
+            return 0.0
+        return (positive_count - negative_count) / total
+
+    @staticmethod
+    def extract_keywords(text, top_n=10):
+        stop_words = {
+            'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'ou', 'mais',
+            'est', 'sont', 'a', 'ai', 'as', 'ont', 'ce', 'cette', 'ces',
+            'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were',
+            'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'
+        }
+        words = re.findall(r'\w+', text.lower())
+        words = [w for w in words if len(w) > 3 and w not in stop_words]
+        return Counter(words).most_common(top_n)
+
+    @staticmethod
+    def analyze(text, hits=None):
+        if hits is None:
+            hits = get_keyword_automaton().scan(text.lower())
+        return {
+            'language': LegacyNLP.detect_category(hits, 'nlp_language:', NLPAnalyzer.LANGUAGE_KEYWORDS),
+            'domain': LegacyNLP.detect_category(hits, 'nlp_domain:', NLPAnalyzer.DOMAIN_KEYWORDS),
+            'intents': LegacyNLP.detect_intent(text),
+            'entities': LegacyNLP.extract_entities(text),
+            'sentiment': LegacyNLP.sentiment_analysis(text),
+            'keywords': [kw[0] for kw in LegacyNLP.extract_keywords(text, top_n=5)],
+        }
+
+
+def per_message_us(fn, corpus, rounds, scanned=False):
+    items = [(text, get_keyword_automaton().scan(text.lower()) if scanned else None) for text in corpus]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, hits in items:
+            fn(text, hits=hits)
+    return (time.perf_counter() - start) / (rounds * len(corpus)) * 1e6
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for text in CORPUS:
+        assert LegacyNLP.analyze(text) == NLPAnalyzer.analyze(text), text
+
+    # Le cache interne de `re` est chaud dans les deux cas (cas réel d'un serveur) ;
+    # le scan de l'automate de mots-clés, commun aux deux, est aussi mesuré à part
+    print(f"{len(CORPUS)} messages x {rounds} (µs/message, résultats identiques)")
+    for label, scanned in (("analyse complète", False), ("hors scan automate", True)):
+        before = per_message_us(LegacyNLP.analyze, CORPUS, rounds, scanned)
+        after = per_message_us(NLPAnalyzer.analyze, CORPUS, rounds, scanned)
+        print(f"{label:18} : méthodes séparées {before:7.2f} | passe unique {after:7.2f} | x{before / after:.2f}")
@@ -0,0 +1,97 @@
+"""
+Benchmark : index inversé CODE_TEMPLATES vs scan linéaire
+Usage : python benchmarks/bench_template_index.py [nb_templates_auto]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.code_templates import CODE_TEMPLATES
+from app.text_index import build_index
+
+QUERIES = [
+    "crée une fonction python qui calcule la factorielle",
+    "crée une classe python pour gérer une file d'attente",
+    "optimise du code python",
+    "crée une fonction javascript async pour fetch des données",
+    "crée une classe typescript avec interfaces",
+    "crée une fonction en c pour trier un tableau",
+    "crée une classe c# avec LINQ",
+    "crée une classe php pour connexion base de données",
+    "crée une struct go avec méthodes",
+    "crée une struct rust avec traits",
+    "crée une page html complète avec navigation",
+    "crée du css responsive avec flexbox",
+    "crée une requête sql avec join",
+    "lire un fichier python",
+    "api rest flask",
+]
+
+
+def linear_best(templates, message):
+    """Ancien algorithme : _similarity sur tous les patterns."""
+    sa = set(message.lower().split())
+    best_score, best_key = 0.0, None
+    for key, tpl in templates.items():
+        for pattern in tpl["patterns"]:
+            sb = set(pattern.lower().split())
+            if not sa or not sb:
+                continue
+            score = len(sa & sb) / len(sa | sb)
+            if score > best_score:
+                best_score, best_key = score, key
+    return best_score, best_key
+
+
+def synthetic_templates(count, seed=42):
+    """Génère des templates auto_* comme ceux de TemplateIntegrator."""
+    rng = random.Random(seed)
+    vocab = sorted({w for tpl in CODE_TEMPLATES.values() for p in tpl["patterns"] for w in p.lower().split()})
+    vocab += [f"mot{i}" for i in range(2000)]
+    extra = {}
+    for i in range(count):
+        patterns = [' '.join(rng.sample(vocab, rng.randint(2, 6))) for _ in range(rng.randint(1, 4))]
+        extra[f"auto_bench_{i}"] = {"patterns": patterns, "template": ""}
+    return extra
+
+
+def bench(templates, rounds=20):
+    start = time.perf_counter()
+    index = build_index(templates)
+    build_time = time.perf_counter() - start
+
+    for message in QUERIES:
+        expected = linear_best(templates, message)
+        got = index.best(message)
+        assert abs(expected[0] - got[0]) < 1e-12 and expected[1] == got[1], (message, expected, got)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in QUERIES:
+            linear_best(templates, message)
+    linear_time = (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in QUERIES:
+            index.best(message)
+    index_time = (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+    patterns = sum(len(t["patterns"]) for t in templates.values())
+    print(f"{len(templates):>7} templates / {patterns:>7} patterns | "
+          f"build {build_time * 1000:8.1f} ms | linéaire {linear_time * 1e6:9.1f} µs | "
+          f"index {index_time * 1e6:8.1f} µs | x{linear_time / index_time:6.1f}")
+
+
+if __name__ == "__main__":
+    extra_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("Index inversé CODE_TEMPLATES (top-1 Jaccard, résultats vérifiés identiques)")
+    bench(dict(CODE_TEMPLATES))
+    for count in (1000, 5000, extra_count):
+        templates = dict(CODE_TEMPLATES)
+        templates.update(synthetic_templates(count))
+        bench(templates, rounds=5)
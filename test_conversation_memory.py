@@ -0,0 +1,140 @@
+"""
+Tests de persistance de ConversationMemory (journal, shards, SQLite, pagination)
+Chaque test travaille dans son propre répertoire temporaire (la mémoire écrit
+dans `instance/` sous le répertoire courant).
+Usage : python test_conversation_memory.py  (ou pytest test_conversation_memory.py)
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SECRET_KEY", "test")
+
+# La mémoire globale est créée à l'import, dans le répertoire courant
+_workdir = tempfile.mkdtemp(prefix="namz_test_memory_")
+os.chdir(_workdir)
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+
+from app.conversation_memory import ConversationMemory, ExportFormat
+
+# Processus qui écrit puis s'arrête brutalement (ni close() ni sauvegarde)
+CRASH_SCRIPT = """
+import os
+from app.conversation_memory import ConversationMemory
+memory = ConversationMemory(enable_nlp=False, wal_fsync='always')
+for i in range(30):
+    memory.add_message('user', f'message {i}', session_id=f's{i % 3}')
+memory.flush()
+os._exit(0)
+"""
+
+
+@contextmanager
+def workdir():
+    """Répertoire courant temporaire, supprimé à la sortie."""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix="namz_test_memory_")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def contents(memory, session_id):
+    return [m['content'] for m in memory.get_recent_messages(1000, session_id=session_id)]
+
+
+def test_wal_crash_recovery():
+    with workdir() as path:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        subprocess.run([sys.executable, "-c", CRASH_SCRIPT], cwd=path, env=env, check=True)
+
+        memory = ConversationMemory(enable_nlp=False)
+        for s in range(3):
+            assert contents(memory, f"s{s}") == [f"message {i}" for i in range(s, 30, 3)]
+        memory.close()
+
+
+def test_shards_and_manifest_reload():
+    with workdir():
+        memory = ConversationMemory(enable_nlp=False)
+        for i in range(20):
+            memory.add_message('user', f'avant {i}', session_id=f's{i % 2}')
+        assert memory._save_memory(force=True)
+        assert memory.persisted_sessions >= {'s0', 's1'}
+        # Messages postérieurs à la sauvegarde : journal seulement
+        memory.add_message('assistant', 'après', session_id='s1')
+        memory.close()
+
+        reloaded = ConversationMemory(enable_nlp=False)
+        assert reloaded.persisted_sessions >= {'s0', 's1'}
+        assert contents(reloaded, 's0') == [f'avant {i}' for i in range(0, 20, 2)]
+        assert contents(reloaded, 's1') == [f'avant {i}' for i in range(1, 20, 2)] + ['après']
+        reloaded.close()
+
+
+def test_merge_and_import_round_trip():
+    for database_url in (None, 'sqlite:///instance/memory.db'):
+        with workdir():
+            memory = ConversationMemory(enable_nlp=False, database_url=database_url)
+            for i in range(3):
+                memory.add_message('user', f'a{i}', session_id='a')
+            for i in range(2):
+                memory.add_message('user', f'b{i}', session_id='b')
+            assert memory.merge_sessions('a', 'b')
+            memory.export_session('b', ExportFormat.JSON, 'export.json')
+            assert memory.import_session('export.json', ExportFormat.JSON, session_id='copy')
+            memory.close()
+
+            reloaded = ConversationMemory(enable_nlp=False, database_url=database_url)
+            assert 'a' not in reloaded.sessions
+            for sid in ('b', 'copy'):
+                messages = reloaded.get_recent_messages(1000, session_id=sid)
+                assert sorted(m['content'] for m in messages) == ['a0', 'a1', 'a2', 'b0', 'b1'], (database_url, sid)
+                assert all(m['session_id'] == sid for m in messages), (database_url, sid)
+            reloaded.close()
+
+
+def test_wait_enriched():
+    with workdir():
+        memory = ConversationMemory(enable_nlp=True)
+        message_id = memory.add_message('user', 'crée une fonction python pour trier une liste', session_id='s')
+        assert memory.wait_enriched(message_id, timeout=10)
+        assert memory.wait_enriched(timeout=10)
+        metadata = memory.get_message_by_id(message_id, 's')['metadata']
+        assert metadata['keywords'] and metadata['intents']
+        memory.close()
+
+
+def test_eviction_then_rehydration():
+    with workdir():
+        memory = ConversationMemory(enable_nlp=False, memory_budget_mb=0.001)
+        for i in range(200):
+            memory.add_message('user', f'message {i}', session_id=f's{i % 20}')
+        memory.flush()
+
+        stats = memory.sessions.stats()
+        assert stats['evictions'] > 0
+        assert memory.sessions.resident_bytes <= memory.memory_budget or stats['resident_sessions'] <= 1
+
+        # Les sessions renvoyées sur disque sont relues à la demande, intactes
+        for s in range(20):
+            assert contents(memory, f's{s}') == [f'message {i}' for i in range(s, 200, 20)]
+        assert memory.sessions.stats()['hydrations'] > 0
+        memory.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,66 @@
+"""
+Test de non-régression : cache normalisé et symboles significatifs
+"crée une classe c#", "c++" et "c" ne doivent pas partager de réponse en cache
+(forme canonique distincte, niveau normalisé ignoré pour les symboles).
+Usage : python test_normalized_cache.py  (ou pytest test_normalized_cache.py)
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SECRET_KEY", "test")
+
+# La mémoire de conversation écrit dans le répertoire courant : répertoire temporaire
+_workdir = tempfile.mkdtemp(prefix="namz_test_cache_")
+os.chdir(_workdir)
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+
+from app.message_features import normalize_message
+from app.ia_engine import NormalizedResponseCache, analyse_texte, _cache, _normalized_cache
+
+C_FAMILY = ("crée une classe c#", "crée une classe c++", "crée une classe c")
+
+
+def test_canonical_forms_keep_symbols():
+    assert len({normalize_message(m) for m in C_FAMILY}) == 3
+    assert normalize_message("```x = 1```") != normalize_message("```x == 1```")
+    assert normalize_message("a -> b") != normalize_message("a > b")
+    assert normalize_message("comment faire ?") != normalize_message("comment faire")
+    # Équivalences conservées
+    assert normalize_message("Crée une fonction Python !") == normalize_message("crée fonction python")
+    assert normalize_message("Comment faire?") == normalize_message("comment faire ?")
+
+
+def test_normalized_tier_skips_symbols():
+    cache = NormalizedResponseCache(fuzzy=True)
+    cache.set("crée une classe c#", b"csharp")
+    for message in C_FAMILY[1:]:
+        assert cache.get(message) is None
+    cache.set("```x = 1```", b"code")
+    assert cache.get("```x == 1```") is None
+    # Un message sans symbole passe toujours par ce niveau
+    cache.set("Crée une fonction Python !", b"python")
+    assert cache.get("crée fonction python") == b"python"
+
+
+def test_c_family_not_served_from_cache():
+    _cache.clear()
+    if _normalized_cache is not None:
+        _normalized_cache.clear()
+    responses = {}
+    for message in C_FAMILY:
+        result = analyse_texte(message)
+        assert not result['meta']['from_cache'], message
+        responses[message] = result['response']
+    assert responses["crée une classe c#"] != responses["crée une classe c++"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")